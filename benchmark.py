@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+# benchmark.py
+# Purpose: To generate synthetic campaigns of 1k, 10k or 100k pages modelled on the real campaign, time every
+# update_all stage and the creator page generators against them, and compare the results with stored JSON baselines
+# so slow or super-linear stages are caught before they reach the real campaign.
+#
+# Example usage:
+#     ./benchmark.py --sizes 1k 10k --results benchmark.json
+#     ./benchmark.py --sizes 1k 10k --baseline benchmark.json
+
+import os
+import io
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import contextlib
+
+import mmorpdnd
+from mmorpdnd import global_vars
+from mmorpdnd import MMORPDND
+from mmorpdnd import MMORPDND_BUILD
+from mmorpdnd import MMORPDND_PROFILER
+from templates.mmorpdnd_tools import output_text
+from templates.mmorpdnd_tools import walk_directory
+
+# The number of pages of each named benchmark size.
+SIZES = {"1k": 1000, "10k": 10000, "100k": 100000}
+
+# The shape of the real campaign, measured from its pages. See create_synthetic_campaign().
+PAGES_PER_DIRECTORY = 4     # The average number of pages in a directory.
+MAX_DEPTH = 6               # The deepest directory level below the campaign directory.
+MEDIAN_BODY_SIZE = 6000     # The median size of the body text of a page, in characters.
+NAMES_PER_PAGE = 9          # The average number of other page names mentioned in a page.
+IMAGE_RATE = 0.7            # The share of pages with an image.
+
+# A smallest valid PNG image, used for the synthetic images.
+PNG_IMAGE = bytes.fromhex("89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+                          "1f15c4890000000d4944415478da63f8ffff3f0005fe02fea7d6a4f00000000049454e44ae426082")
+
+SYLLABLES = ["ka", "el", "ir", "fist", "vor", "ath", "kel", "dun", "mir", "tha", "lo", "ren", "zar", "bo", "gri",
+             "mel", "dor", "sha", "ven", "tor", "ul", "na", "ris", "gal", "ean", "fen", "os", "bri", "to", "lan"]
+WORDS = ["the", "of", "and", "a", "to", "in", "is", "was", "that", "with", "for", "as", "on", "by", "his", "her",
+         "their", "from", "which", "city", "ancient", "guild", "river", "north", "south", "king", "queen", "old",
+         "stone", "dark", "light", "order", "temple", "war", "peace", "trade", "road", "forest", "mountain", "sea",
+         "known", "for", "many", "years", "people", "magic", "power", "secret", "hidden", "great", "small", "gold",
+         "silver", "iron", "fire", "water", "storm", "shadow", "sun", "moon", "village", "market", "tower", "gate"]
+
+
+def create_name(rng, used_names):
+    """
+    Returns a new unique page name, such as "Kelath" or "Vordun_Mirtha".
+
+    Args:
+        rng (random.Random): The random number generator.
+        used_names (set): The names already used. The new name is added to it.
+
+    Returns:
+        str: The name.
+    """
+    while True:
+        words = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+                 for _ in range(rng.choice([1, 2, 2]))]
+        name = "_".join(words)
+        if name.lower() not in used_names:
+            used_names.add(name.lower())
+            return name
+
+
+def create_paragraph(rng, size, names):
+    """
+    Returns a paragraph of filler text mentioning some page names.
+
+    Args:
+        rng (random.Random): The random number generator.
+        size (int): The approximate length of the paragraph in characters.
+        names (list): The names to mention, written with spaces like in real pages.
+
+    Returns:
+        str: The paragraph.
+    """
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    for name in names:
+        # Mention names with the plural and possessive endings the linker handles, like real pages do.
+        words.insert(rng.randrange(len(words) + 1), name.replace("_", " ") + rng.choice(["", "", "", "'s", "s"]))
+    words[0] = words[0].capitalize()
+    return " ".join(words) + "."
+
+
+def create_page_content(rng, name, names, has_image):
+    """
+    Returns the contents of a synthetic page, in the same format as the pages written by Creator.create_page().
+
+    Args:
+        rng (random.Random): The random number generator.
+        name (str): The name of the page.
+        names (list): The names of all pages, some of which are mentioned in the page.
+        has_image (bool): Whether the page has an image.
+
+    Returns:
+        str: The contents of the page.
+    """
+    body_size = int(min(rng.lognormvariate(math.log(MEDIAN_BODY_SIZE), 0.6), MEDIAN_BODY_SIZE * 20))
+    sections = max(1, body_size // 1500)
+    mentions = [rng.choice(names) for _ in range(int(rng.expovariate(1 / NAMES_PER_PAGE)))]
+
+    contents = ['<!DOCTYPE html>\n<html>\n<head>\n<title></title>\n</head>\n<body>\n',
+                f'<div class="dnd-header"><h1>{name.replace("_", " ")}</h1></div>']
+    for section in range(sections):
+        section_mentions = mentions[section::sections]
+        paragraph = create_paragraph(rng, body_size // sections, section_mentions)
+        if section == 0:
+            contents.append(f'<hr><div class="dnd-info"><h3>{name.replace("_", " ")}</h3>'
+                            f'<p class="first-paragraph">{paragraph}</p></div>')
+        else:
+            contents.append(f'<hr><div class="dnd-info"><h3>{rng.choice(WORDS).capitalize()}</h3>'
+                            f'<p>{paragraph}</p></div>')
+    if has_image:
+        contents.append(f'<hr><div class="dnd-image"><h3>Image</h3><p><img src="img/{name}.png" '
+                        f'alt="{name.replace("_", " ")}"></p></div>')
+    contents.append('</body>\n</html>')
+    return "".join(contents)
+
+
+def create_synthetic_campaign(directory, pages, seed=0):
+    """
+    Creates a synthetic campaign, modelled on the real one, for benchmarking.
+
+    The directory tree starts from global_vars.directory_structure (the same tree create_directories() creates) and
+    is deepened with nested subdirectories until there are about PAGES_PER_DIRECTORY pages per directory. Pages are
+    spread unevenly across the directories like in the real campaign, have bodies of realistic and varying sizes in the
+    format of the creator, mention other page names at the density of the real campaign and mostly have an image. The
+    template and css files, a public files list and some creator input files are also created, so both the update_all
+    stages and the creator can be ran inside the synthetic campaign.
+
+    Args:
+        directory (str): The root directory of the synthetic campaign. It is created if needed.
+        pages (int): The number of pages to create.
+        seed (int, optional): The random seed. The same seed always creates the same campaign. Defaults to 0.
+
+    Returns:
+        list: The paths of the created pages.
+    """
+    rng = random.Random(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        MMORPDND().create_directories(directory, global_vars.directory_structure)
+
+    campaign_dir = os.path.join(directory, "campaign")
+    directories = [root for root, dirnames, filenames in walk_directory(campaign_dir)]
+    used_names = set()
+    while len(directories) * PAGES_PER_DIRECTORY < pages:
+        parent = rng.choice(directories)
+        if os.path.relpath(parent, campaign_dir).count(os.sep) + 1 >= MAX_DEPTH:
+            continue
+        subdirectory = os.path.join(parent, create_name(rng, used_names).lower())
+        os.makedirs(subdirectory)
+        directories.append(subdirectory)
+
+    # Some directories hold far more pages than others.
+    weights = [rng.paretovariate(1.2) for _ in directories]
+    names = [create_name(rng, used_names) for _ in range(pages)]
+    paths = []
+    for name, page_directory in zip(names, rng.choices(directories, weights, k=pages)):
+        has_image = rng.random() < IMAGE_RATE
+        path = os.path.join(page_directory, name + ".html")
+        with open(path, "w") as f:
+            f.write(create_page_content(rng, name, names, has_image))
+        if has_image:
+            os.makedirs(os.path.join(page_directory, "img"), exist_ok=True)
+            with open(os.path.join(page_directory, "img", name + ".png"), "wb") as f:
+                f.write(PNG_IMAGE)
+        paths.append(path)
+
+    # The templates and styles the stages use, and the files the creator reads.
+    for template_file in [global_vars.header_template_file, global_vars.nav_template_file, global_vars.css_path,
+                          global_vars.search_template_file, "templates/characterTemplate.html"]:
+        destination = os.path.join(directory, template_file)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(os.path.join(global_vars.script_dir, template_file), destination)
+
+    os.makedirs(os.path.join(directory, "templates", "lists"), exist_ok=True)
+    with open(os.path.join(directory, "templates", "lists", "public_files.list"), "w") as f:
+        f.write("# These files are relative to the mmorpdnd.py script location.\n")
+        for path in rng.sample(paths, min(5, len(paths))):
+            f.write(os.path.relpath(path, directory) + "\n")
+
+    create_input_files(rng, os.path.join(directory, global_vars.input_files_dir), names, directories, campaign_dir)
+    return paths
+
+
+def create_input_files(rng, input_directory, names, directories, campaign_dir, count=20):
+    """
+    Creates creator input files (.input pages and .char characters) mentioning the synthetic page names.
+
+    Args:
+        rng (random.Random): The random number generator.
+        input_directory (str): The directory to create the files in.
+        names (list): The names of the synthetic pages.
+        directories (list): The synthetic campaign directories, used as the destination folders.
+        campaign_dir (str): The campaign directory.
+        count (int, optional): The number of files of each type to create. Defaults to 20.
+
+    Returns:
+        None
+    """
+    os.makedirs(input_directory, exist_ok=True)
+    template_char_file = os.path.join(global_vars.script_dir, "templates", "template.char")
+    used_names = {name.lower() for name in names}
+    for index in range(count):
+        name = create_name(rng, used_names)
+        folder = os.path.relpath(rng.choice(directories), campaign_dir).split(os.sep)[-1]
+        with open(os.path.join(input_directory, name + ".input"), "w") as f:
+            f.write(f"folder={folder}\n\n")
+            for section in range(rng.randint(2, 5)):
+                paragraph = create_paragraph(rng, 600, rng.sample(names, min(3, len(names))))
+                f.write(f"{rng.choice(WORDS).capitalize()} {section}[dnd-info]={paragraph}\n")
+            f.write(f"Facts[dnd-list]={';'.join(rng.sample(WORDS, 5))}\n")
+
+        # Characters start from the creator template.
+        fields = {"folder": "characters/player", "name": name.replace('_', ' '), "level": rng.randint(1, 20),
+                  "class": rng.choice(['wizard', 'fighter', 'rogue', 'cleric']),
+                  "information": create_paragraph(rng, 300, rng.sample(names, min(2, len(names))))}
+        with open(template_char_file, "r") as f:
+            lines = f.readlines()
+        with open(os.path.join(input_directory, name + ".char"), "w") as f:
+            for line in lines:
+                field = line.split("=")[0].strip()
+                f.write(f"{field} = {fields[field]}\n" if field in fields else line)
+
+
+@contextlib.contextmanager
+def campaign_context(directory):
+    """
+    A context manager running code from inside a synthetic campaign, as if mmorpdnd.py was located there. Everything
+    printed is discarded so the output does not slow the benchmark down.
+    """
+    current_dir = os.getcwd()
+    script_dir = global_vars.script_dir
+    os.chdir(directory)
+    # The public files list is relative to the script location.
+    global_vars.script_dir = directory
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        global_vars.script_dir = script_dir
+        os.chdir(current_dir)
+
+
+def time_build(directory, jobs, incremental):
+    """
+    Runs an update_all build of a synthetic campaign and returns the time of each step.
+
+    Args:
+        directory (str): The root directory of the synthetic campaign.
+        jobs (int): The number of processes the build uses.
+        incremental (bool): Whether the build skips up to date files.
+
+    Returns:
+        dict: The total wall time and the profile of each step. See MMORPDND_PROFILER.
+    """
+    profiler = MMORPDND_PROFILER(trace_memory=False)
+    with campaign_context(directory):
+        MMORPDND_BUILD(MMORPDND(), directory, incremental=incremental, jobs=jobs, profiler=profiler).run()
+    report = profiler.get_report()
+    return {"wall_time": report["totals"]["wall_time"],
+            "steps": {step.pop("name"): step for step in report["steps"]}}
+
+
+def time_creator(directory):
+    """
+    Runs the creator page generators on the input files of a synthetic campaign and returns their times.
+
+    Args:
+        directory (str): The root directory of the synthetic campaign.
+
+    Returns:
+        dict: The total and per page wall time of Creator.create_page() and Creator.generate_char().
+    """
+    templates_dir = os.path.join(global_vars.script_dir, "templates")
+    if templates_dir not in sys.path:
+        sys.path.append(templates_dir)
+    import creator
+    creator.terminal_mode = True
+
+    input_directory = os.path.join(directory, global_vars.input_files_dir)
+    results = {}
+    with campaign_context(os.path.join(directory, "templates")):
+        app = creator.Creator()
+        # The pages share one workspace index, the same as in a create_pages() run of the input files directory.
+        app.workspace_index = app.get_workspace_index()
+        for method_name, extension in [("create_page", ".input"), ("generate_char", ".char")]:
+            files = sorted(os.path.join(input_directory, file_name) for file_name in os.listdir(input_directory)
+                           if file_name.endswith(extension))
+            start = time.perf_counter()
+            for file in files:
+                getattr(app, method_name)(file)
+            wall_time = time.perf_counter() - start
+            results[method_name] = {"files": len(files), "wall_time": wall_time,
+                                    "wall_time_per_file": wall_time / max(len(files), 1)}
+    return results
+
+
+def run_benchmark(size, work_dir, jobs=1, seed=0, keep=False):
+    """
+    Creates a synthetic campaign of a benchmark size and times a full build, a no-op incremental build, an incremental
+    build after a single page is edited and the creator page generators.
+
+    Args:
+        size (str): The benchmark size, a key of SIZES.
+        work_dir (str): The directory to create the synthetic campaign in.
+        jobs (int, optional): The number of processes the builds use. Defaults to 1.
+        seed (int, optional): The random seed of the synthetic campaign. Defaults to 0.
+        keep (bool, optional): Whether to keep the synthetic campaign afterwards. Defaults to False.
+
+    Returns:
+        dict: The results.
+    """
+    directory = os.path.abspath(os.path.join(work_dir, f"campaign_{size}"))
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+
+    output_text(f"Creating a synthetic campaign of {SIZES[size]} pages in {directory}", option="note")
+    start = time.perf_counter()
+    paths = create_synthetic_campaign(directory, SIZES[size], seed)
+    results = {"pages": len(paths),
+               "bytes": sum(os.path.getsize(path) for path in paths),
+               "generate_time": time.perf_counter() - start}
+
+    output_text(f"Timing the {size} builds...", option="note")
+    results["full_build"] = time_build(directory, jobs, incremental=False)
+    results["noop_build"] = time_build(directory, jobs, incremental=True)
+    with open(paths[0], "a") as f:
+        f.write("\n")
+    results["single_change_build"] = time_build(directory, jobs, incremental=True)
+
+    output_text(f"Timing the {size} creator...", option="note")
+    results["creator"] = time_creator(directory)
+
+    if not keep:
+        shutil.rmtree(directory)
+    return results
+
+
+def get_timings(results):
+    """
+    Returns every wall time of a benchmark size result, keyed by a name such as "full_build.update_html_links".
+    """
+    timings = {}
+    for build in ["full_build", "noop_build", "single_change_build"]:
+        timings[build] = results[build]["wall_time"]
+        for step, profile in results[build]["steps"].items():
+            timings[f"{build}.{step}"] = profile["wall_time"]
+    for method_name, profile in results["creator"].items():
+        timings[f"creator.{method_name}"] = profile["wall_time"]
+    return timings
+
+
+def find_super_linear_steps(sizes, max_exponent=1.3, min_time=0.05):
+    """
+    Finds the timings which grow faster than linearly with the number of pages.
+
+    The scaling exponent between two sizes is log(t2 / t1) / log(n2 / n1), which is 1 for linear growth and 2 for
+    quadratic growth. The creator is timed on the same number of input files at every size, so its times should not
+    grow at all and 1 is added to their exponent to compare them with the same limit.
+
+    Args:
+        sizes (dict): The results of each benchmark size, keyed by size name.
+        max_exponent (float, optional): The highest acceptable exponent. Defaults to 1.3.
+        min_time (float, optional): Timings below this many seconds at the larger size are ignored as noise.
+            Defaults to 0.05.
+
+    Returns:
+        list: The (timing name, smaller size, larger size, exponent) of each super-linear timing.
+    """
+    super_linear = []
+    ordered = sorted(sizes.items(), key=lambda item: item[1]["pages"])
+    for (small_size, small), (large_size, large) in zip(ordered, ordered[1:]):
+        small_timings = get_timings(small)
+        large_timings = get_timings(large)
+        page_ratio = large["pages"] / small["pages"]
+        for name, large_time in large_timings.items():
+            small_time = small_timings.get(name)
+            if not small_time or large_time < min_time or page_ratio <= 1:
+                continue
+            exponent = math.log(large_time / small_time) / math.log(page_ratio)
+            if name.startswith("creator."):
+                exponent += 1
+            if exponent > max_exponent:
+                super_linear.append((name, small_size, large_size, exponent))
+    return super_linear
+
+
+def find_regressions(sizes, baseline, tolerance=0.25, min_time=0.05):
+    """
+    Finds the timings which are slower than in a baseline.
+
+    Args:
+        sizes (dict): The results of each benchmark size, keyed by size name.
+        baseline (dict): The baseline results, as written by save_results().
+        tolerance (float, optional): The accepted slow down, as a fraction of the baseline time. Defaults to 0.25.
+        min_time (float, optional): Differences of less than this many seconds are ignored as noise. Defaults to 0.05.
+
+    Returns:
+        list: The (size, timing name, baseline time, time) of each regression.
+    """
+    regressions = []
+    for size, results in sizes.items():
+        if size not in baseline.get("sizes", {}):
+            continue
+        baseline_timings = get_timings(baseline["sizes"][size])
+        for name, wall_time in get_timings(results).items():
+            baseline_time = baseline_timings.get(name)
+            if baseline_time is None:
+                continue
+            if wall_time > baseline_time * (1 + tolerance) and wall_time - baseline_time >= min_time:
+                regressions.append((size, name, baseline_time, wall_time))
+    return regressions
+
+
+def save_results(path, sizes, jobs):
+    """
+    Writes benchmark results as JSON, to be used as a baseline by later runs.
+
+    Args:
+        path (str): The path of the results file.
+        sizes (dict): The results of each benchmark size, keyed by size name.
+        jobs (int): The number of processes the builds used.
+
+    Returns:
+        dict: The written results.
+    """
+    results = {"version": 1, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+               "cpus": os.cpu_count(), "jobs": jobs, "sizes": sizes}
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=4)
+    output_text(f"Benchmark results written to {path}", option="success")
+    return results
+
+
+def print_summary(sizes):
+    """
+    Prints the main timings of each benchmark size.
+    """
+    output_text(f"{'size':<6}{'pages':>8}{'full s':>9}{'no-op s':>9}{'1 edit s':>10}{'link s':>9}{'beautify s':>12}"
+                f"{'page ms':>9}{'char ms':>9}")
+    for size, results in sizes.items():
+        full_steps = results["full_build"]["steps"]
+        output_text(f"{size:<6}{results['pages']:>8}{results['full_build']['wall_time']:>9.2f}"
+                    f"{results['noop_build']['wall_time']:>9.2f}{results['single_change_build']['wall_time']:>10.2f}"
+                    f"{full_steps['update_html_links']['wall_time']:>9.2f}"
+                    f"{full_steps['beautify_files']['wall_time']:>12.2f}"
+                    f"{results['creator']['create_page']['wall_time_per_file'] * 1000:>9.1f}"
+                    f"{results['creator']['generate_char']['wall_time_per_file'] * 1000:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the MMORPDND stages on synthetic campaigns.')
+    parser.add_argument('-s', '--sizes', nargs='+', choices=list(SIZES), default=["1k", "10k"],
+                        help='The benchmark sizes to run. Defaults to 1k and 10k.')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='The number of processes the builds use.')
+    parser.add_argument('-w', '--work-dir', default=os.path.join(global_vars.cache_dir, "benchmark"),
+                        help='The directory to create the synthetic campaigns in.')
+    parser.add_argument('-r', '--results', default=os.path.join(global_vars.cache_dir, "benchmark", "results.json"),
+                        help='The path to write the JSON results to.')
+    parser.add_argument('-b', '--baseline', help='A previous results file to compare against.')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.25,
+                        help='The accepted slow down compared to the baseline, as a fraction. Defaults to 0.25.')
+    parser.add_argument('-k', '--keep', action='store_true', help='Keeps the synthetic campaigns afterwards.')
+    parser.add_argument('--seed', type=int, default=0, help='The random seed of the synthetic campaigns.')
+    args = parser.parse_args()
+
+    mmorpdnd.import_html_libraries()
+    sizes = {size: run_benchmark(size, args.work_dir, args.jobs, args.seed, args.keep)
+             for size in sorted(args.sizes, key=SIZES.get)}
+    save_results(args.results, sizes, args.jobs)
+    print_summary(sizes)
+
+    failed = False
+    for name, small_size, large_size, exponent in find_super_linear_steps(sizes):
+        output_text(f"{name} grows super-linearly from {small_size} to {large_size} pages "
+                    f"(exponent {exponent:.2f}).", option="warning")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        for size, name, baseline_time, wall_time in find_regressions(sizes, baseline, args.tolerance):
+            output_text(f"Regression in {size} {name}: {baseline_time:.3f}s -> {wall_time:.3f}s", option="error")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+// mmorpdnd_index.js
+// Renders the links of a paginated index page which are not in the page itself. The index pages of large directories
+// only list their first links (see MMORPDND.update_index_file_content() in mmorpdnd.py), and every link is listed in
+// the JSON manifest of the directory, index.json. The other links are rendered one page at a time as the end of the
+// list is scrolled into view, and their thumbnails are only loaded once they are shown.
+(function () {
+    "use strict";
+
+    var list = document.querySelector("div.indexLinks ul");
+    if (!list || !window.fetch) {
+        return;
+    }
+
+    // The icons of the directory and image links, the same as in the index page.
+    var icons = {"dir-index-link": "fas fa-folder", "image-index-link": "fas fa-camera"};
+
+    function createItem(entry) {
+        var item = document.createElement("li");
+        var link = document.createElement("a");
+        link.href = entry[1];
+        if (entry[3]) {
+            var thumbnail = document.createElement("img");
+            thumbnail.alt = "";
+            thumbnail.className = "index-thumbnail";
+            thumbnail.loading = "lazy";
+            thumbnail.src = entry[3];
+            link.appendChild(thumbnail);
+        }
+        if (entry[2]) {
+            var icon = document.createElement("i");
+            link.className = entry[2];
+            icon.className = icons[entry[2]];
+            link.appendChild(icon);
+            link.appendChild(document.createTextNode(" "));
+        }
+        link.appendChild(document.createTextNode(entry[0]));
+        item.appendChild(link);
+        return item;
+    }
+
+    fetch("index.json").then(function (response) {
+        return response.json();
+    }).then(function (manifest) {
+        var entries = manifest.entries;
+        // The page lists the first links itself.
+        var pageSize = list.querySelectorAll("li").length;
+        var next = pageSize;
+        var end = document.createElement("div");
+        list.parentNode.insertBefore(end, list.nextSibling);
+
+        function renderPage() {
+            var items = document.createDocumentFragment();
+            for (var last = Math.min(next + pageSize, entries.length); next < last; next++) {
+                items.appendChild(createItem(entries[next]));
+            }
+            list.appendChild(items);
+            return next < entries.length;
+        }
+
+        if (!("IntersectionObserver" in window)) {
+            while (renderPage()) {
+            }
+            return;
+        }
+        var observer = new IntersectionObserver(function (changes) {
+            if (!changes[changes.length - 1].isIntersecting) {
+                return;
+            }
+            observer.unobserve(end);
+            // Observing the end of the list again renders another page if it is still in view.
+            if (renderPage()) {
+                observer.observe(end);
+            } else {
+                end.remove();
+            }
+        }, {rootMargin: "1000px"});
+        observer.observe(end);
+    });
+})();
@@ -1,13 +1,51 @@
 #!/usr/bin/env python3
 import os
-import glob
 import re
 import random
 import argparse
+import contextlib
+import hashlib
+import http.server
+import io
+import json
+import multiprocessing
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from urllib.parse import unquote
+from urllib.parse import urlsplit
 
 # Import helper functions from common tools file.
 from templates.mmorpdnd_tools import output_text
 from templates.mmorpdnd_tools import is_image_file
+from templates.mmorpdnd_tools import list_directory
+from templates.mmorpdnd_tools import walk_directory
+from templates.mmorpdnd_tools import write_file
+from templates.mmorpdnd_linker import MMORPDND_LINKER
+from templates.mmorpdnd_link_index import MMORPDND_LINK_INDEX
+from templates.mmorpdnd_link_index import extract_links
+from templates.mmorpdnd_link_index import resolve_link
+from templates.mmorpdnd_search_index import MMORPDND_SEARCH_INDEX
+from templates.mmorpdnd_search_index import get_search_terms
+from templates.mmorpdnd_search_index import get_page_title
+from templates.mmorpdnd_search_index import get_shard_file_tree
+from templates.mmorpdnd_formatter import prettify_html
+from templates.mmorpdnd_images import add_image_srcsets
+from templates.mmorpdnd_images import add_index_thumbnails
+from templates.mmorpdnd_images import create_image_derivatives
+from templates.mmorpdnd_images import find_index_images
+from templates.mmorpdnd_images import find_page_images
+from templates.mmorpdnd_images import is_pillow_available
+from templates.mmorpdnd_images import DERIVATIVE_SETTINGS
+from templates.mmorpdnd_minify import compress_contents
+from templates.mmorpdnd_minify import get_dist_settings
+from templates.mmorpdnd_minify import minify_file
+from templates.mmorpdnd_minify import COMPRESSED_EXTENSIONS
+from templates.mmorpdnd_minify import COPIED_EXTENSIONS
+from templates.mmorpdnd_minify import MINIFIED_EXTENSIONS
 
 
 class MMORPDND_VARS:
@@ -104,14 +142,63 @@ class MMORPDND_VARS:
         }
 
         # Define the number of HTML files to create in each subdirectory
-        self.num_dummy_files_per_subdir = 3  # Stores all files created so far.
-        self.all_index_files = []
+        self.num_dummy_files_per_subdir = 3
 
         # Define the root directory
         self.root_dir = os.getcwd()
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
 
-        self.directories_to_exclude = ["templates", "css", ".git", ".idea", ".github", "scripts", "docs"]
+        # The directory storing the build manifest and other cached build data.
+        self.cache_dir = ".mmorpdnd"
+        self.manifest_file = "manifest.json"
+        self.link_index_file = "links.sqlite"
+        # The directory fingerprints of the index files updated by MMORPDND.update_index_files().
+        self.index_fingerprint_file = "index_fingerprints.json"
+        # Directories with more index links than this get a paginated index page: the index file only lists the first
+        # links, and the script index_script_path renders the others from the JSON manifest of the directory
+        # (index_manifest_file, next to the index file) as the page is scrolled.
+        self.index_page_size = 100
+        self.index_manifest_file = "index.json"
+        self.index_script_path = "css/mmorpdnd_index.js"
+        # The hash of the output of beautify_files for each file, so the files which are already formatted are skipped.
+        self.beautify_cache_file = "beautify.json"
+        # The HTML formatter of beautify_files: "bs4" (BeautifulSoup's prettify()) or "fast" (the same output without
+        # building a parse tree, see templates/mmorpdnd_formatter.py).
+        self.html_formatter = "bs4"
+        # The build profile report written by --profile, and the history every profile is appended to.
+        self.profile_file = "profile.json"
+        self.profile_history_file = "profile_history.jsonl"
+
+        # The search page of the campaign and the index shards it loads, see MMORPDND_SEARCH_INDEX.
+        self.search_dir = "search"
+        self.search_index_file = "search.sqlite"
+        self.search_template_file = "templates/searchTemplate.html"
+
+        # The resized copies of the campaign images created by the update_images stage, named by the image hash, and the
+        # hash and copies of each image as of the last build. See templates/mmorpdnd_images.py.
+        self.assets_dir = "assets"
+        self.image_cache_file = "images.json"
+
+        # The directory the build outputs are written to, and the public export of the campaign inside it.
+        self.dist_dir = "dist"
+        self.public_export_dir = os.path.join(self.dist_dir, "public")
+        # The minified copy of the campaign for static hosting written by --dist, with precompressed .gz and .br
+        # siblings, and the hash and exported files of each file as of the last export. See
+        # MMORPDND_BUILD.export_dist().
+        self.dist_export_dir = os.path.join(self.dist_dir, "site")
+        self.dist_cache_file = "dist.json"
+        # The list of the pages to publish. The pages listed are relative to the mmorpdnd.py script location.
+        self.public_files_list = "templates/lists/public_files.list"
+
+        # The directory holding the creator input files (.input and .char) watched by MMORPDND_WATCHER.
+        self.input_files_dir = "templates/input_files"
+        # The port of the preview server, and the directory (in cache_dir) the creator renders the pages of the edited
+        # input files to for it. See MMORPDND_SERVER.
+        self.server_port = 8000
+        self.render_dir = "render"
+
+        self.directories_to_exclude = ["templates", "css", ".git", ".idea", ".github", "scripts", "docs",
+                                       self.cache_dir, self.dist_dir, self.search_dir, self.assets_dir]
 
         # Define the regular expression to match the header section
         self.header_regex = re.compile(r"<head>.*?</head>", re.DOTALL)
@@ -124,6 +211,14 @@ class MMORPDND_VARS:
         self.nav_template_file = "templates/navTemplate.html"
         self.css_path = "css/mmorpdnd.css"
 
+        # How the pages get the header and navigation templates: "inline" copies both into every page, and "include"
+        # moves the scripts of the header and the navigation block into one shared layout script every page loads, so
+        # editing them only changes that script. See MMORPDND.get_layout_templates().
+        self.layout_mode = "inline"
+        self.layout_script_path = "css/mmorpdnd_layout.js"
+        # Define the regular expression to match the script elements of the header template
+        self.script_regex = re.compile(r"[ \t]*<script\b([^>]*)>(.*?)</script>\n?", re.DOTALL)
+
 
 # Define a global variable containing the declared vars. Use this so they are all only defined once and can be
 # updated/stored throughout the applications lifetime.
@@ -160,6 +255,46 @@ def get_relative_path(from_file, to_file):
     return os.path.relpath(to_file, os.path.dirname(from_file))
 
 
+def get_content_hash(text):
+    """
+    Returns a hash of some text, used to detect when a file or one of its build inputs has changed.
+
+    Args:
+        text (str): The text to hash.
+
+    Returns:
+        str: The hexadecimal sha256 digest of the text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def format_index_manifest(entries):
+    """
+    Returns the JSON manifest of the links of a paginated index page, see MMORPDND.get_index_manifest(). Each link is
+    written on its own line, so adding a file to a directory only adds a line to its manifest.
+
+    Args:
+        entries (list): The [link_text, href, link_class] of each link, in the order they are listed. Image links may
+            have the link of their thumbnail as a fourth item.
+
+    Returns:
+        str: The manifest.
+    """
+    lines = ",\n".join(json.dumps(entry, ensure_ascii=False) for entry in entries)
+    return f'{{"entries": [\n{lines}\n]}}\n'
+
+
+def report_changed_files(changed):
+    """
+    Prints the number of files a stage changed. Files whose contents are already up to date are not written, see
+    write_file() in templates/mmorpdnd_tools.py.
+
+    Args:
+        changed (int): The number of files the stage wrote.
+    """
+    output_text(f"{changed} files changed.", option="success")
+
+
 def create_dummy_html_files(directory=global_vars.root_dir):
     """
     Creates dummy HTML files in all directories and subdirectories for testing purposes.
@@ -178,7 +313,7 @@ def create_dummy_html_files(directory=global_vars.root_dir):
 
     The method performs the following steps:
     1. Creates an index.html file in the specified directory with a basic HTML structure.
-    2. Recursively walks through the directory structure using `os.walk`.
+    2. Recursively walks through the directory structure using `walk_directory`, skipping excluded directories.
     3. For each subdirectory, excluding any directories listed in `global_vars.directories_to_exclude`:
         - Creates an index.html file in the subdirectory with a basic HTML structure.
         - Generates a specified number of dummy HTML files in the subdirectory, each containing a random link to another dummy file.
@@ -198,15 +333,8 @@ def create_dummy_html_files(directory=global_vars.root_dir):
         f.write("<html><head></head><body><h1>Welcome to the index page!</h1></body></html>")
 
     # Recursively walk through the directory structure and create HTML files in each subdirectory
-    for root, dirnames, filenames in os.walk(directory):
+    for root, dirnames, filenames in walk_directory(directory, global_vars.directories_to_exclude):
         for dirname in dirnames:
-
-            # Check if we are looking at a file in our exclude list.
-            if any(exclude in root for exclude in global_vars.directories_to_exclude):
-                continue
-            if any(exclude in dirname for exclude in global_vars.directories_to_exclude):
-                continue
-
             # Create an index.html file in each subdirectory
             with open(os.path.join(root, dirname, "index.html"), "w") as f:
                 f.write("<html><head></head><body><h1>Welcome to the index page!</h1></body></html>")
@@ -284,10 +412,18 @@ class MMORPDND:
     """
 
 
-    def __init__(self):
+    def __init__(self, html_formatter=None, layout_mode=None):
         """
         Initialization method.
+
+        Args:
+            html_formatter (str, optional): The HTML formatter of beautify_files, "bs4" or "fast". Defaults to
+                global_vars.html_formatter.
+            layout_mode (str, optional): How the pages get the header and navigation templates, "inline" or
+                "include". Defaults to global_vars.layout_mode.
         """
+        self.html_formatter = html_formatter or global_vars.html_formatter
+        self.layout_mode = layout_mode or global_vars.layout_mode
 
 
     # Define a function to create directories recursively
@@ -328,43 +464,54 @@ class MMORPDND:
         index file named "index.html" in each directory that doesn't already have one.
 
         The method performs the following steps:
-        1. Loop through all directories and files using `os.walk` starting from the specified directory.
+        1. Loop through all directories and files using `walk_directory` starting from the specified directory,
+           skipping the directories in the exclude list.
         2. Check if an index file named "index.html" already exists in the current directory. If so, skip that directory.
-        3. Check if the current directory matches any of the excluded directories defined in `global_vars.directories_to_exclude`.
-           If so, skip that directory.
-        4. Create an index.html file in the current directory.
-        5. Write the HTML content to the index.html file, including the directory name in the title and header.
-        6. Print a message indicating the creation of the index file.
+        3. Create an index.html file in the current directory.
+        4. Write the HTML content to the index.html file, including the directory name in the title and header.
+        5. Print a message indicating the creation of the index file.
 
         Note: The index.html file created contains a basic HTML structure with the title and header set to "Index of [directory_name]".
 
         Example usage:
             create_index_files()
         """
+        changed = 0
         # Loop through all directories and files starting from the specified directory.
-        for root, dirnames, filenames in os.walk(directory):
+        for root, dirnames, filenames in walk_directory(directory, global_vars.directories_to_exclude):
             # Create index file in current directory.
             index_file_path = os.path.join(root, "index.html")
 
             # Skip this directory if index.html already exists.
-            if os.path.exists(index_file_path):
-                continue
-            # Check if we are looking at a file in our exclude list.
-            if any(exclude in index_file_path for exclude in global_vars.directories_to_exclude):
+            if "index.html" in filenames:
                 continue
 
             # Create the index.html file and write the HTML content to it
-            directory_name = os.path.basename(root)
-            # Extract the path starting from 'campaign' onward
-            campaign_index = root.find('campaign')  # Find the index where 'campaign' starts
-            if campaign_index != -1:  # Ensure 'campaign' is found
-                display_path = root[campaign_index:]  # Slice from 'campaign' to the end
-            else:
-                display_path = root  # Fallback to full path if 'campaign' isn’t found (shouldn’t happen)
-            with open(index_file_path, 'w') as f:
-                f.write(f"<html>\n<head>\n<title>Index of {directory_name}</title>\n</head>\n<body>\n")
-                f.write(f"<h1>Index of {display_path}</h1>\n</body>\n</html>\n")
+            write_file(index_file_path, self.create_index_file_content(root))
+            changed += 1
             output_text(f"Created index file at {index_file_path}", option="success")
+        report_changed_files(changed)
+
+
+    def create_index_file_content(self, root):
+        """
+        Returns the initial contents of a new index.html file for a directory.
+
+        Args:
+            root (str): The directory the index file is created in.
+
+        Returns:
+            str: A basic HTML structure with the title and header set to "Index of [directory_name]".
+        """
+        directory_name = os.path.basename(root)
+        # Extract the path starting from 'campaign' onward
+        campaign_index = root.find('campaign')  # Find the index where 'campaign' starts
+        if campaign_index != -1:  # Ensure 'campaign' is found
+            display_path = root[campaign_index:]  # Slice from 'campaign' to the end
+        else:
+            display_path = root  # Fallback to full path if 'campaign' isn’t found (shouldn’t happen)
+        return (f"<html>\n<head>\n<title>Index of {directory_name}</title>\n</head>\n<body>\n"
+                f"<h1>Index of {display_path}</h1>\n</body>\n</html>\n")
 
 
     def move_dir_items_to_end(self, string):
@@ -446,10 +593,13 @@ class MMORPDND:
         return new_string
 
 
-    def update_index_files(self):
+    def update_index_files(self, directory="."):
         """
         Updates all index files in the directory and subdirectories to include links to other files in the same directory.
 
+        Args:
+            directory (str): The directory path to start updating index files from. Defaults to the current directory.
+
         Returns:
             None.
 
@@ -458,103 +608,274 @@ class MMORPDND:
 
         This method performs the following steps:
         1. Prints a message indicating that index files are being updated.
-        2. Retrieves a list of all HTML index files in the current directory and subdirectories, excluding any directories listed in `global_vars.directories_to_exclude`.
+        2. Walks the directory and subdirectories once, excluding any directories listed in
+           `global_vars.directories_to_exclude`, keeping the listing of each directory in a snapshot.
         3. For each index file found:
-            - Reads the file data.
-            - Identifies the HTML files present in the same directory as the current index file.
-            - If the index links div section does not exist in the file, it adds the div section just before the closing </body> tag.
-            - Updates the index links by generating HTML code for each HTML file in the directory (excluding the index.html file) and appending it to the index links div.
-            - Replaces the old index links section in the file with the updated index links div.
-            - Writes the updated file data back to the file.
-            - Prints a message indicating that the index file has been updated.
+            - Computes the fingerprint of the entries of its directory (see get_index_fingerprint()).
+            - Skips the file without reading it if neither the fingerprint nor the file changed since the last run.
+              The fingerprints are stored in the cache directory (see global_vars.index_fingerprint_file).
+            - Otherwise reads the file data and updates its index links div (see update_index_file_content()).
+            - Writes the updated file data back to the file if it changed and prints a message (see write_file()).
+            - Writes the JSON manifest of the directory if its index page is paginated (see get_index_manifest()).
         4. Prints a message indicating that all index.html files have been updated.
 
-        Note: The method relies on regular expressions for searching and updating the index links section in each index file.
-
         Example usage:
             update_index_files()
         """
         output_text("Updating index files...")
-
-        # Get list of all HTML index files in directory and subdirectories
-        for root, dirnames, filenames in os.walk("."):
+        fingerprints = MMORPDND_MANIFEST(os.path.join(directory, global_vars.cache_dir,
+                                                      global_vars.index_fingerprint_file))
+        fingerprints.load()
+        entries = {}
+        snapshot = {}
+        skipped = 0
+        changed = 0
+
+        # Loop through each index file in directory and subdirectories
+        for root, dirnames, filenames in walk_directory(directory, global_vars.directories_to_exclude, snapshot):
             for file in filenames:
+                if not file.endswith("index.html"):
+                    continue
+                file_path = os.path.join(root, file)
+                key = os.path.relpath(file_path, directory)
+
+                # Find all HTML files in same directory as current file
+                files_in_dir, dir_names, img_files = self.list_index_entries(root, snapshot)
+                fingerprint = self.get_index_fingerprint(files_in_dir, dir_names, img_files)
+
+                # check if the file still exists.
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    output_text(f"File no longer exists: {file_path}", option="warning")
+                    continue
 
-                # Check if we are looking at a file in our exclude list.
-                if any(exclude in root for exclude in global_vars.directories_to_exclude):
+                # The modification time and size tell whether the file was edited since the last run.
+                signature = f"{stat.st_mtime_ns}:{stat.st_size}"
+                if fingerprints.is_up_to_date(key, signature, "update_index_files", fingerprint):
+                    entries[key] = fingerprints.pages[key]
+                    skipped += 1
                     continue
 
-                if file.endswith("index.html"):
-                    global_vars.all_index_files.append(os.path.join(root, file))
+                with open(file_path, 'r') as f:
+                    file_data = f.read()
+                updated_data = self.update_index_file_content(file_data, files_in_dir, dir_names, img_files, root)
+
+                # Write updated file data to file
+                if write_file(file_path, updated_data):
+                    changed += 1
+                    output_text(f"{file_path} updated")
+
+                # Write the JSON manifest of paginated index pages, and remove the ones no longer needed.
+                manifest = self.get_index_manifest(files_in_dir, dir_names, img_files)
+                manifest_path = os.path.join(root, global_vars.index_manifest_file)
+                if manifest is not None:
+                    changed += write_file(manifest_path, manifest)
+                elif os.path.isfile(manifest_path):
+                    os.remove(manifest_path)
+
+                stat = os.stat(file_path)
+                entries[key] = {"hash": f"{stat.st_mtime_ns}:{stat.st_size}",
+                                "inputs": {"update_index_files": fingerprint}}
+
+        # Only keep the index files which still exist.
+        fingerprints.pages = entries
+        fingerprints.save()
+        if skipped:
+            output_text(f"Skipped {skipped} index files whose directory did not change.", option="note")
+        report_changed_files(changed)
+        output_text("All index.html files updated.")
+
+
+    def list_index_entries(self, dir_path, snapshot=None):
+        """
+        Lists the entries of a directory that belong in its index file.
+
+        Args:
+            dir_path (str): The directory to list.
+            snapshot (dict, optional): The directory listings already read, see list_directory(). Defaults to None.
 
-        # Loop through each index file found
-        for file in global_vars.all_index_files:
+        Returns:
+            tuple: The names of the html, image, directory, mp3 and txt entries in the directory, the set of those
+                names which are directories, and the contents of the directory's img folder (if any).
+        """
+        files_in_dir = []
+        dir_names = set()
 
-            # check if the file still exists.
-            if not os.path.isfile(file):
-                output_text(f"File no longer exists: {file}", option="warning")
+        # Add each html file to the list of html files in that directory.
+        for file_name, is_dir, is_symlink in list_directory(dir_path, snapshot):
+            # The build cache and outputs are not part of the campaign.
+            if file_name in (global_vars.cache_dir, global_vars.dist_dir, global_vars.assets_dir):
                 continue
+            if is_dir:
+                dir_names.add(file_name)
+            if file_name.endswith(".html") or is_image_file(file_name) or is_dir or file_name.endswith(
+                    ".mp3") or file_name.endswith(".txt"):
+                files_in_dir.append(file_name)
 
-            with open(file, 'r+') as f:
-                file_data = f.read()
+        img_files = []
+        if "img" in dir_names:
+            img_files = [file_name for file_name, is_dir, is_symlink in
+                         list_directory(os.path.join(dir_path, "img"), snapshot)]
 
-                # Find all HTML files in same directory as current file
-                dir_path = os.path.dirname(file)
-                files_in_dir = []
-
-                # Add each html file to the list of html files in that directory.
-                for file_name in os.listdir(dir_path):
-                    file_path = os.path.join(dir_path, file_name)
-                    if file_name.endswith(".html") or is_image_file(file_name) or os.path.isdir(
-                            file_path) or file_name.endswith(".mp3") or file_name.endswith(".txt"):
-                        files_in_dir.append(file_name)
-
-                # Create index links div section if it does not exist
-                index_links_pattern = r'<div\s+class\s*=\s*["\']indexLinks["\']\s*>.*?</div>'
-                index_links_match = re.search(index_links_pattern, file_data, re.DOTALL)
-                if not index_links_match:
-                    index_links_div = '<div class="indexLinks"><ul></ul></div>'
-                    file_data = re.sub(r'</body>', index_links_div + '\n</body>', file_data)
-
-                # Update index links
-                index_links_div_pattern = r'<div\s+class\s*=\s*["\']indexLinks["\']\s*><ul>'
-                index_links_div_match = re.search(index_links_div_pattern, file_data, re.DOTALL)
-                index_links_div = index_links_div_match.group(
-                    0) if index_links_div_match else '<div class="indexLinks"><ul>'
-                index_links = ''
-                for file_n in files_in_dir:
-                    if file_n != 'index.html':
-                        link_text = file_n.replace('.html', '').replace('_', " ")
-                        file_path = os.path.join(dir_path, file_n)
-                        if os.path.isdir(file_path):
-                            if file_n == "img":
-                                for image in os.listdir(file_path):
-                                    if is_image_file(image):
-                                        img_link = "img/" + image
-                                        link = f'<li><a href="{img_link}" class="image-index-link">{img_link}</a></li>'
-                                        index_links += f'{link}\n'
-                                continue
-                            else:
-                                dir_link = file_n + "/index.html"
-                                link = f'<li><a href="{dir_link}" class="dir-index-link">{link_text}</a></li>'
-                        else:
-                            link = f'<li><a href="{file_n}">{link_text}</a></li>'
-                        index_links += f'{link}\n'
-
-                index_links = alphabetize_links(index_links)
-                index_links = self.move_dir_items_to_end(index_links)
-                index_links = self.move_img_items_to_end(index_links)
-
-                # Replace index links in file
-                updated_data = re.sub(index_links_pattern, index_links_div + '\n' + index_links + '</ul></div>',
-                                      file_data, flags=re.DOTALL)
+        return files_in_dir, dir_names, img_files
 
-                # Write updated file data to file
-                f.seek(0)
-                f.write(updated_data)
-                f.truncate()
-                output_text(f"{file} updated")
-        output_text("All index.html files updated.")
+
+    def get_index_fingerprint(self, files_in_dir, dir_names, img_files):
+        """
+        Returns the fingerprint of the entries an index file lists, the hash of their names and types. The links of an
+        index file only change when the fingerprint of its directory changes.
+
+        Args:
+            files_in_dir (list): The entry names to link, as returned by list_index_entries().
+            dir_names (set): The entry names which are directories.
+            img_files (list): The contents of the directory's img folder.
+
+        Returns:
+            str: The fingerprint.
+        """
+        # The links are sorted, so the order of the listing does not matter. The pagination settings decide which links
+        # the index file lists.
+        return get_content_hash(repr((sorted(files_in_dir), sorted(dir_names), sorted(img_files),
+                                      global_vars.index_page_size, global_vars.index_script_path)))
+
+
+    def get_index_entries(self, files_in_dir, dir_names, img_files):
+        """
+        Returns the links of an index file, in the order they are listed: the files alphabetized by link text, then the
+        directories and then the images. This is the order alphabetize_links(), move_dir_items_to_end() and
+        move_img_items_to_end() give the links, computed with a single sort.
+
+        Args:
+            files_in_dir (list): The entry names to link, as returned by list_index_entries().
+            dir_names (set): The entry names which are directories.
+            img_files (list): The contents of the directory's img folder.
+
+        Returns:
+            list: The (group, link_text, href, link_class, html) of each link. The group is 0 for files, 1 for
+                directories and 2 or 3 for the links moved to the end with the images.
+        """
+        entries = []
+        for file_n in files_in_dir:
+            if file_n == 'index.html':
+                continue
+            link_text = file_n.replace('.html', '').replace('_', " ")
+            if file_n in dir_names:
+                if file_n == "img":
+                    for image in img_files:
+                        if is_image_file(image):
+                            img_link = "img/" + image
+                            entries.append((img_link, img_link, "image-index-link"))
+                    continue
+                entries.append((link_text, file_n + "/index.html", "dir-index-link"))
+            else:
+                entries.append((link_text, file_n, None))
+
+        links = []
+        for link_text, href, link_class in entries:
+            # Like alphabetize_links(), leave out the links it can not parse back.
+            if not link_text or '<' in link_text or not href or '"' in href:
+                continue
+            if link_class == "image-index-link":
+                html = f'<li><a href="{href}" class="{link_class}"><i class="fas fa-camera"></i> {link_text}</a></li>'
+            elif link_class == "dir-index-link":
+                html = f'<li><a href="{href}" class="{link_class}"><i class="fas fa-folder"></i> {link_text}</a></li>'
+            else:
+                html = f'<li><a href="{href}">{link_text}</a></li>'
+            # The same tests move_img_items_to_end() and move_dir_items_to_end() use to move links to the end.
+            group = 2 * ("img/" in html) + ("/index.html" in html)
+            links.append((group, link_text, href, link_class, html))
+
+        # Links with the same text are ordered by href, so the order of the listing does not matter.
+        links.sort(key=lambda link: link[:3])
+        return links
+
+
+    def create_index_links(self, files_in_dir, dir_names, img_files, limit=None):
+        """
+        Returns the list items of the links of an index file. See get_index_entries().
+
+        Args:
+            files_in_dir (list): The entry names to link, as returned by list_index_entries().
+            dir_names (set): The entry names which are directories.
+            img_files (list): The contents of the directory's img folder.
+            limit (int, optional): The number of links to list, from the start. Defaults to None (every link).
+
+        Returns:
+            str: The list items, one per line.
+        """
+        links = self.get_index_entries(files_in_dir, dir_names, img_files)[:limit]
+        files = [link[4] for link in links if link[0] == 0]
+        others = [link[4] for link in links if link[0] != 0]
+        # The files end with a newline, which moving the other links to the end leaves between them.
+        return "\n".join(files + [""] + others)
+
+
+    def get_index_manifest(self, files_in_dir, dir_names, img_files):
+        """
+        Returns the JSON manifest of the links of an index file, used by paginated index pages (see
+        update_index_file_content()) to render the links which are not in the index file.
+
+        Args:
+            files_in_dir (list): The entry names to link, as returned by list_index_entries().
+            dir_names (set): The entry names which are directories.
+            img_files (list): The contents of the directory's img folder.
+
+        Returns:
+            str: The manifest, listing every link in order (see format_index_manifest()), or None if the index file
+                lists every link itself (global_vars.index_page_size links or less).
+        """
+        links = self.get_index_entries(files_in_dir, dir_names, img_files)
+        if len(links) <= global_vars.index_page_size:
+            return None
+        return format_index_manifest([[link_text, href, link_class]
+                                      for group, link_text, href, link_class, html in links])
+
+
+    def update_index_file_content(self, file_data, files_in_dir, dir_names, img_files, root="."):
+        """
+        Updates the contents of an index file to include links to the given directory entries.
+
+        Args:
+            file_data (str): The current contents of the index file.
+            files_in_dir (list): The entry names to link, as returned by list_index_entries().
+            dir_names (set): The entry names which are directories.
+            img_files (list): The contents of the directory's img folder.
+            root (str, optional): The directory of the index file, used to link the script of paginated index pages.
+                Defaults to the current directory.
+
+        Returns:
+            str: The updated contents of the index file.
+
+        If the index links div section does not exist in the file, it is added just before the closing </body> tag.
+        The links are alphabetized with directories and then images moved to the end of the list, see
+        create_index_links().
+
+        Directories with more than global_vars.index_page_size links get a paginated index page, so large directories
+        open right away and adding a file to them does not change their index file: only the first links are listed,
+        followed by a script (global_vars.index_script_path) rendering the others from the JSON manifest of the
+        directory (see get_index_manifest()) as the page is scrolled.
+        """
+        # Create index links div section if it does not exist
+        index_links_pattern = r'<div\s+class\s*=\s*["\']indexLinks["\']\s*>.*?</div>'
+        index_links_match = re.search(index_links_pattern, file_data, re.DOTALL)
+        if not index_links_match:
+            index_links_div = '<div class="indexLinks"><ul></ul></div>'
+            file_data = re.sub(r'</body>', index_links_div + '\n</body>', file_data)
+
+        # Update index links
+        index_links_div_pattern = r'<div\s+class\s*=\s*["\']indexLinks["\']\s*><ul>'
+        index_links_div_match = re.search(index_links_div_pattern, file_data, re.DOTALL)
+        index_links_div = index_links_div_match.group(
+            0) if index_links_div_match else '<div class="indexLinks"><ul>'
+        index_links = self.create_index_links(files_in_dir, dir_names, img_files, global_vars.index_page_size)
+        index_script = ""
+        if self.get_index_manifest(files_in_dir, dir_names, img_files) is not None:
+            index_script = f'<script defer="" src="{self.get_root_link(root, global_vars.index_script_path)}"></script>'
+
+        # Replace index links in file
+        return re.sub(index_links_pattern, index_links_div + '\n' + index_links + '</ul>' + index_script + '</div>',
+                      file_data, flags=re.DOTALL)
 
 
     def update_headers(self, directory=global_vars.root_dir):
@@ -571,71 +892,179 @@ class MMORPDND:
             None.
 
         This method performs the following steps:
-        1. Loop through all HTML files in the specified directory and its subdirectories.
-        2. For each HTML file found that does not contain "template" in its filename:
+        1. Read the header template (see get_layout_templates()) and write the shared layout script, if any.
+        2. Loop through all HTML files in the specified directory and its subdirectories.
+        3. For each HTML file found that does not contain "template" in its filename:
             - Read the contents of the HTML file.
             - Check if the file is in the list of directories to exclude.
-            - Read the contents of the header template file.
             - Replace the header section in the HTML file with the contents of the template.
             - Generate a title based on the filename and replace the title section in the HTML file.
             - Determine the relative path to the CSS file.
             - Calculate the number of subdirectories between the HTML file and the CSS file.
             - Create the correct link path for the CSS file.
             - Replace the placeholder in the HTML file with the link to the CSS file.
-            - Overwrite the HTML file with the updated contents.
+            - Overwrite the HTML file with the updated contents, if they changed (see write_file()).
             - Print a progress update indicating the file that has been updated.
-        3. Print a message indicating that the headers and CSS have been updated in all relevant HTML files.
+        4. Print a message indicating that the headers and CSS have been updated in all relevant HTML files.
 
         Note: The method relies on regular expressions for pattern matching and modification.
 
         Example usage:
             update_headers()
         """
+        # Read the contents of the template file, and write the shared layout script if there is one.
+        template, nav_contents, layout_script = self.get_layout_templates()
+        changed = self.write_layout_script(layout_script)
+
         # Loop through all HTML files in the current directory and its subdirectories
-        for root, dirnames, filenames in os.walk(directory):
+        for root, dirnames, filenames in walk_directory(directory, global_vars.directories_to_exclude):
             for filename in filenames:
                 # check for html file and if "Template" is in filename.
                 if filename.endswith(".html") and "template" not in filename:
                     # Read the contents of the HTML file
                     file_path = os.path.join(root, filename)
 
-                    # Check if we are looking at a file in our exclude list.
-                    if any(exclude in file_path for exclude in global_vars.directories_to_exclude):
-                        continue
-
                     with open(file_path, "r") as f:
                         contents = f.read()
 
-                    # Read the contents of the template file
-                    with open(global_vars.header_template_file, "r") as f:
-                        template = f.read()
+                    contents = self.apply_header_template(contents, filename, root, template)
+
+                    # Overwrite the HTML file with the updated contents, if they changed.
+                    if write_file(file_path, contents):
+                        changed += 1
+                        output_text(f"Updated head and css in {file_path}")  # Print progress update
+        report_changed_files(changed)
+
+
+    def apply_header_template(self, contents, filename, root, template):
+        """
+        Replaces the header of an HTML document with the header template.
+
+        Args:
+            contents (str): The contents of the HTML file.
+            filename (str): The name of the HTML file, used to generate the title.
+            root (str): The directory containing the HTML file, used to locate the CSS file.
+            template (str): The contents of the header template file.
+
+        Returns:
+            str: The updated contents of the HTML file.
+        """
+        # Replace the header section with the contents of the template
+        contents = re.sub(global_vars.header_regex, template, contents)
+
+        title = "<title>" + filename.split('.')[0].replace('_', ' ') + "</title>"
+        output_text(f"title: {title}")
+
+        # Replace the title section with the file name
+        contents = re.sub(global_vars.title_regex, title, contents)
+
+        # Replace the placeholder with the link to the CSS file
+        link_path = self.get_root_link(root, global_vars.css_path)
+        contents = contents.replace("%OPENAICSS%", f'<link href="{link_path}" rel="stylesheet"/>')
 
-                    # Replace the header section with the contents of the template
-                    contents = re.sub(global_vars.header_regex, template, contents)
+        # Replace the placeholder of the "include" layout mode with the link to the shared layout script.
+        return contents.replace("%MMORPDNDLAYOUT%", self.get_root_link(root, global_vars.layout_script_path))
 
-                    title = "<title>" + filename.split('.')[0].replace('_', ' ') + "</title>"
-                    output_text(f"title: {title}")
 
-                    # Replace the title section with the file name
-                    contents = re.sub(global_vars.title_regex, title, contents)
+    def get_root_link(self, root, path):
+        """
+        Returns the link from the HTML files of a directory to a file in the campaign root, such as the CSS file.
+
+        Args:
+            root (str): The directory containing the HTML files.
+            path (str): The path of the file, relative to the campaign root.
+
+        Returns:
+            str: The link.
+        """
+        # Determine the relative path to the file
+        relative_path = os.path.relpath(path, start=root)
+
+        # Determine the number of subdirectories between the HTML file and the file
+        num_subdirs = relative_path.count(os.sep) - 1
+
+        # Create the correct link path for the file
+        return "../" * num_subdirs + path
 
-                    # Determine the relative path to the CSS file
-                    css_relative_path = os.path.relpath(global_vars.css_path, start=root)
 
-                    # Determine the number of subdirectories between the HTML file and the CSS file
-                    num_subdirs = css_relative_path.count(os.sep) - 1
+    def get_layout_templates(self):
+        """
+        Returns the header and navigation templates the HTML files get, depending on the layout mode.
+
+        In the "inline" mode these are the template files as they are. In the "include" mode the scripts of the header
+        template and the navigation block move into a shared layout script (see create_layout_script()): the header
+        template keeps everything else (the title and CSS link are still set per file) and a script tag loading the
+        layout script, and the navigation template is an empty navigation block the layout script fills. The pages then
+        hold neither the scripts nor the navigation bar, and browsers cache the layout script across pages. Its URL
+        holds the hash of the script (?v=<hash>), so browsers load the new script as soon as the templates change
+        instead of running a cached one against the new pages.
+
+        Returns:
+            tuple: The header template, the navigation template and the layout script (None in the "inline" mode).
+        """
+        with open(global_vars.header_template_file, "r") as f:
+            header_template = f.read()
+        with open(global_vars.nav_template_file, "r") as f:
+            nav_template = f.read()
+        if self.layout_mode != "include":
+            return header_template, nav_template, None
+
+        layout_script = self.create_layout_script(header_template, nav_template)
+        header_template = global_vars.script_regex.sub("", header_template)
+        version = get_content_hash(layout_script)[:12]
+        header_template = header_template.replace(
+            "</head>", f' <script defer="" src="%MMORPDNDLAYOUT%?v={version}"></script>\n</head>')
+        return header_template, '<div class="navigation"></div>', layout_script
+
+
+    def create_layout_script(self, header_template, nav_template):
+        """
+        Returns the shared layout script of the "include" layout mode. It runs the scripts of the header template,
+        loading the external ones (such as the Font Awesome kit) with the same attributes, then replaces the navigation
+        block of the page with the navigation template. The pages load it deferred, so it runs once they are parsed.
 
-                    # Create the correct link path for the CSS file
-                    link_path = "../" * num_subdirs + global_vars.css_path
+        Args:
+            header_template (str): The contents of the header template file.
+            nav_template (str): The contents of the navigation template file.
 
-                    # Replace the placeholder with the link to the CSS file
-                    contents = contents.replace("%OPENAICSS%", f'<link href="{link_path}" rel="stylesheet"/>')
+        Returns:
+            str: The script. Its first line holds its version, the hash of the rest of the script.
+        """
+        parts = []
+        for attributes, code in global_vars.script_regex.findall(header_template):
+            attributes = re.findall(r'([\w-]+)="([^"]*)"', attributes)
+            if any(name == "src" for name, value in attributes):
+                parts.append('(function () {\n    var script = document.createElement("script");\n' +
+                             "".join(f"    script.setAttribute({json.dumps(name)}, {json.dumps(value)});\n"
+                                     for name, value in attributes) +
+                             "    document.head.appendChild(script);\n})();")
+            elif code.strip():
+                parts.append(code.strip())
+        parts.append('document.querySelectorAll("div.navigation").forEach(function (navigation) {\n'
+                     f'    navigation.outerHTML = {json.dumps(nav_template.strip())};\n'
+                     '});')
+
+        script = "\n\n".join(parts) + "\n"
+        return (f"// MMORPDND layout {get_content_hash(script)[:12]}, generated from "
+                f"{global_vars.header_template_file} and {global_vars.nav_template_file}.\n{script}")
+
+
+    def write_layout_script(self, layout_script, directory="."):
+        """
+        Writes the shared layout script of the "include" layout mode, if it changed.
 
-                    # Overwrite the HTML file with the updated contents 
-                    with open(file_path, "w") as f:
-                        f.write(contents)
+        Args:
+            layout_script (str): The layout script, see get_layout_templates(). Nothing is written when this is None.
+            directory (str, optional): The campaign root. Defaults to the current directory.
 
-                    output_text(f"Updated head and css in {file_path}")  # Print progress update
+        Returns:
+            int: The number of files written, 1 or 0.
+        """
+        path = os.path.join(directory, global_vars.layout_script_path)
+        if layout_script is None or not write_file(path, layout_script):
+            return 0
+        output_text(f"Updated the shared layout script {path}")
+        return 1
 
 
     def update_navigation(self, directory=global_vars.root_dir):
@@ -652,12 +1081,12 @@ class MMORPDND:
             None.
 
         This method performs the following steps:
-        1. Loop through all HTML files in the specified directory and its subdirectories.
-        2. For each HTML file found that does not contain "template" in its filename:
+        1. Read the navigation template (see get_layout_templates()) and write the shared layout script, if any.
+        2. Loop through all HTML files in the specified directory and its subdirectories.
+        3. For each HTML file found that does not contain "template" in its filename:
             - Read the contents of the HTML file.
             - Check if the file is in the list of directories to exclude.
             - Print a progress message indicating the file being processed.
-            - Read the contents of the navigation template file.
             - Find the navigation block in the original HTML file using a regular expression.
             - If a navigation block is found:
                 - Replace the navigation block in the HTML file with the contents of the template.
@@ -674,52 +1103,60 @@ class MMORPDND:
         Example usage:
             update_navigation()
         """
+        # open the nav file and read the contents, and write the shared layout script if there is one.
+        template, nav_contents, layout_script = self.get_layout_templates()
+        changed = self.write_layout_script(layout_script)
+
         # loop through all files in directory and subdirectories
-        for root, dirnames, filenames in os.walk(directory):
+        for root, dirnames, filenames in walk_directory(directory, global_vars.directories_to_exclude):
             for filename in filenames:
                 if filename.endswith(".html") and "template" not in filename:
                     # open the file and read the contents
                     file_path = os.path.join(root, filename)
 
-                    # Check if we are looking at a file in our exclude list.
-                    if any(exclude in file_path for exclude in global_vars.directories_to_exclude):
-                        continue
-
                     output_text(f"Processing file: {file_path}")
 
                     # Read the original contents of the file in.
                     with open(file_path, "r") as file:
                         contents = file.read()
 
-                    # open the nav file and read the contents
-                    with open(global_vars.nav_template_file, "r") as file:
-                        nav_contents = file.read()
+                    contents = self.apply_navigation_template(contents, nav_contents)
 
-                    # Find the navigation block in the original HTML file
-                    navRegex = re.compile(r'<div class="navigation">(.*?)</div>', re.DOTALL)
-                    navMatch = navRegex.search(contents)
+                    # overwrite the file with the new contents, if they changed.
+                    if write_file(file_path, contents):
+                        changed += 1
+        report_changed_files(changed)
 
-                    if navMatch:
-                        output_text(" -- Found navigation block")
-                        # Replace the navigation block with the contents of the template
-                        contents = contents.replace(navMatch.group(0), nav_contents)
 
-                        # Write the modified HTML back to the file
-                        with open(file_path, 'w') as f:
-                            f.write(contents)
+    def apply_navigation_template(self, contents, nav_contents):
+        """
+        Replaces the navigation block of an HTML document with the navigation template.
 
-                        output_text(" -- Replaced navigation block!")
-                    else:
-                        output_text(" -- Navigation block not found!")
+        Args:
+            contents (str): The contents of the HTML file.
+            nav_contents (str): The contents of the navigation template file.
 
-                        # insert the nav contents at the start of the body tag
-                        new_contents = contents.replace("<body>", f"<body>\n{nav_contents}")
+        Returns:
+            str: The updated contents of the HTML file. If no navigation block is found, the navigation contents are
+                inserted at the start of the body tag.
+        """
+        # Find the navigation block in the original HTML file
+        navRegex = re.compile(r'<div class="navigation">(.*?)</div>', re.DOTALL)
+        navMatch = navRegex.search(contents)
+
+        if navMatch:
+            output_text(" -- Found navigation block")
+            # Replace the navigation block with the contents of the template
+            contents = contents.replace(navMatch.group(0), nav_contents)
+            output_text(" -- Replaced navigation block!")
+        else:
+            output_text(" -- Navigation block not found!")
 
-                        # overwrite the file with the new contents
-                        with open(file_path, "w") as file:
-                            file.write(new_contents)
+            # insert the nav contents at the start of the body tag
+            contents = contents.replace("<body>", f"<body>\n{nav_contents}")
+            output_text(" -- Inserted nav contents at the start of the body tag")
 
-                        output_text(" -- Inserted nav contents at the start of the body tag")
+        return contents
                         
 
     def beautify_files(self, directory=global_vars.root_dir):
@@ -742,11 +1179,13 @@ class MMORPDND:
             - Constructs the file path.
             - Checks if the file is an HTML or CSS file, and skips it if not.
             - Reads the contents of the file.
+            - Skips the file if its hash is the hash of the prettified contents written by the last run, as it is
+              already formatted. The hashes are stored in the cache directory (see global_vars.beautify_cache_file).
             - If the file is an HTML file:
-                - Uses BeautifulSoup to parse the HTML and prettify it.
+                - Uses BeautifulSoup (or the fast formatter, see self.html_formatter) to parse the HTML and prettify it.
             - If the file is a CSS file:
                 - Uses cssbeautifier to prettify the CSS code.
-            - Writes the prettified code back to the file.
+            - Writes the prettified code back to the file if it changed.
             - Prints a message indicating that the file has been prettified.
 
         Note: The method relies on BeautifulSoup for HTML parsing and prettifying, and cssbeautifier for CSS prettifying.
@@ -763,45 +1202,82 @@ class MMORPDND:
         if "css" in modified_directories_to_exclude:
             modified_directories_to_exclude.remove("css")
 
+        formatted = MMORPDND_MANIFEST(os.path.join(directory, global_vars.cache_dir, global_vars.beautify_cache_file))
+        formatted.load()
+        entries = {}
+        skipped = 0
+        changed = 0
+
         # Loop through all files and subdirectories in the directory
-        for root, dirnames, filenames in os.walk(directory):
+        for root, dirnames, filenames in walk_directory(directory, modified_directories_to_exclude):
             # Loop through all HTML files in the current directory
             for file in filenames:
                 file_path = os.path.join(root, file)
 
-                # Check if we are looking at a file in our exclude list.
-                if any(exclude in file_path for exclude in modified_directories_to_exclude):
-                    continue
-
                 if not file.endswith(".html") and not file.endswith(".css"):
                     continue
 
                 # Read in the HTML file
-                output_text(f"file_path : {file_path}")
                 with open(file_path, "r") as f:
                     contents = f.read()
 
-                # html files.
-                if file.endswith(".html"):
-                    # Use BeautifulSoup to parse the HTML and prettify it
-                    soup = BeautifulSoup(contents, "html.parser")
-                    prettified_content = soup.prettify()
-
-                    # This section fixes a bug with the newline and spaces on the newline adding a space before the commas.
-                    prettified_content = re.sub(r'[\s\n]+,', ',', prettified_content)
-                    prettified_content = re.sub(r'[\s\n]+</a>,', '</a>,', prettified_content)
+                # Files still holding the output of the last run are already formatted.
+                key = os.path.relpath(file_path, directory)
+                if formatted.is_up_to_date(key, get_content_hash(contents), "beautify_files", ""):
+                    entries[key] = formatted.pages[key]
+                    skipped += 1
+                    continue
 
-                # html files.
-                elif file.endswith(".css"):
-                    # Use cssbeautifier to prettify the CSS code
-                    prettified_content = beautify(contents)
+                output_text(f"file_path : {file_path}")
+                prettified_content = self.prettify_file_content(file, contents)
 
                 # Write the prettified code back to the file
-                with open(file_path, "w") as f:
-                    f.write(prettified_content)
+                if write_file(file_path, prettified_content):
+                    changed += 1
 
                 output_text(f"File {file_path} has been prettified.")
-                
+                entries[key] = {"hash": get_content_hash(prettified_content), "inputs": {"beautify_files": ""}}
+
+        # Only keep the files which still exist.
+        formatted.pages = entries
+        formatted.save()
+        if skipped:
+            output_text(f"Skipped {skipped} files which are already formatted.", option="note")
+        report_changed_files(changed)
+
+
+    def prettify_file_content(self, file, contents):
+        """
+        Prettifies the contents of an HTML or CSS file.
+
+        Args:
+            file (str): The name of the file, used to determine its type.
+            contents (str): The contents of the file.
+
+        Returns:
+            str: The prettified contents.
+        """
+        # html files.
+        if file.endswith(".html"):
+            if self.html_formatter == "fast":
+                # The fast formatter writes the same output as BeautifulSoup, without building a parse tree.
+                prettified_content = prettify_html(contents)
+            else:
+                # Use BeautifulSoup to parse the HTML and prettify it
+                import_html_libraries()
+                soup = BeautifulSoup(contents, "html.parser")
+                prettified_content = soup.prettify()
+
+            # This section fixes a bug with the newline and spaces on the newline adding a space before the commas.
+            prettified_content = re.sub(r'[\s\n]+,', ',', prettified_content)
+            prettified_content = re.sub(r'[\s\n]+</a>,', '</a>,', prettified_content)
+            return prettified_content
+
+        # css files.
+        # Use cssbeautifier to prettify the CSS code
+        import_html_libraries()
+        return beautify(contents)
+
 
     def find_all_html_files(self, directory=global_vars.root_dir):
         """
@@ -814,14 +1290,10 @@ class MMORPDND:
                  of each HTML file found.
         """
         html_files = []
-        for root, dirnames, filenames in os.walk(directory):
+        for root, dirnames, filenames in walk_directory(directory, global_vars.directories_to_exclude):
             for filename in filenames:
                 file_path = os.path.join(root, filename)
 
-                # Check if we are looking at a file in our exclude list.
-                if any(exclude in file_path for exclude in global_vars.directories_to_exclude):
-                    continue
-
                 if filename.endswith('.html') and "index.html" not in filename:
                     name_no_ext = os.path.splitext(filename)[0]
                     html_files.append({
@@ -834,8 +1306,9 @@ class MMORPDND:
         
     def get_all_html_files(self, root_folder):
         """
-        Recursively find all HTML files in the given root folder. Slightly different than 
-        find_all_html_files() as this method includes index.html files.
+        Recursively find all HTML files in the given root folder, skipping the directories in
+        global_vars.directories_to_exclude. Slightly different than find_all_html_files() as this method includes
+        index.html files.
 
         Args:
             root_folder (str): The root directory to search for HTML files.
@@ -843,7 +1316,9 @@ class MMORPDND:
         Returns:
             list: A list of file paths to all HTML files found.
         """
-        return glob.glob(os.path.join(root_folder, '**', '*.html'), recursive=True)
+        return [os.path.join(root, filename)
+                for root, dirnames, filenames in walk_directory(root_folder, global_vars.directories_to_exclude)
+                for filename in filenames if filename.endswith('.html')]
 
 
     def is_valid_link(self, link, base_path):
@@ -860,6 +1335,14 @@ class MMORPDND:
         return os.path.isfile(os.path.join(base_path, link))
 
 
+    def is_checked_link(self, link):
+        """
+        Returns whether a link is checked by remove_broken_links. Music links, web links and navigation links ('#') are
+        never checked.
+        """
+        return not (link == "#" or "/music/" in link or link.startswith(('http://', 'https://')))
+
+
     def remove_broken_links_from_html_file(self, file_path):
         """
         Parse an HTML file, identify and remove invalid local links while preserving link text, 
@@ -870,7 +1353,7 @@ class MMORPDND:
             file_path (str): The file path of the HTML file to process.
     
         Returns:
-            None
+            bool: True if the file changed.
     
         Notes:
             - Skips links starting with 'http://', 'https://', containing '/music/', or equal to '#'.
@@ -880,11 +1363,33 @@ class MMORPDND:
         """
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
-                soup = BeautifulSoup(file, 'html.parser')
+                contents = file.read()
         except IOError as e:
             output_text(f"Failed to read {file_path}: {e}", option="error")
-            return
+            return False
+
+        updated_contents = self.remove_broken_links_from_html(contents, file_path)
+        return updated_contents is not None and write_file(file_path, updated_contents)
+
+
+    def remove_broken_links_from_html(self, contents, file_path, is_valid_link=None):
+        """
+        Identify and remove invalid local links from the contents of an HTML file while preserving link text.
+
+        Args:
+            contents (str): The contents of the HTML file.
+            file_path (str): The file path of the HTML file, used to resolve relative links.
+            is_valid_link (callable, optional): A method taking (link, base_path) and returning whether the link is
+                valid. Defaults to is_valid_link, which checks the file system.
+
+        Returns:
+            str or None: The updated contents if invalid links were found and removed, otherwise None.
+        """
+        if is_valid_link is None:
+            is_valid_link = self.is_valid_link
 
+        import_html_libraries()
+        soup = BeautifulSoup(contents, 'html.parser')
         base_path = os.path.dirname(file_path)
         invalid_links = []
         
@@ -892,18 +1397,19 @@ class MMORPDND:
             link = tag['href']
             
             # skip music links, web links, and navigation links.
-            if link == "#" or "/music/" in link or link.startswith(('http://', 'https://')):
+            if not self.is_checked_link(link):
                 continue
                 
-            if not self.is_valid_link(link, base_path):
+            if not is_valid_link(link, base_path):
                 invalid_links.append(link)
                 tag.unwrap()  # Remove the link but keep the text
 
-        if invalid_links:
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.write(str(soup))
-            for link in invalid_links:
-                output_text(f"Invalid link {link} found and removed from {file_path}", option="warning")
+        if not invalid_links:
+            return None
+
+        for link in invalid_links:
+            output_text(f"Invalid link {link} found and removed from {file_path}", option="warning")
+        return str(soup)
 
 
     def remove_broken_links(self, root_folder=global_vars.root_dir):
@@ -924,14 +1430,14 @@ class MMORPDND:
         """    
         html_files = self.get_all_html_files(root_folder)
         
+        changed = 0
         for html_file in html_files:        
-            # Check if we are looking at a file in our exclude list.
-            if any(exclude in html_file for exclude in global_vars.directories_to_exclude):
-                continue                
             try:
-                self.remove_broken_links_from_html_file(html_file)
+                if self.remove_broken_links_from_html_file(html_file):
+                    changed += 1
             except Exception as e:
                 output_text(f"Failed to process {html_file}: {e}", option="error")    
+        report_changed_files(changed)
 
 
     def update_html_links(self, directory=global_vars.root_dir):
@@ -948,18 +1454,19 @@ class MMORPDND:
         Notes:
             - Retrieves HTML files using find_all_html_files.
             - Skips files containing '_public' in their path.
-            - Searches body text for file names (and variations like plurals) from the retrieved files.
+            - Searches body text for file names (and variations like plurals) from the retrieved files, in a single
+              pass per file using an MMORPDND_LINKER. The longest name is linked where names overlap.
             - Replaces matches with <a> tags linking to the relative file paths.
             - Prints progress and updates using output_text.
         """
         html_files = self.find_all_html_files(directory)        
 
-        # Sort html_files by length, longest file names first for linking names. This fixes a bug with
-        # file names that contain others not being the primary link chosen.
-        search_words = sorted(html_files, key=len, reverse=True)
+        # Build the linker once for all files. It links the longest name where names overlap.
+        linker = self.create_linker(html_files)
         
         # keep track of which number we're on.
         index = 0        
+        changed = 0
         # Get the total number of items in html_files
         total = len(html_files)
         # Calculate the width for the progress display (based on the total number of items)
@@ -983,160 +1490,105 @@ class MMORPDND:
             with open(file_path, 'r') as f:
                 content = f.read()
 
-            # Use regular expressions to find the body text of the HTML file
-            body_match = re.search("<body.*?>(.*?)</body>", content, flags=re.DOTALL)
-            if body_match:
-                body_text = body_match.group(1)
-                # Search the body text for the search string
-                for search_word in search_words:
-                    search_string = search_word['name_no_ext']                    
-                    
-                    # Skip the public files.
-                    if "_public" in search_string:
-                        continue
-
-                    # No need to link it it's to the current file.
-                    if search_string == file_info['name_no_ext']:
-                        continue
-
-                    # Define the patterns to search for.
-                    patterns = []
-                    # Append a regular expression pattern to the `patterns` list
-                    # The pattern matches the exact word `search_string` as a standalone word, avoiding matches within HTML tags or attributes
-                    # The `(?ix)` flags enable case-insensitive and verbose mode for the regular expression
-                    # The `(?<![-/">])` negative lookbehind ensures that the word is not preceded by certain characters (-, /, ", or >)
-                    # The `(?<!>)` negative lookbehind ensures that the word is not preceded by the > character (to exclude matches within HTML tags)
-                    # The `\b` word boundary markers ensure that the word is not part of a larger word
-                    # The `re.escape(search_string)` escapes any special characters in the search_string to treat it literally
-                    # The `(?<![-/.])` negative lookbehind ensures that the word is not preceded by certain characters (-, /, or .) to exclude matches within URLs or file paths
-                    # The `(?![^<]*<\/a>)` negative lookahead ensures that the word is not followed by </a> to exclude matches within HTML anchor tags
-                    patterns.append(
-                        r'(?ix)(?<![-/">])(?<!>)\b{}\b(?<![-/.])(?![^<]*<\/a>)'.format(re.escape(search_string)))
-                    patterns.append(r'(?ix)(?<![-/">])(?<!>)\b{}\b(?<![-/.])(?![^<]*<\/a>)'.format(
-                        re.escape(search_string.replace('_', ' '))))
-                    # Search for the plural strings too.
-                    if not search_string.endswith('s'):
-                        patterns.append(r'(?ix)(?<![-/">])(?<!>)\b{}\b(?<![-/.])(?![^<]*<\/a>)'.format(
-                            re.escape(search_string.replace('_', ' ') + 's')))
-                        patterns.append(r'(?ix)(?<![-/">])(?<!>)\b{}\b(?<![-/.])(?![^<]*<\/a>)'.format(
-                            re.escape(search_string.replace('_', ' ') + '\'s')))
-                        patterns.append(r'(?ix)(?<![-/">])(?<!>)\b{}\b(?<![-/.])(?![^<]*<\/a>)'.format(
-                            re.escape(search_string + 's')))
-                        patterns.append(r'(?ix)(?<![-/">])(?<!>)\b{}\b(?<![-/.])(?![^<]*<\/a>)'.format(
-                            re.escape(search_string + '\'s')))
-                    else:
-                        patterns.append(r'(?ix)(?<![-/">])(?<!>)\b{}\b(?<![-/.])(?![^<]*<\/a>)'.format(
-                            re.escape(search_string.replace('_', ' ') + '\'')))
-                        patterns.append(r'(?ix)(?<![-/">])(?<!>)\b{}\b(?<![-/.])(?![^<]*<\/a>)'.format(
-                            re.escape(search_string.replace('_', ' ') + 'es')))
-                        patterns.append(r'(?ix)(?<![-/">])(?<!>)\b{}\b(?<![-/.])(?![^<]*<\/a>)'.format(
-                            re.escape(search_string + '\'')))
-                        patterns.append(r'(?ix)(?<![-/">])(?<!>)\b{}\b(?<![-/.])(?![^<]*<\/a>)'.format(
-                            re.escape(search_string + 'es')))
-
-                    # Search through all possible patterns.
-                    for pattern in patterns:
-                        search_string_match = re.search(pattern, body_text, flags=re.DOTALL | re.VERBOSE)
-                        if search_string_match:
-                            output_text(" -- {0} found in {1}".format(search_string, file_path))
-                            link_path = get_relative_path(file_path, search_word['full_path'])
-
-                            # Replace the search string with the new string
-                            new_string = "<a href=\"{0}\">{1}</a>".format(link_path, search_string.replace('_', ' '))
-                            new_body_text = re.sub(pattern, new_string, body_text)
-                            body_text = new_body_text
-                            body_tags = re.search("<body(.*?)>", content, flags=re.DOTALL)
-                            content = re.sub(r"<body[^>]*>(.*?)</body>", "<body>" + new_body_text + "</body>", content,
-                                             flags=re.DOTALL)
-                            content = re.sub(r"<body>", "<body" + body_tags.group(1) + ">", content, flags=re.DOTALL)
-                            output_text(" -- Replacing {0} with {1}".format(search_string, new_string))
-
-                            # Write the modified HTML file
-                            with open(file_path, "w") as f:
-                                f.write(content)
-
-
-    def publicize_file(self, file_path):
-        """
-        Remove the navigation bar from an HTML file and save the modified content.
-        This will save the updated content to a file with '_public' appended before
-        the html prefix.
-        
-        Note: This method assumes that the file is an HTML file.
+            updated_content = self.link_html_page(content, file_info, linker)
+
+            # Write the modified HTML file
+            if write_file(file_path, updated_content):
+                changed += 1
+        report_changed_files(changed)
+
+
+    def create_linker(self, search_words):
+        """
+        Creates the linker used to link page names in the body text of other pages.
 
         Args:
-            file_path (str): The path to the HTML file to be processed.
+            search_words (list): The find_all_html_files() entries of the files to link to. Where names overlap the
+                longest one is linked, and the entry first in the list breaks ties.
 
         Returns:
-            The name of the output file.
+            MMORPDND_LINKER: The linker, with the name of every non-public file added.
         """
-        # Read the content of the HTML file
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
+        linker = MMORPDND_LINKER()
+        for search_word in search_words:
+            # Skip the public files.
+            if "_public" in search_word['name_no_ext']:
+                continue
+            linker.add_name(search_word['name_no_ext'], search_word)
+        return linker
 
-        # Parse the HTML content
-        soup = BeautifulSoup(content, 'lxml')
 
-        # Find the navigation bar
-        nav_bar = soup.find('div', class_='navigation')
+    def link_html_page(self, content, file_info, linker):
+        """
+        Links occurrences of file names in the body text of an HTML document to their corresponding files.
 
-        # Remove the navigation bar if it exists
-        if nav_bar:
-            nav_bar.decompose()
+        Args:
+            content (str): The contents of the HTML file.
+            file_info (dict): The find_all_html_files() entry of the HTML file being linked.
+            linker (MMORPDND_LINKER): The linker returned by create_linker().
 
-        output_file = file_path[0:-5] + "_public.html"
-        # Write the modified HTML back to the file
-        with open(output_file, 'w', encoding='utf-8') as file:
-            file.write(str(soup))
-            
-        return output_file
+        Returns:
+            str: The updated contents of the HTML file.
+        """
+        file_path = file_info['full_path']
+
+        # Use regular expressions to find the body text of the HTML file
+        body_match = re.search("<body.*?>(.*?)</body>", content, flags=re.DOTALL)
+        if not body_match:
+            return content
+
+        # No need to link it to the current file.
+        body_text, linked = linker.link_text(body_match.group(1),
+                                             lambda search_word: get_relative_path(file_path, search_word['full_path']),
+                                             skipped_name=file_info['name_no_ext'])
+        for search_string, search_word in linked:
+            output_text(" -- {0} found in {1}".format(search_string, file_path))
+            link_path = get_relative_path(file_path, search_word['full_path'])
+            new_string = "<a href=\"{0}\">{1}</a>".format(link_path, search_string.replace('_', ' '))
+            output_text(" -- Replacing {0} with {1}".format(search_string, new_string))
+
+        return content[:body_match.start(1)] + body_text + content[body_match.end(1):]
 
 
-    def remove_links(self, public_file_path):
+    def export_public_html(self, content, page_path, public_pages):
         """
-        Update or remove all <a> tags in an html file. If a public version of the linked file exists,
-        update the link to point to the public file. Otherwise, remove the link entirely.
+        Returns the public version of the contents of an HTML file, in a single parse. The navigation bar is removed
+        and the links to pages which are not public are replaced by their text. The links to public pages are kept as
+        they are, since the public pages keep their place in the exported tree.
 
         Args:
-            public_file_path: The public file path.
+            content (str): The contents of the HTML file.
+            page_path (str): The path of the HTML file, used to resolve relative links.
+            public_pages (set): The normalized paths of the public pages.
 
         Returns:
-            None
+            tuple: The public contents, and the normalized paths of the local images the page shows.
         """
-        # Read the content of the HTML file
-        with open(public_file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-
         # Parse the HTML content
+        import_html_libraries()
         soup = BeautifulSoup(content, 'lxml')
-        
-        # Get the directory of the original file
-        original_dir = os.path.dirname(public_file_path)
-        
+
+        # Remove the navigation bar if it exists
+        nav_bar = soup.find('div', class_='navigation')
+        if nav_bar:
+            nav_bar.decompose()
+
         for a_tag in soup.find_all('a'):
             href = a_tag.get('href')
-            if href and href.endswith('.html'):
-                # Skip the already public links.
-                if "_public" in href:
-                    print(f"Ignoring link for {href}")
-                    continue
-                    
-                # Construct the public version filename
-                public_version = href[:-5] + '_public.html'
-                public_path = os.path.join(original_dir, public_version)
-
-                if os.path.exists(public_path):
-                    print(f"Public link exists for {public_path}")
-                    # Update the href to the public version
-                    a_tag['href'] = public_version
-                else:                
-                    print(f"Removing link for {href}")
-                    # Remove the link but keep the text
-                    a_tag.replace_with(a_tag.text)    
-                    
-        # Write the modified HTML back to the file
-        with open(public_file_path, 'w', encoding='utf-8') as file:
-            file.write(str(soup))
+            if href and href.endswith('.html') and resolve_link(href, page_path) not in public_pages:
+                # Remove the link but keep the text
+                a_tag.replace_with(a_tag.text)
+
+        images = []
+        for img_tag in soup.find_all('img'):
+            # The resized copies listed in the srcset are shown too. See update_images().
+            links = [img_tag.get('src')] + [unquote(candidate.split()[0])
+                                            for candidate in img_tag.get('srcset', '').split(',') if candidate.strip()]
+            for link in links:
+                if link and "://" not in link and not link.startswith(("/", "data:")):
+                    images.append(resolve_link(link, page_path))
+
+        return str(soup), images
 
 
     def get_file_list(self, public_files_list):
@@ -1157,66 +1609,2142 @@ class MMORPDND:
 
         # Process each file in the list
         for file_path in file_list:
-            if "#" == file_path[0] or file_path.strip() == 0:
+            if not file_path.strip() or "#" == file_path[0]:
                 continue
             # Remove any leading/trailing whitespace characters, including newlines
             file_path = global_vars.script_dir + "/" + file_path.strip()
 
             # Check if the file exists
             if os.path.exists(file_path):
-                print(f'File found: {file_path}')
+                output_text(f"File found: {file_path}")
                 files.append(file_path)
             else:
-                print(f'File not found: {file_path}')
+                output_text(f"File not found: {file_path}", option="warning")
         
         return files
 
 
-    def publicize_files(self):
+class MMORPDND_PAGE:
+    """
+    A class storing a single HTML or CSS file of the campaign in memory for MMORPDND_BUILD.
+    """
+
+    def __init__(self, path, text=None):
         """
-        Publicize files.
+        Initialization method.
 
-        Example usage:
-            publicize_files()
+        Args:
+            path (str): The path of the file.
+            text (str, optional): The contents of the file on disk, or None if the file does not exist yet.
         """
-        
-        # Path to the text file containing the list of HTML files
-        public_files_list = 'templates/lists/public_files.list'
-        
-        # Check if the file exists
-        if os.path.exists(public_files_list):
-            output_text(f'Public Files list file: {public_files_list}')
+        self.path = path
+        self.root = os.path.dirname(path)
+        self.filename = os.path.basename(path)
+        self.original_text = text
+        self.text = text
+        # The inputs each stage used to build this page, keyed by stage name. See MMORPDND_MANIFEST.
+        self.inputs = {}
+        self.original_hash = None
 
-            # Process the files listed in the file
-            files = self.get_file_list(public_files_list)
-            
-            # Store a list of the public files.
-            public_files = []
-            
-            # First, publicize the files.
-            for file in files:
-                public_file = self.publicize_file(file)
-                public_files.append(public_file)
-                
-            output_text(f"public_files: {public_files}")
-            
-            # Now go through and remove all links.
-            for file in public_files:
-                self.remove_links(file)
-        else:
-            output_text(f'ERROR: Please create a public files list named {public_files_list}', "error")
+
+    def is_changed(self):
+        """
+        Returns whether the contents in memory differ from the contents on disk.
+        """
+        return self.text is not None and self.text != self.original_text
 
 
-class MMORPDND_GUI:
+    def get_original_hash(self):
+        """
+        Returns the hash of the contents on disk, computing it the first time it is requested.
+        """
+        if self.original_hash is None and self.original_text is not None:
+            self.original_hash = get_content_hash(self.original_text)
+        return self.original_hash
+
+
+class MMORPDND_MANIFEST:
     """
-    Class to store GUI functions and operations.
+    A class storing the build manifest used by MMORPDND_BUILD to skip files which are already up to date.
+
+    For every file the manifest records the hash of its contents after the last build, along with the hashes of the
+    inputs (templates, css path, directory listing, ...) each stage used to build it. A stage can skip a file when the
+    file has not been edited since the last build and none of the inputs of that stage have changed. The paths of all
+    files in the tree are also recorded so removed files can be detected.
     """
 
-    def __init__(self):
+    # Bump this when the format or meaning of the manifest changes. Older manifests are then ignored.
+    version = 2
+
+
+    def __init__(self, path):
+        """
+        Initialization method.
+
+        Args:
+            path (str): The path of the manifest file.
+        """
+        self.path = path
+        # The manifest entries, keyed by the file path relative to the build directory.
+        self.pages = {}
+        # The paths of all files in the tree at the last build, relative to the build directory.
+        self.files = set()
+        # The last text read or written, used to avoid rewriting an unchanged manifest.
+        self.saved_text = None
+
+
+    def load(self):
+        """
+        Loads the manifest from disk. A missing, unreadable or outdated manifest is treated as empty, so every file is
+        rebuilt.
+
+        Returns:
+            bool: True if the manifest was loaded, False otherwise.
+        """
+        if not os.path.isfile(self.path):
+            return False
+
+        try:
+            with open(self.path, "r") as f:
+                text = f.read()
+            data = json.loads(text)
+        except (OSError, ValueError) as e:
+            output_text(f"Ignoring unreadable build manifest {self.path}: {e}", option="warning")
+            return False
+
+        if not isinstance(data, dict) or data.get("version") != self.version:
+            output_text(f"Ignoring outdated build manifest {self.path}", option="warning")
+            return False
+
+        self.pages = data.get("pages", {})
+        self.files = set(data.get("files", []))
+        self.saved_text = text
+        return True
+
+
+    def save(self):
+        """
+        Writes the manifest to disk if it changed. The file is replaced atomically so an interrupted build never leaves
+        a partial manifest behind.
+
+        Returns:
+            bool: True if the manifest was written, False otherwise.
+        """
+        text = json.dumps({"version": self.version, "files": sorted(self.files), "pages": self.pages},
+                          sort_keys=True)
+        if text == self.saved_text:
+            return False
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(text)
+        os.replace(temp_path, self.path)
+        self.saved_text = text
+        return True
+
+
+    def is_up_to_date(self, key, content_hash, stage, inputs):
+        """
+        Returns whether a stage can skip a file.
+
+        Args:
+            key (str): The path of the file relative to the build directory.
+            content_hash (str): The hash of the current contents of the file.
+            stage (str): The name of the stage.
+            inputs (str): The hash of the inputs of the stage for this file.
+
+        Returns:
+            bool: True if the file is unchanged since the last build and was built with the same stage inputs.
+        """
+        entry = self.pages.get(key)
+        return entry is not None and entry["hash"] == content_hash and entry["inputs"].get(stage) == inputs
+
+
+    def record(self, key, content_hash, inputs):
+        """
+        Records the contents hash and stage inputs of a file after a build.
+
+        Args:
+            key (str): The path of the file relative to the build directory.
+            content_hash (str): The hash of the contents of the file.
+            inputs (dict): The stage inputs used to build the file, keyed by stage name.
+
+        Returns:
+            None
+        """
+        self.pages[key] = {"hash": content_hash, "inputs": dict(inputs)}
+
+
+def import_html_libraries():
+    """
+    Imports BeautifulSoup and cssbeautifier into the module globals used by the MMORPDND stages, if they are not
+    already. These are imported the first time a stage needs them, so the commands which do not parse or prettify
+    HTML (such as updating the headers) run without loading them, or even having them installed.
+
+    Returns:
+        None
+    """
+    global BeautifulSoup, beautify
+    if "BeautifulSoup" not in globals():
+        from bs4 import BeautifulSoup
+    if "beautify" not in globals():
+        from cssbeautifier import beautify
+
+
+# The MMORPDND_BUILD of a pool worker process. See MMORPDND_BUILD.map_pages().
+pool_build = None
+
+
+def init_pool_worker(mmorpdnd, directory, attributes):
+    """
+    Initializes a pool worker process with a copy of the MMORPDND_BUILD running the stage.
+
+    Args:
+        mmorpdnd (MMORPDND): The MMORPDND instance providing the stage transforms.
+        directory (str): The directory being built.
+        attributes (dict): The attributes of the build the tasks need (such as the file set), keyed by name.
+
+    Returns:
+        None
+    """
+    global pool_build
+    pool_build = MMORPDND_BUILD(mmorpdnd, directory)
+    for name, value in attributes.items():
+        setattr(pool_build, name, value)
+
+
+def run_build_task(build, task):
+    """
+    Runs one per-file task of a stage.
+
+    Args:
+        build (MMORPDND_BUILD): The build to run the task on.
+        task (tuple): The dotted name of the method to call, relative to the build, and its arguments.
+
+    Returns:
+        tuple: Whether the task succeeded, and its result or the error message.
+    """
+    method_name, args = task
+    method = build
+    for name in method_name.split("."):
+        method = getattr(method, name)
+
+    try:
+        return True, method(*args)
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+def run_pool_task(task):
+    """
+    Runs one per-file task of a stage in a pool worker process, capturing everything it prints.
+
+    Args:
+        task (tuple): The dotted name of the method to call and its arguments. See run_build_task().
+
+    Returns:
+        tuple: Whether the task succeeded, its result or the error message, and its printed output.
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        succeeded, result = run_build_task(pool_build, task)
+    return succeeded, result, output.getvalue()
+
+
+class MMORPDND_PROFILER:
+    """
+    A class recording the cost of each step of an MMORPDND_BUILD, used by the --profile option.
+
+    For every step the profiler records the wall time, the CPU time (including the pool worker processes which finished
+    during the step), the peak memory allocated by Python in the main process (using tracemalloc) and the work the build
+    counted (see MMORPDND_BUILD.counters). Optionally every step is also ran under cProfile, and its statistics are
+    dumped to a .prof file which can be opened with pstats or snakeviz.
+
+    Note that tracemalloc and cProfile both slow the build down, so profiled times are higher than normal build times.
+    Compare them with other profiles, not with unprofiled builds.
+    """
+
+    # Bump this when the format of the report changes.
+    version = 1
+
+
+    def __init__(self, cprofile_dir=None, trace_memory=True):
+        """
+        Initialization method.
+
+        Args:
+            cprofile_dir (str, optional): The directory to dump the cProfile statistics of each step to. Steps are not
+                ran under cProfile when this is None.
+            trace_memory (bool, optional): Whether to record the peak memory of each step with tracemalloc. Turn this
+                off when only the times matter. Defaults to True.
+        """
+        self.cprofile_dir = cprofile_dir
+        self.trace_memory = trace_memory
+        # The results of each profiled step, in order.
+        self.steps = []
+        self.start_time = time.perf_counter()
+
+
+    @staticmethod
+    def get_cpu_time():
+        """
+        Returns the CPU time used by this process and its finished child processes.
+        """
+        times = os.times()
+        return times.user + times.system + times.children_user + times.children_system
+
+
+    @contextlib.contextmanager
+    def profile_step(self, name, counters):
+        """
+        A context manager profiling one step.
+
+        Args:
+            name (str): The name of the step.
+            counters (dict): The counters of the build. The difference between their values before and after the step
+                is recorded.
+        """
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        counters_before = dict(counters)
+        profile = None
+        if self.cprofile_dir is not None:
+            import cProfile
+            profile = cProfile.Profile()
+
+        wall_time = time.perf_counter()
+        cpu_time = self.get_cpu_time()
+        try:
+            if profile is not None:
+                profile.enable()
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            step = {"name": name,
+                    "wall_time": time.perf_counter() - wall_time,
+                    "cpu_time": self.get_cpu_time() - cpu_time,
+                    "peak_memory": tracemalloc.get_traced_memory()[1]}
+            step.update((key, value - counters_before.get(key, 0)) for key, value in counters.items())
+            self.steps.append(step)
+            if started_tracing:
+                tracemalloc.stop()
+
+            if profile is not None:
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(self.cprofile_dir, f"{len(self.steps):02}_{name}.prof"))
+
+
+    def get_report(self, **details):
+        """
+        Returns the profile report.
+
+        Args:
+            **details: Extra details about the build to include, such as the directory and number of jobs.
+
+        Returns:
+            dict: The report, with the totals and the results of each step.
+        """
+        totals = {"wall_time": time.perf_counter() - self.start_time,
+                  "cpu_time": sum(step["cpu_time"] for step in self.steps),
+                  "peak_memory": max((step["peak_memory"] for step in self.steps), default=0)}
+        for step in self.steps:
+            for key, value in step.items():
+                if key not in ("name", "wall_time", "cpu_time", "peak_memory"):
+                    totals[key] = totals.get(key, 0) + value
+        return {"version": self.version, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), **details,
+                "totals": totals, "steps": self.steps}
+
+
+    def save(self, path, history_path=None, **details):
+        """
+        Writes the profile report as JSON, and appends it to a history file with one report per line so the cost of
+        builds can be compared over time.
+
+        Args:
+            path (str): The path of the report.
+            history_path (str, optional): The path of the history file. Nothing is appended when this is None.
+            **details: Extra details about the build to include in the report. See get_report().
+
+        Returns:
+            dict: The report.
+        """
+        report = self.get_report(**details)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=4)
+        if history_path is not None:
+            with open(history_path, "a") as f:
+                f.write(json.dumps(report) + "\n")
+        output_text(f"Profile report written to {path}", option="note")
+        return report
+
+
+    def print_summary(self):
+        """
+        Prints a table of the cost of each step, with the slowest step highlighted.
+        """
+        if not self.steps:
+            return
+        slowest = max(self.steps, key=lambda step: step["wall_time"])
+        output_text(f"{'step':<22}{'wall s':>9}{'cpu s':>9}{'checked':>9}{'processed':>11}{'read':>7}{'written':>9}"
+                    f"{'MB in':>8}{'MB out':>8}{'peak MB':>9}")
+        for step in self.steps:
+            line = (f"{step['name']:<22}{step['wall_time']:>9.3f}{step['cpu_time']:>9.3f}{step['files_checked']:>9}"
+                    f"{step['files_processed']:>11}{step['files_read']:>7}{step['files_written']:>9}"
+                    f"{step['bytes_read'] / 2 ** 20:>8.2f}{step['bytes_written'] / 2 ** 20:>8.2f}"
+                    f"{step['peak_memory'] / 2 ** 20:>9.2f}")
+            output_text(line, option="warning" if step is slowest else "text")
+        total_wall_time = time.perf_counter() - self.start_time
+        output_text(f"Total {total_wall_time:.3f} seconds. The slowest step was {slowest['name']}.", option="note")
+
+
+class MMORPDND_BUILD:
+    """
+    A class for running the update_all stages in a single pass over the campaign.
+
+    The directory tree is scanned once and every HTML and CSS file is loaded into memory as an MMORPDND_PAGE. Each
+    stage is then ran as a transform on the in-memory pages, using the same MMORPDND methods as the individual stages,
+    and every changed file is written exactly once at the end.
+
+    When ran incrementally, a build manifest (see MMORPDND_MANIFEST) stored in the global_vars.cache_dir directory is
+    used to skip the files which have not been edited since the last build and whose stage inputs have not changed.
+    The links of every page are also kept in a link index (see MMORPDND_LINK_INDEX) in the same directory, so the link
+    stages can look up which pages link where instead of parsing every page.
+
+    The per-file work of each stage can be spread across a pool of processes (see map_pages()). The output of each file
+    is printed in order once it is done, and a file which fails is reported and left unchanged without stopping the
+    build.
+    """
+
+    # The stages ran by update_all. The order of these matter!
+    stages = ["create_index_files", "update_index_files", "update_headers", "update_navigation",
+              "remove_broken_links", "update_html_links", "update_images", "beautify_files", "update_search_index",
+              "export_public"]
+
+    # The stages which only run when asked for, after the update_all stages (see --dist in main()).
+    optional_stages = ["export_dist"]
+
+    # The stages ran by each command of the command line tool, see main().
+    commands = {
+        "index": ["create_index_files", "update_index_files"],
+        "headers": ["update_headers"],
+        "nav": ["update_navigation"],
+        "broken-links": ["remove_broken_links"],
+        "links": ["update_html_links"],
+        "images": ["update_images"],
+        "beautify": ["beautify_files"],
+        "search": ["update_search_index"],
+        "publicize": ["export_public"],
+        "dist": ["export_dist"],
+        "all": stages,
+    }
+
+
+    def __init__(self, mmorpdnd=None, directory=global_vars.root_dir, incremental=True, jobs=1, profiler=None,
+                 public_closure=False):
+        """
+        Initialization method.
+
+        Args:
+            mmorpdnd (MMORPDND, optional): The MMORPDND instance providing the stage transforms.
+            directory (str, optional): The directory to build. Defaults to global_vars.root_dir.
+            incremental (bool, optional): Whether to skip up to date files using the build manifest. When False, every
+                file is processed but the manifest is still updated. Defaults to True.
+            jobs (int, optional): The number of processes to run the per-file work on. Defaults to 1.
+            profiler (MMORPDND_PROFILER, optional): A profiler recording the cost of each step of the build.
+            public_closure (bool, optional): Whether export_public also exports every page the listed public pages
+                link to, directly or through other exported pages. Defaults to False.
+        """
+        self.mmorpdnd = mmorpdnd if mmorpdnd is not None else MMORPDND()
+        self.directory = os.path.normpath(os.path.abspath(directory))
+        self.directory_prefix = os.path.join(self.directory, "")
+        self.incremental = incremental
+        self.jobs = max(jobs or 1, 1)
+        # The paths of the files which failed in any stage.
+        self.failed_files = []
+        # The paths of the files written by write_pages().
+        self.written_files = []
+        self.profiler = profiler
+        # The work done by the build so far, recorded per step by the profiler.
+        self.counters = dict.fromkeys(["files_scanned", "files_checked", "files_processed", "files_changed",
+                                       "files_read", "bytes_read", "files_written", "bytes_written",
+                                       "match_evaluations"], 0)
+        # The number of files each stage changed, keyed by stage name. See count_changed_files().
+        self.changed_files = {}
+        self.manifest = MMORPDND_MANIFEST(os.path.join(self.directory, global_vars.cache_dir,
+                                                       global_vars.manifest_file))
+        # The files removed since the last build.
+        self.removed_files = set()
+        # The linker of the update_html_links stage.
+        self.linker = None
+        # The link index of the pages as of the last build, opened by run(). See MMORPDND_LINK_INDEX.
+        self.link_index_path = os.path.join(self.directory, global_vars.cache_dir, global_vars.link_index_file)
+        self.link_index = None
+        # The hash of each page in the link index, keyed by the path relative to the build directory.
+        self.indexed_pages = {}
+        # The (content hash, links) of each page whose links were looked up, keyed by path. See get_page_links().
+        self.page_links = {}
+        # The public export of the campaign, see export_public().
+        self.export_directory = os.path.join(self.directory, global_vars.public_export_dir)
+        self.public_closure = public_closure
+        # The paths of the pages exported by export_public().
+        self.public_pages = set()
+
+        # The loaded files, keyed by path, in the order walk_directory (and os.walk) finds them.
+        self.pages = {}
+        # The (name, is_dir) entries of every directory, keyed by directory path.
+        self.directories = {}
+        # The paths of all files in the tree.
+        self.files = set()
+
+
+    def is_excluded(self, path, directories_to_exclude=None):
+        """
+        Returns whether a file is inside one of the directories in the exclude list (global_vars.directories_to_exclude
+        by default), the same directories walk_directory() prunes.
+        """
+        if directories_to_exclude is None:
+            directories_to_exclude = global_vars.directories_to_exclude
+        relative_directory = os.path.dirname(self.relative_path(path))
+        return any(name in directories_to_exclude for name in relative_directory.split(os.sep))
+
+
+    def loaded_directories_to_exclude(self):
+        """
+        Returns the exclude list used when loading files. Template and css files are only used by beautify_files.
+        """
+        return [exclude for exclude in global_vars.directories_to_exclude if exclude not in ("templates", "css")]
+
+
+    def scan(self):
+        """
+        Scans the directory tree once, recording every directory listing and file path, and loads all HTML and CSS
+        files (and the JSON manifests of the paginated index pages) into memory.
+
+        Returns:
+            None
+        """
+        self.pages = {}
+        self.directories = {}
+        self.files = set()
+        directories_to_exclude = self.loaded_directories_to_exclude()
+        snapshot = {}
+
+        # Nothing in the campaign links into the git data, and the build cache and outputs are not part of the campaign.
+        not_campaign = [global_vars.cache_dir, global_vars.dist_dir, global_vars.assets_dir]
+        for root, dirnames, filenames in walk_directory(self.directory, [".git"] + not_campaign, snapshot):
+            self.directories[root] = [(name, is_dir) for name, is_dir, is_symlink in snapshot[root]
+                                      if name not in not_campaign]
+            is_excluded = self.is_excluded(os.path.join(root, "index.html"), directories_to_exclude)
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                self.files.add(path)
+                # The JSON manifests of the paginated index pages are built like pages, see update_index_files().
+                is_page = filename.endswith((".html", ".css")) or filename == global_vars.index_manifest_file
+                if is_page and not is_excluded:
+                    self.load_page(path)
+        self.counters["files_scanned"] += len(self.files)
+
+        output_text(f"Scanned {len(self.directories)} directories and loaded {len(self.pages)} files.", option="note")
+
+
+    def load_page(self, path):
+        """
+        Returns the in-memory page for a path, reading it from disk the first time it is requested.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            MMORPDND_PAGE: The page. Its text is None if the file does not exist yet.
+        """
+        path = os.path.normpath(path)
+        if path not in self.pages:
+            text = None
+            if os.path.isfile(path):
+                with open(path, "r") as f:
+                    text = f.read()
+                self.counters["files_read"] += 1
+                self.counters["bytes_read"] += len(text.encode())
+            self.pages[path] = MMORPDND_PAGE(path, text)
+        return self.pages[path]
+
+
+    def add_page(self, path, text):
+        """
+        Adds a file which does not exist on disk yet to the build.
+
+        Args:
+            path (str): The path of the new file.
+            text (str): The contents of the new file.
+
+        Returns:
+            MMORPDND_PAGE: The new page.
+        """
+        page = self.load_page(path)
+        page.text = text
+        if page.path not in self.files:
+            self.files.add(page.path)
+            self.directories.setdefault(page.root, []).append((page.filename, False))
+        return page
+
+
+    def add_directory(self, path, filenames=()):
+        """
+        Adds a directory which does not exist on disk yet to the scanned tree, so the index stages list it (and the
+        links to its files are kept) before a later stage creates it.
+
+        Args:
+            path (str): The path of the new directory.
+            filenames (list, optional): The names of the files the later stage writes to the directory.
+
+        Returns:
+            None
+        """
+        path = os.path.normpath(path)
+        if path in self.directories:
+            return
+        self.directories[path] = [(filename, False) for filename in filenames]
+        self.files.update(os.path.join(path, filename) for filename in filenames)
+        self.directories.setdefault(os.path.dirname(path), []).append((os.path.basename(path), True))
+
+
+    def relative_path(self, path):
+        """
+        Returns the path of a file relative to the build directory, used as its key in the build manifest.
+        """
+        # Every scanned path starts with the build directory, so avoid the much slower os.path.relpath() for those.
+        if path.startswith(self.directory_prefix):
+            return path[len(self.directory_prefix):]
+        return os.path.relpath(path, self.directory)
+
+
+    def is_up_to_date(self, page, stage, inputs=""):
+        """
+        Records the inputs a stage uses for a page and returns whether the stage can skip the page.
+
+        Args:
+            page (MMORPDND_PAGE): The page.
+            stage (str): The name of the stage.
+            inputs (str, optional): The hash of everything other than the page contents the stage output depends on.
+
+        Returns:
+            bool: True if the build is incremental, the page has not changed since the last build (on disk or in an
+                earlier stage of this build) and the stage inputs are the same as in the last build.
+        """
+        page.inputs[stage] = inputs
+        self.counters["files_checked"] += 1
+        if not self.incremental or page.original_text is None or page.is_changed():
+            return False
+        return self.manifest.is_up_to_date(self.relative_path(page.path), page.get_original_hash(), stage, inputs)
+
+
+    def report_skipped(self, skipped):
+        """
+        Prints the number of up to date files a stage skipped.
+        """
+        if skipped:
+            output_text(f"Skipped {skipped} up to date files.", option="note")
+
+
+    def update_manifest(self):
+        """
+        Records the contents and stage inputs of every page and the files in the tree in the build manifest, then saves
+        it. Pages which are unchanged since the last build keep the inputs of the stages which did not run on them.
+
+        This is called after write_pages(), so the contents of every page are the contents on disk.
+
+        Returns:
+            None
+        """
+        pages = {}
+        for page in self.pages.values():
+            # Pages which failed are left out, so they are rebuilt next time.
+            if page.text is None or page.path in self.failed_files:
+                continue
+            key = self.relative_path(page.path)
+            entry = self.manifest.pages.get(key)
+            if entry is not None and entry["hash"] == page.get_original_hash():
+                # The page is the same as after the last build, so the inputs of the stages which did not run on it
+                # this time still apply.
+                self.manifest.record(key, entry["hash"], {**entry["inputs"], **page.inputs})
+            else:
+                self.manifest.record(key, page.get_original_hash(), page.inputs)
+            pages[key] = self.manifest.pages[key]
+
+        # Files which are no longer in the tree are dropped.
+        self.manifest.pages = pages
+        self.manifest.files = {self.relative_path(path) for path in self.files}
+        self.manifest.save()
+
+
+    def map_pages(self, method_name, pages, get_args, shared_attributes=()):
+        """
+        Runs a method for each page, spread across a pool of self.jobs processes when there is more than one job.
+
+        Args:
+            method_name (str): The dotted name of the method, relative to the build (for example
+                "mmorpdnd.apply_navigation_template").
+            pages (list): The pages to process.
+            get_args (function): Returns the arguments of the method for a page. These are sent to the worker
+                processes, so should be small.
+            shared_attributes (tuple, optional): The names of the build attributes the method uses. These are copied
+                to each worker process once.
+
+        Yields:
+            tuple: Each page which succeeded and the result of the method, in the order of the pages. The output of
+                each page is printed before it is yielded, and failures are reported and skipped.
+        """
+        tasks = [(method_name, get_args(page)) for page in pages]
+        self.counters["files_processed"] += len(tasks)
+
+        if self.jobs > 1 and len(tasks) > 1:
+            processes = min(self.jobs, len(tasks))
+            attributes = {name: getattr(self, name) for name in shared_attributes}
+            with multiprocessing.Pool(processes, initializer=init_pool_worker,
+                                      initargs=(self.mmorpdnd, self.directory, attributes)) as pool:
+                chunk_size = max(len(tasks) // (processes * 4), 1)
+                for page, (succeeded, result, output) in zip(pages, pool.imap(run_pool_task, tasks, chunk_size)):
+                    sys.stdout.write(output)
+                    if self.check_result(page, succeeded, result):
+                        yield page, result
+        else:
+            for page, task in zip(pages, tasks):
+                succeeded, result = run_build_task(self, task)
+                if self.check_result(page, succeeded, result):
+                    yield page, result
+
+
+    def check_result(self, page, succeeded, result):
+        """
+        Reports a page which failed in map_pages().
+
+        Returns:
+            bool: Whether the page succeeded.
+        """
+        if not succeeded:
+            output_text(f"Failed to process {page.path}: {result}", option="error")
+            if page.path not in self.failed_files:
+                self.failed_files.append(page.path)
+        return succeeded
+
+
+    def html_pages(self, directories_to_exclude=None):
+        """
+        Returns the loaded HTML pages that are not in the exclude list.
+        """
+        return [page for page in list(self.pages.values())
+                if page.filename.endswith(".html") and page.text is not None
+                and not self.is_excluded(page.path, directories_to_exclude)]
+
+
+    def is_valid_link(self, link, base_path):
+        """
+        Check if the given link points to a file in the scanned tree.
+
+        Args:
+            link (str): The relative link to check.
+            base_path (str): The base directory path of the current HTML file.
+
+        Returns:
+            bool: True if the link points to an existing file, False otherwise.
+        """
+        return os.path.normpath(os.path.join(base_path, link)) in self.files
+
+
+    def file_exists(self, path):
+        """
+        Returns whether a path is a file in the scanned tree (including files created during this build).
+        """
+        return os.path.normpath(path) in self.files
+
+
+    def get_page_hash(self, page):
+        """
+        Returns the hash of the current contents of a page.
+        """
+        if page.is_changed():
+            return get_content_hash(page.text)
+        return page.get_original_hash()
+
+
+    def get_page_name(self, page):
+        """
+        Returns the name other pages link to a page by in update_html_links(), or None for index pages.
+        """
+        if "index.html" in page.filename:
+            return None
+        return os.path.splitext(page.filename)[0]
+
+
+    def get_page_links(self, page):
+        """
+        Returns the href of every link of a page. The links are looked up in the link index when the page is indexed
+        with its current contents, and only parsed otherwise.
+
+        Args:
+            page (MMORPDND_PAGE): The page.
+
+        Returns:
+            list: The href of every <a> tag of the page, in document order.
+        """
+        content_hash = self.get_page_hash(page)
+        cached = self.page_links.get(page.path)
+        if cached is not None and cached[0] == content_hash:
+            return cached[1]
+
+        key = self.relative_path(page.path)
+        if self.link_index is not None and self.indexed_pages.get(key) == content_hash:
+            links = self.link_index.get_links(key)
+        else:
+            links = extract_links(page.text)
+        self.page_links[page.path] = (content_hash, links)
+        return links
+
+
+    def update_link_index(self):
+        """
+        Updates the link index with the pages which changed since the last build, and removes the pages which no longer
+        exist. Like update_manifest(), this is called after write_pages().
+
+        Returns:
+            None
+        """
+        keys = set()
+        updated = 0
+        for page in self.html_pages():
+            if page.path in self.failed_files:
+                continue
+            key = self.relative_path(page.path)
+            keys.add(key)
+            content_hash = page.get_original_hash()
+            cached = self.page_links.get(page.path)
+            links = cached[1] if cached is not None and cached[0] == content_hash else None
+            if self.link_index.update_page(key, content_hash, page.text, self.get_page_name(page), links):
+                updated += 1
+
+        self.link_index.remove_pages(set(self.indexed_pages) - keys)
+        if updated:
+            output_text(f"Updated {updated} pages in the link index.", option="note")
+
+
+    def list_index_entries(self, dir_path):
+        """
+        Lists the entries of a directory that belong in its index file from the scanned tree. See
+        MMORPDND.list_index_entries().
+        """
+        files_in_dir = []
+        dir_names = set()
+        for file_name, is_dir in self.directories.get(dir_path, []):
+            if is_dir:
+                dir_names.add(file_name)
+            if file_name.endswith(".html") or is_image_file(file_name) or is_dir or file_name.endswith(
+                    ".mp3") or file_name.endswith(".txt"):
+                files_in_dir.append(file_name)
+
+        img_files = []
+        if "img" in dir_names:
+            img_files = [file_name for file_name, is_dir in self.directories.get(os.path.join(dir_path, "img"), [])]
+
+        return files_in_dir, dir_names, img_files
+
+
+    def create_index_files(self):
+        """
+        Creates an index page for every directory without one. See MMORPDND.create_index_files().
+        """
+        for root in list(self.directories):
+            index_file_path = os.path.join(root, "index.html")
+
+            # Skip this directory if index.html already exists.
+            if index_file_path in self.files:
+                continue
+            # Check if we are looking at a file in our exclude list.
+            if self.is_excluded(index_file_path):
+                continue
+
+            self.add_page(index_file_path, self.mmorpdnd.create_index_file_content(root))
+            self.counters["files_processed"] += 1
+            output_text(f"Created index file at {index_file_path}", option="success")
+
+
+    def update_index_files(self):
+        """
+        Updates the links of all index pages. See MMORPDND.update_index_files().
+        """
+        output_text("Updating index files...")
+        skipped = 0
+        for page in self.html_pages():
+            if not page.filename.endswith("index.html"):
+                continue
+
+            files_in_dir, dir_names, img_files = self.list_index_entries(page.root)
+            inputs = self.mmorpdnd.get_index_fingerprint(files_in_dir, dir_names, img_files)
+            if self.is_up_to_date(page, "update_index_files", inputs):
+                skipped += 1
+                continue
+
+            page.text = self.mmorpdnd.update_index_file_content(page.text, files_in_dir, dir_names, img_files,
+                                                                page.root)
+            self.counters["files_processed"] += 1
+            output_text(f"{page.path} updated")
+
+            # The JSON manifest of paginated index pages is built with the pages, so the images stage can add the
+            # thumbnails to it.
+            manifest = self.mmorpdnd.get_index_manifest(files_in_dir, dir_names, img_files)
+            manifest_path = os.path.join(page.root, global_vars.index_manifest_file)
+            if manifest is not None:
+                self.add_page(manifest_path, manifest)
+            elif manifest_path in self.files:
+                os.remove(manifest_path)
+                self.files.discard(manifest_path)
+                self.pages.pop(manifest_path, None)
+        self.report_skipped(skipped)
+        output_text("All index.html files updated.")
+
+
+    def update_headers(self):
+        """
+        Updates the headers of all pages. See MMORPDND.update_headers().
+        """
+        # Read the contents of the template file, and write the shared layout script if there is one.
+        template, nav_contents, layout_script = self.mmorpdnd.get_layout_templates()
+        self.write_layout_script(layout_script)
+
+        # The css link of a page only depends on its location, which is part of its manifest key. In the "include"
+        # layout mode the pages do not depend on the layout script, only on where it is.
+        inputs = get_content_hash(template + global_vars.css_path +
+                                  (global_vars.layout_script_path if layout_script is not None else ""))
+        pages = []
+        skipped = 0
+        for page in self.html_pages():
+            if "template" in page.filename:
+                continue
+            if self.is_up_to_date(page, "update_headers", inputs):
+                skipped += 1
+                continue
+            pages.append(page)
+
+        for page, text in self.map_pages("mmorpdnd.apply_header_template", pages,
+                                         lambda page: (page.text, page.filename, page.root, template)):
+            page.text = text
+            output_text(f"Updated head and css in {page.path}")  # Print progress update
+        self.report_skipped(skipped)
+
+
+    def update_navigation(self):
+        """
+        Updates the navigation block of all pages. See MMORPDND.update_navigation().
+        """
+        # open the nav file and read the contents, and write the shared layout script if there is one.
+        template, nav_contents, layout_script = self.mmorpdnd.get_layout_templates()
+        self.write_layout_script(layout_script)
+
+        inputs = get_content_hash(nav_contents)
+        pages = []
+        skipped = 0
+        for page in self.html_pages():
+            if "template" in page.filename:
+                continue
+            if self.is_up_to_date(page, "update_navigation", inputs):
+                skipped += 1
+                continue
+            pages.append(page)
+
+        for page, text in self.map_pages("mmorpdnd.apply_navigation_template", pages,
+                                         lambda page: (page.text, nav_contents)):
+            output_text(f"Processing file: {page.path}")
+            page.text = text
+        self.report_skipped(skipped)
+
+
+    def write_layout_script(self, layout_script):
+        """
+        Writes the shared layout script of the "include" layout mode, if it changed. See
+        MMORPDND.get_layout_templates().
+
+        Args:
+            layout_script (str): The layout script. Nothing is written when this is None.
+        """
+        if layout_script is not None:
+            self.write_output_file(os.path.join(self.directory, global_vars.layout_script_path), layout_script)
+
+
+    def remove_broken_links(self):
+        """
+        Removes invalid local links from all pages. See MMORPDND.remove_broken_links().
+        """
+        # Adding files never breaks a link, so an up to date page only needs checking if it links to a removed file.
+        linking_to_removed = self.link_index.get_pages_linking_to(self.relative_path(path)
+                                                                  for path in self.removed_files)
+        pages = []
+        skipped = 0
+        for page in self.html_pages():
+            key = self.relative_path(page.path)
+            if self.is_up_to_date(page, "remove_broken_links") and key in self.indexed_pages and \
+                    key not in linking_to_removed:
+                skipped += 1
+                continue
+            # Most pages have no broken links, which the indexed links tell without parsing the page.
+            if all(not self.mmorpdnd.is_checked_link(link) or self.is_valid_link(link, page.root)
+                   for link in self.get_page_links(page)):
+                continue
+            pages.append(page)
+
+        for page, updated_text in self.map_pages("remove_broken_links_from_page", pages,
+                                                 lambda page: (page.text, page.path), ("files",)):
+            if updated_text is not None:
+                page.text = updated_text
+        self.report_skipped(skipped)
+
+
+    def remove_broken_links_from_page(self, contents, file_path):
+        """
+        Returns the contents of a page with its invalid links removed, or None if it has none. Links are checked against
+        the scanned tree. See MMORPDND.remove_broken_links_from_html().
+        """
+        return self.mmorpdnd.remove_broken_links_from_html(contents, file_path, self.is_valid_link)
+
+
+    def update_html_links(self):
+        """
+        Links occurrences of page names in the body text of all pages. See MMORPDND.update_html_links().
+        """
+        html_files = []
+        for page in self.html_pages():
+            if "index.html" in page.filename:
+                continue
+            html_files.append({
+                'name_no_ext': os.path.splitext(page.filename)[0],
+                'name_with_ext': page.filename,
+                'full_path': page.path
+            })
+
+        # Only pages mentioning a page added (or moved) since the last build can gain links. Links to removed or moved
+        # pages are already unwrapped by remove_broken_links, which marks those pages as changed.
+        names = {(file_info['name_no_ext'], self.relative_path(file_info['full_path'])) for file_info in html_files}
+        added_names = {name for name, path in names - self.link_index.get_names()}
+        added_variants = {variant.lower() for name in added_names for variant in (name, name.replace('_', ' '))}
+        pages = []
+        files_info = {}
+        skipped = 0
+
+        for file_info in html_files:
+            if "_public" in file_info['full_path']:
+                continue
+
+            page = self.pages[file_info['full_path']]
+            if self.is_up_to_date(page, "update_html_links"):
+                text = page.text.lower()
+                if not any(variant in text for variant in added_variants):
+                    skipped += 1
+                    continue
+            pages.append(page)
+            files_info[page.path] = file_info
+
+        # The linker is only built when a page needs linking.
+        if pages:
+            self.linker = self.mmorpdnd.create_linker(html_files)
+
+        total = len(pages)
+        width = len(str(total))
+        index = 0
+        for page, (text, evaluations) in self.map_pages("link_page", pages,
+                                                        lambda page: (page.text, files_info[page.path]), ("linker",)):
+            self.counters["match_evaluations"] += evaluations
+            index += 1
+            percentage = int(index / total * 100.0)
+            output_text(f"({index:0{width}}/{total:0{width}} {percentage:3}%) Linked {page.path}")
+            page.text = text
+        self.report_skipped(skipped)
+
+
+    def link_page(self, content, file_info):
+        """
+        Returns the contents of a page with the names of other pages linked, using the linker of the current
+        update_html_links() stage, and the number of name matches the linker checked. See MMORPDND.link_html_page().
+        """
+        evaluations = self.linker.evaluations
+        content = self.mmorpdnd.link_html_page(content, file_info, self.linker)
+        return content, self.linker.evaluations - evaluations
+
+
+    def update_images(self):
+        """
+        Creates the resized copies (derivatives) of the images the pages show and link to from their index, and gives
+        the <img> tags of the pages a srcset listing them and the index image links (including the ones in the JSON
+        manifests of paginated index pages) a thumbnail. See
+        templates/mmorpdnd_images.py.
+
+        The derivatives are named by the hash of their image and stored in global_vars.assets_dir, so they are never
+        created twice. The hash and derivatives of each image are cached (see global_vars.image_cache_file) with its
+        modification time and size, so unchanged images are not even read again. The derivatives of the changed images
+        are created in parallel, and the derivatives no image uses anymore are removed.
+
+        This stage needs Pillow, and is skipped when it is not installed.
+        """
+        if not is_pillow_available():
+            output_text("Pillow is not installed, so the image derivatives are not updated (pip install Pillow).",
+                        option="warning")
+            return
+
+        assets_directory = os.path.join(self.directory, global_vars.assets_dir)
+        cache = MMORPDND_MANIFEST(os.path.join(self.directory, global_vars.cache_dir, global_vars.image_cache_file))
+        cache.load()
+
+        # Find the images of every page, and of the JSON manifests of the paginated index pages.
+        page_images = {}
+        for page in self.html_pages():
+            if "template" not in page.filename:
+                page_images[page] = {image for image in find_page_images(page.text, page.path) if image in self.files}
+        for page in list(self.pages.values()):
+            if page.filename == global_vars.index_manifest_file and page.text is not None:
+                index_entries = json.loads(page.text)["entries"]
+                page_images[page] = {image for image in find_index_images(index_entries, page.path)
+                                     if image in self.files}
+
+        entries = {}
+        images = []
+        for image in sorted(set().union(*page_images.values())):
+            key = self.relative_path(image)
+            entry = cache.pages.get(key)
+            stat = os.stat(image)
+            # The modification time and size tell whether the image was edited since the last build.
+            signature = f"{stat.st_mtime_ns}:{stat.st_size}"
+            if (self.incremental and cache.is_up_to_date(key, signature, "update_images", DERIVATIVE_SETTINGS)
+                    and all(os.path.isfile(os.path.join(self.directory, path))
+                            for width, path in entry["derivatives"])):
+                entries[key] = entry
+                continue
+            images.append(MMORPDND_PAGE(image))
+
+        for image, (signature, width, derivatives) in self.map_pages("create_image_derivatives", images,
+                                                                     lambda image: (image.path,)):
+            entries[self.relative_path(image.path)] = {"hash": signature,
+                                                       "inputs": {"update_images": DERIVATIVE_SETTINGS},
+                                                       "width": width, "derivatives": derivatives}
+
+        pages = []
+        skipped = 0
+        for page, page_image_paths in page_images.items():
+            keys = sorted(self.relative_path(image) for image in page_image_paths)
+            inputs = get_content_hash(repr([(key, entries[key]["width"], entries[key]["derivatives"])
+                                            for key in keys if key in entries]))
+            if self.is_up_to_date(page, "update_images", inputs):
+                skipped += 1
+                continue
+            pages.append((page, page_image_paths))
+
+        for page, page_image_paths in pages:
+            image_derivatives = {}
+            for image in page_image_paths:
+                entry = entries.get(self.relative_path(image))
+                if entry is not None:
+                    image_derivatives[image] = (entry["width"], [(width, os.path.join(self.directory, path))
+                                                                 for width, path in entry["derivatives"]])
+            if page.filename == global_vars.index_manifest_file:
+                index_entries = json.loads(page.text)["entries"]
+                text = format_index_manifest(add_index_thumbnails(index_entries, page.path, image_derivatives))
+            else:
+                text = add_image_srcsets(page.text, page.path, image_derivatives)
+            if text != page.text:
+                page.text = text
+                output_text(f"Updated the images of {page.path}")
+        self.report_skipped(skipped)
+
+        # Remove the derivatives which no image uses anymore.
+        if entries != cache.pages:
+            used = {os.path.join(self.directory, path)
+                    for entry in entries.values() for width, path in entry["derivatives"]}
+            for root, dirnames, filenames in walk_directory(assets_directory):
+                for filename in filenames:
+                    path = os.path.join(root, filename)
+                    if path not in used:
+                        os.remove(path)
+                        output_text(f"Removed {path}, no image uses it anymore.", option="note")
+        cache.pages = entries
+        cache.save()
+
+
+    def create_image_derivatives(self, path):
+        """
+        Creates the missing derivatives of an image. See create_image_derivatives() in templates/mmorpdnd_images.py.
+
+        Returns:
+            tuple: The modification time and size of the image, its width and the (width, path relative to the build
+                directory) of each of its derivatives.
+        """
+        stat = os.stat(path)
+        width, derivatives, created = create_image_derivatives(path, os.path.join(self.directory,
+                                                                                  global_vars.assets_dir))
+        if created:
+            output_text(f"Created {created} resized copies of {path}")
+        derivatives = [[derivative_width, self.relative_path(derivative_path)]
+                       for derivative_width, derivative_path in derivatives]
+        return f"{stat.st_mtime_ns}:{stat.st_size}", width, derivatives
+
+
+    def beautify_files(self):
+        """
+        Beautifies all HTML and CSS files, including the template and css files. See MMORPDND.beautify_files().
+
+        The pages which hold the output of the formatter from an earlier run (of this stage or of
+        MMORPDND.beautify_files(), which share global_vars.beautify_cache_file) are skipped, even when they changed in
+        an earlier stage, without being parsed.
+        """
+        formatted = MMORPDND_MANIFEST(os.path.join(self.directory, global_vars.cache_dir,
+                                                   global_vars.beautify_cache_file))
+        formatted.load()
+        pages = []
+        skipped = 0
+        for page in list(self.pages.values()):
+            if page.text is None or not page.filename.endswith((".html", ".css")):
+                continue
+            if self.is_up_to_date(page, "beautify_files"):
+                skipped += 1
+                continue
+            if self.incremental and formatted.is_up_to_date(self.relative_path(page.path), get_content_hash(page.text),
+                                                             "beautify_files", ""):
+                skipped += 1
+                continue
+            pages.append(page)
+
+        for page, text in self.map_pages("mmorpdnd.prettify_file_content", pages,
+                                         lambda page: (page.filename, page.text)):
+            page.text = text
+            formatted.record(self.relative_path(page.path), get_content_hash(text), {"beautify_files": ""})
+            output_text(f"File {page.path} has been prettified.")
+        self.report_skipped(skipped)
+
+        # Only keep the files which still exist.
+        formatted.pages = {key: entry for key, entry in formatted.pages.items()
+                           if self.directory_prefix + key in self.pages}
+        formatted.save()
+
+
+    def update_search_index(self):
+        """
+        Updates the full-text search index of the campaign and writes the search page (global_vars.search_dir). Only
+        the pages which changed since they were indexed are tokenized, and only the index shards containing their
+        terms are written again. See MMORPDND_SEARCH_INDEX.
+        """
+        search_directory = os.path.join(self.directory, global_vars.search_dir)
+        shards_directory = os.path.join(search_directory, "shards")
+        pages = []
+        paths = {}
+        with MMORPDND_SEARCH_INDEX(os.path.join(self.directory, global_vars.cache_dir,
+                                                global_vars.search_index_file)) as search_index:
+            indexed_pages = search_index.get_pages()
+            for page in self.html_pages():
+                # The index pages only list other pages, and the '_public' pages are copies of listed pages.
+                if page.filename.endswith(("index.html", "_public.html")):
+                    continue
+                path = self.relative_path(page.path).replace(os.sep, "/")
+                paths[path] = self.get_page_hash(page)
+                if indexed_pages.get(path) != paths[path]:
+                    pages.append(page)
+
+            shards, doc_shards = search_index.remove_pages(set(indexed_pages) - set(paths))
+            for page, (title, terms) in self.map_pages("get_page_search_terms", pages, lambda page: (page.text,)):
+                path = self.relative_path(page.path).replace(os.sep, "/")
+                page_shards, doc_shard = search_index.update_page(path, paths[path], title or get_page_title(path), terms)
+                shards.update(page_shards)
+                doc_shards.add(doc_shard)
+
+            # Write every shard when the search page is new (or was removed).
+            if not os.path.isdir(shards_directory):
+                shards, doc_shards = search_index.get_all_shards()
+            shard_files = search_index.get_shard_files(shards, doc_shards)
+
+        os.makedirs(shards_directory, exist_ok=True)
+        # Remove the files of the child shards of updated term shards which are no longer split the same way.
+        for shard in shards:
+            for name in get_shard_file_tree(shards_directory, shard):
+                if name not in shard_files:
+                    shard_files[name] = None
+        for name, text in sorted(shard_files.items()):
+            shard_path = os.path.join(shards_directory, name)
+            if text is not None:
+                self.write_output_file(shard_path, text)
+            elif os.path.isfile(shard_path):
+                os.remove(shard_path)
+        with open(global_vars.search_template_file, "r") as f:
+            self.write_output_file(os.path.join(search_directory, "index.html"), f.read())
+
+        output_text(f"Indexed {len(pages)} of {len(paths)} pages for search, {len(shard_files)} shards updated.",
+                    option="note")
+
+
+    def get_page_search_terms(self, contents):
+        """
+        Returns the title and the search terms of a page. See get_search_terms().
+        """
+        return get_search_terms(contents)
+
+
+    def get_public_pages(self):
+        """
+        Returns the pages to export: the pages in the public files list, and with public_closure the pages they link to
+        (other than index pages), directly or through other exported pages.
+
+        Returns:
+            set: The normalized paths of the public pages.
+        """
+        public_pages = {os.path.normpath(file) for file in self.mmorpdnd.get_file_list(global_vars.public_files_list)
+                        if file.endswith(".html")}
+        if not self.public_closure:
+            return public_pages
+
+        pending = list(public_pages)
+        while pending:
+            page = self.load_page(pending.pop())
+            if page.text is None:
+                continue
+            for link in self.get_page_links(page):
+                if not link.endswith(".html"):
+                    continue
+                # The index pages list whole directories, and the navigation bar links to them.
+                target = resolve_link(link, page.path)
+                if target in public_pages or target.endswith("index.html") or target not in self.pages:
+                    continue
+                public_pages.add(target)
+                pending.append(target)
+        return public_pages
+
+
+    def get_export_path(self, path):
+        """
+        Returns the path a file of the campaign is exported to, at the same place in the exported tree.
+        """
+        return os.path.join(self.export_directory, self.relative_path(path))
+
+
+    def write_output_file(self, path, text):
+        """
+        Writes a file generated outside of the loaded pages (such as the exported tree), if its contents changed. See
+        write_file().
+
+        Args:
+            path (str): The path of the file.
+            text (str): The contents of the file.
+
+        Returns:
+            bool: True if the file was written.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not write_file(path, text):
+            return False
+        self.counters["files_written"] += 1
+        self.counters["bytes_written"] += len(text.encode())
+        self.written_files.append(path)
+        output_text(f"Wrote {path}")
+        return True
+
+
+    def copy_export_file(self, path):
+        """
+        Copies a file of the campaign (an image or style sheet) into the exported tree, if it is missing or changed.
+
+        Args:
+            path (str): The path of the file in the campaign.
+
+        Returns:
+            bool: True if the file was copied.
+        """
+        export_path = self.get_export_path(path)
+        source_stat = os.stat(path)
+        try:
+            export_stat = os.stat(export_path)
+            if (export_stat.st_mtime_ns, export_stat.st_size) == (source_stat.st_mtime_ns, source_stat.st_size):
+                return False
+        except OSError:
+            pass
+
+        os.makedirs(os.path.dirname(export_path), exist_ok=True)
+        shutil.copy2(path, export_path)
+        self.counters["files_written"] += 1
+        self.counters["bytes_written"] += source_stat.st_size
+        self.written_files.append(export_path)
+        return True
+
+
+    def export_public(self):
+        """
+        Exports the public version of the pages in the public files list into a mirror of the campaign tree
+        (global_vars.public_export_dir), instead of writing '_public' files next to the pages. Each page is parsed
+        once to remove its navigation bar and the links to pages which are not public, see
+        MMORPDND.export_public_html(). The images the pages show and the style sheets are copied along, and pages which
+        are no longer public are removed from the exported tree.
+        """
+        if not os.path.exists(global_vars.public_files_list):
+            output_text(f'ERROR: Please create a public files list named {global_vars.public_files_list}', "error")
+            return
+
+        output_text(f'Public Files list file: {global_vars.public_files_list}')
+        self.public_pages = self.get_public_pages()
+        # The links kept in a public page depend on which other pages are public.
+        inputs = get_content_hash(repr(sorted(self.relative_path(path) for path in self.public_pages)))
+
+        pages = []
+        skipped = 0
+        for path in sorted(self.public_pages):
+            page = self.load_page(path)
+            if page.text is None:
+                continue
+            if self.is_up_to_date(page, "export_public", inputs) and os.path.isfile(self.get_export_path(path)):
+                skipped += 1
+                continue
+            pages.append(page)
+
+        images = set()
+        for page, (text, page_images) in self.map_pages("export_public_page", pages,
+                                                        lambda page: (page.text, page.path), ("public_pages",)):
+            self.write_output_file(self.get_export_path(page.path), text)
+            # The image derivatives are not part of the scanned tree.
+            images.update(image for image in page_images if image in self.files or os.path.isfile(image))
+        self.report_skipped(skipped)
+
+        # The pages link to the style sheet (and it to its images) relative to the campaign root.
+        css_directory = os.path.join(self.directory, os.path.dirname(global_vars.css_path))
+        for name, is_dir in self.directories.get(css_directory, []):
+            if not is_dir and (name.endswith((".css", ".js")) or is_image_file(name)):
+                images.add(os.path.join(css_directory, name))
+        for image in sorted(images):
+            self.copy_export_file(image)
+
+        # Remove the pages which are no longer public.
+        for root, dirnames, filenames in walk_directory(self.export_directory):
+            for filename in filenames:
+                export_path = os.path.join(root, filename)
+                source = os.path.join(self.directory, os.path.relpath(export_path, self.export_directory))
+                if filename.endswith(".html") and source not in self.public_pages:
+                    os.remove(export_path)
+                    output_text(f"Removed {export_path}, it is no longer public.", option="warning")
+
+        output_text(f"Exported {len(self.public_pages)} public pages to {self.export_directory}")
+
+
+    def export_public_page(self, contents, path):
+        """
+        Returns the public contents of a page and the images it shows. See MMORPDND.export_public_html().
+        """
+        return self.mmorpdnd.export_public_html(contents, path, self.public_pages)
+
+
+    def get_dist_files(self):
+        """
+        Returns the files of the campaign which are exported by export_dist(): the pages, style sheets, scripts, JSON
+        manifests and images, including the search page and the image derivatives, but not the templates or the files
+        which are not part of the site (such as the scripts and lists of the repository).
+
+        Returns:
+            list: The paths of the files, sorted.
+        """
+        site_directories = ("css", global_vars.search_dir, global_vars.assets_dir)
+        directories_to_exclude = [exclude for exclude in global_vars.directories_to_exclude
+                                  if exclude not in site_directories]
+        # The search page and the image derivatives are written during the build, after the scan.
+        files = set(self.files)
+        for name in (global_vars.search_dir, global_vars.assets_dir):
+            for root, dirnames, filenames in walk_directory(os.path.join(self.directory, name)):
+                files.update(os.path.join(root, filename) for filename in filenames)
+
+        return sorted(path for path in files
+                      if path.lower().endswith(MINIFIED_EXTENSIONS + COMPRESSED_EXTENSIONS + COPIED_EXTENSIONS)
+                      and not self.is_excluded(path, directories_to_exclude))
+
+
+    def export_dist(self):
+        """
+        Exports a minified copy of the campaign for static hosting into global_vars.dist_export_dir, next to the
+        editable (prettified) campaign. The pages and style sheets are minified (see templates/mmorpdnd_minify.py), and
+        the text files get precompressed .gz siblings (and .br siblings when brotli is installed) a static file server
+        can send as they are. The other files, such as the images, are copied as they are.
+
+        The hash of each file (its contents, or the modification time and size of the files which are not loaded) is
+        cached with the files it was exported to (see global_vars.dist_cache_file), so only the files which changed
+        since the last export are minified and compressed again, spread across the build processes. The exported files
+        whose source was removed are removed too.
+        """
+        dist_directory = os.path.join(self.directory, global_vars.dist_export_dir)
+        cache = MMORPDND_MANIFEST(os.path.join(self.directory, global_vars.cache_dir, global_vars.dist_cache_file))
+        cache.load()
+        settings = get_dist_settings()
+
+        entries = {}
+        signatures = {}
+        files = []
+        skipped = 0
+        for path in self.get_dist_files():
+            key = self.relative_path(path)
+            page = self.pages.get(path)
+            if page is not None and page.text is not None:
+                signatures[path] = get_content_hash(page.text)
+            else:
+                stat = os.stat(path)
+                signatures[path] = f"{stat.st_mtime_ns}:{stat.st_size}"
+                page = MMORPDND_PAGE(path)
+            entry = cache.pages.get(key)
+            if (self.incremental and cache.is_up_to_date(key, signatures[path], "export_dist", settings)
+                    and all(os.path.isfile(os.path.join(dist_directory, name)) for name in entry["files"])):
+                entries[key] = entry
+                skipped += 1
+                continue
+            files.append(page)
+
+        for page, (names, written) in self.map_pages("export_dist_file", files, lambda page: (page.path, page.text)):
+            entries[self.relative_path(page.path)] = {"hash": signatures[page.path],
+                                                      "inputs": {"export_dist": settings}, "files": names}
+            for path, size in written:
+                self.counters["files_written"] += 1
+                self.counters["bytes_written"] += size
+                self.written_files.append(path)
+        self.report_skipped(skipped)
+
+        # Remove the exported files whose source was removed. The files of the sources which failed are kept.
+        exported = {name for entry in entries.values() for name in entry["files"]}
+        exported.update(name for path in self.failed_files
+                        for name in cache.pages.get(self.relative_path(path), {}).get("files", []))
+        for root, dirnames, filenames in walk_directory(dist_directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                if os.path.relpath(path, dist_directory) not in exported:
+                    os.remove(path)
+                    output_text(f"Removed {path}, its source no longer exists.", option="note")
+        cache.pages = entries
+        cache.save()
+
+        output_text(f"Exported {len(signatures)} files to {dist_directory}", option="note")
+
+
+    def export_dist_file(self, path, text):
+        """
+        Exports one file of the campaign into global_vars.dist_export_dir. See export_dist().
+
+        Args:
+            path (str): The path of the file.
+            text (str): The contents of the file, or None to read it from disk.
+
+        Returns:
+            tuple: The paths of the exported file and its compressed copies relative to global_vars.dist_export_dir,
+                and the (path, size) of the files which were written (the others already had these contents).
+        """
+        export_path = os.path.join(self.directory, global_vars.dist_export_dir, self.relative_path(path))
+        if text is None:
+            with open(path, "rb") as f:
+                data = f.read()
+            if path.lower().endswith(MINIFIED_EXTENSIONS):
+                text = data.decode("utf-8")
+        if text is not None:
+            data = minify_file(path, text).encode("utf-8")
+
+        contents = {export_path: data}
+        if path.lower().endswith(COMPRESSED_EXTENSIONS):
+            contents.update((export_path + extension, copy) for extension, copy in compress_contents(data).items())
+
+        os.makedirs(os.path.dirname(export_path), exist_ok=True)
+        written = []
+        for output_path, output_data in contents.items():
+            if write_file(output_path, output_data):
+                written.append((output_path, len(output_data)))
+        if written:
+            output_text(f"Exported {path}")
+        names = [os.path.relpath(output_path, os.path.join(self.directory, global_vars.dist_export_dir))
+                 for output_path in contents]
+        return names, written
+
+
+    def write_pages(self):
+        """
+        Writes every page whose contents changed during the build back to disk. See write_file().
+
+        Returns:
+            int: The number of files written.
+        """
+        written = 0
+        for page in self.pages.values():
+            if page.is_changed():
+                if write_file(page.path, page.text):
+                    self.counters["files_written"] += 1
+                    self.counters["bytes_written"] += len(page.text.encode())
+                    self.written_files.append(page.path)
+                    written += 1
+                page.original_text = page.text
+                page.original_hash = None
+
+        output_text(f"{written} of {len(self.pages)} files written.", option="success")
+        return written
+
+
+    def run_step(self, name):
+        """
+        Runs one step of the build (a stage, or the scan, write or manifest step), profiling it if there is a
+        profiler.
+
+        Args:
+            name (str): The name of the step method.
+
+        Returns:
+            The result of the step.
+        """
+        if self.profiler is None:
+            return self.count_changed_files(name)
+        with self.profiler.profile_step(name, self.counters):
+            return self.count_changed_files(name)
+
+
+    def count_changed_files(self, name):
+        """
+        Runs one step of the build and, for stages, records and prints the number of files it changed: the pages whose
+        contents it changed in memory, and the files it wrote directly (such as the exported tree). The pages are only
+        written once every stage ran, see write_pages().
+
+        Args:
+            name (str): The name of the step method.
+
+        Returns:
+            The result of the step.
+        """
+        if name not in self.stages and name not in self.optional_stages:
+            return getattr(self, name)()
+
+        # Only the references to the texts are kept, which is enough to tell which pages the stage changed.
+        texts = {path: page.text for path, page in self.pages.items()}
+        written = len(self.written_files)
+        result = getattr(self, name)()
+        changed = len(self.written_files) - written
+        for path, page in self.pages.items():
+            text = texts.get(path)
+            if page.text is not text and page.text != text:
+                changed += 1
+
+        self.changed_files[name] = changed
+        self.counters["files_changed"] += changed
+        output_text(f"{name} changed {changed} files.", option="note")
+        return result
+
+
+    def run(self, stages=None):
+        """
+        Scans the tree, runs the stages on the in-memory pages and writes the changed files.
+
+        Args:
+            stages (list, optional): The stages to run, in order. Defaults to all the update_all stages.
+
+        Returns:
+            int: The number of files written.
+        """
+        self.run_step("scan")
+        self.manifest.load()
+        self.removed_files = {self.directory_prefix + path for path in self.manifest.files} - self.files
+        self.link_index = MMORPDND_LINK_INDEX(self.link_index_path)
+        self.indexed_pages = self.link_index.get_pages()
+        self.page_links = {}
+        stages = stages if stages is not None else self.stages
+        # The search page is written after the index stages ran, so the root index lists it on the first build too.
+        if "update_search_index" in stages:
+            self.add_directory(os.path.join(self.directory, global_vars.search_dir), ["index.html"])
+
+        try:
+            for stage in stages:
+                self.run_step(stage)
+            written = self.run_step("write_pages")
+            self.run_step("update_manifest")
+            self.run_step("update_link_index")
+        finally:
+            self.link_index.close()
+            self.link_index = None
+        if self.failed_files:
+            output_text(f"{len(self.failed_files)} files failed and were left unchanged: {self.failed_files}",
+                        option="error")
+        return written
+
+
+class MMORPDND_WATCHER:
+    """
+    A class for watching the campaign for changes and rebuilding only what they affect.
+
+    The campaign, the creator input files and the header and navigation templates are polled for changes. Once a burst
+    of saves has settled, the creator is ran for every changed .input or .char file and an incremental MMORPDND_BUILD
+    is ran. Thanks to the build manifest and link index, the build only updates the index of the directories whose
+    listing changed, the headers and navigation of the changed pages and the pages which mention an added page.
+    """
+
+    def __init__(self, mmorpdnd=None, directory=global_vars.root_dir, interval=0.1, debounce=0.25, jobs=1):
+        """
+        Initialization method.
+
+        Args:
+            mmorpdnd (MMORPDND, optional): The MMORPDND instance providing the stage transforms.
+            directory (str, optional): The directory to watch and build. Defaults to global_vars.root_dir.
+            interval (float, optional): The number of seconds between polls. Defaults to 0.1.
+            debounce (float, optional): The number of seconds without changes to wait for before rebuilding, so a
+                burst of saves only rebuilds once. Defaults to 0.25.
+            jobs (int, optional): The number of processes each build uses. Defaults to 1.
+        """
+        self.mmorpdnd = mmorpdnd if mmorpdnd is not None else MMORPDND()
+        self.directory = os.path.normpath(os.path.abspath(directory))
+        self.input_directory = os.path.join(self.directory, global_vars.input_files_dir)
+        self.template_files = [os.path.join(self.directory, path)
+                               for path in (global_vars.header_template_file, global_vars.nav_template_file)]
+        self.interval = interval
+        self.debounce = debounce
+        self.jobs = jobs
+        # The (modification time, size) of every watched file as of the last build, keyed by path.
+        self.file_states = self.get_file_states()
+        # The changes made while the last build was running, which still need a build.
+        self.pending_changes = set()
+
+
+    def get_file_states(self):
+        """
+        Returns the (modification time, size) of every watched file, keyed by path.
+        """
+        paths = list(self.template_files)
+        for directory in (self.directory, self.input_directory):
+            for root, dirnames, filenames in walk_directory(directory, global_vars.directories_to_exclude):
+                paths.extend(os.path.join(root, filename) for filename in filenames)
+
+        file_states = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            file_states[path] = (stat.st_mtime_ns, stat.st_size)
+        return file_states
+
+
+    @staticmethod
+    def get_changes(old_states, new_states):
+        """
+        Returns the paths of the files which were added, removed or modified between two get_file_states() results.
+        """
+        changes = {path for path, state in new_states.items() if old_states.get(path) != state}
+        changes.update(path for path in old_states if path not in new_states)
+        return changes
+
+
+    def wait_for_changes(self):
+        """
+        Polls the watched files until something changes and no further changes are made for the debounce time.
+
+        Returns:
+            set: The paths of the changed files.
+        """
+        changes = set(self.pending_changes)
+        states = self.file_states
+        last_change = time.monotonic() if changes else None
+        while True:
+            time.sleep(self.interval)
+            new_states = self.get_file_states()
+            new_changes = self.get_changes(states, new_states)
+            states = new_states
+            if new_changes:
+                changes.update(new_changes)
+                last_change = time.monotonic()
+            elif last_change is not None and time.monotonic() - last_change >= self.debounce:
+                self.file_states = states
+                return changes
+
+
+    def create_pages(self, input_files):
+        """
+        Runs the creator for each input file, without the full update it normally runs afterwards.
+
+        Args:
+            input_files (list): The paths of the .input and .char files.
+
+        Returns:
+            None
+        """
+        for input_file in input_files:
+            output_text(f"Running the creator for {input_file}", option="note")
+            # The creator expects to be ran from the templates directory.
+            result = subprocess.run([sys.executable, "creator.py", "-f", input_file, "--no-update"],
+                                    cwd=os.path.join(self.directory, "templates"))
+            if result.returncode != 0:
+                output_text(f"The creator failed for {input_file}", option="error")
+
+
+    def rebuild(self, changes):
+        """
+        Rebuilds the campaign after some files changed.
+
+        Args:
+            changes (set): The paths of the changed files.
+
+        Returns:
+            int: The number of files written.
+        """
+        start = time.monotonic()
+        input_files = sorted(path for path in changes if path.startswith(os.path.join(self.input_directory, ""))
+                             and path.endswith((".input", ".char")) and os.path.isfile(path))
+        if input_files:
+            self.create_pages(input_files)
+        file_states = self.get_file_states()
+
+        build = MMORPDND_BUILD(self.mmorpdnd, self.directory, jobs=self.jobs)
+        written = build.run()
+
+        # The files the build wrote are not changes, but anything else saved during the build still needs a build.
+        self.file_states = self.get_file_states()
+        self.pending_changes = self.get_changes(file_states, self.file_states) - set(build.written_files)
+        output_text(f"Rebuilt {len(changes)} changed files in {time.monotonic() - start:.2f} seconds.",
+                    option="success")
+        return written
+
+
+    def run(self):
+        """
+        Watches for changes and rebuilds until interrupted with Ctrl+C.
+
+        Returns:
+            None
+        """
+        output_text(f"Watching {self.directory} for changes. Press Ctrl+C to stop.", option="note")
+        try:
+            while True:
+                self.rebuild(self.wait_for_changes())
+        except KeyboardInterrupt:
+            output_text("Stopped watching.", option="note")
+
+
+class MMORPDND_SERVER:
+    """
+    A class for previewing the campaign while preparing it, through a local HTTP server (the standard library
+    http.server) which renders the pages on request instead of writing them.
+
+    Every HTML page and style sheet is rendered from its source with the page stages of update_all applied in memory:
+    the listing of the index pages, the header and navigation templates, the removal of broken links, the links to
+    other pages and the formatting of beautify_files. The source of a page is the page on disk, or the page the creator
+    renders from the .input or .char file creating it once that file is edited (see render_input_files()). Nothing in
+    the campaign is written, so the stages which write other files are left out: update_images (the pages show their
+    images without the srcset of the resized copies), update_search_index (the search page and its shards are served
+    as the last build wrote them) and export_public.
+
+    The rendered pages are cached, keyed by the hash of their source and of what else they show: the templates, the
+    listing of their directory for index pages, and the pages other pages are linked to. Whether each link of a page
+    points to a file of the campaign is stored with it as well. The files MMORPDND_WATCHER watches are polled in the
+    background, and a change only invalidates the pages it affects (adding an image only renders the index page of
+    its directory and the pages linking to it again), so previewing an edit costs rendering the edited page once.
+    """
+
+    def __init__(self, mmorpdnd=None, directory=global_vars.root_dir, host="127.0.0.1", port=global_vars.server_port,
+                 interval=0.1, debounce=0.25):
+        """
+        Initialization method.
+
+        Args:
+            mmorpdnd (MMORPDND, optional): The MMORPDND instance providing the stage transforms.
+            directory (str, optional): The directory to serve. Defaults to global_vars.root_dir.
+            host (str, optional): The address to listen on. Defaults to the local machine only.
+            port (int, optional): The port to listen on. Defaults to global_vars.server_port.
+            interval (float, optional): The number of seconds between polls for changes. Defaults to 0.1.
+            debounce (float, optional): The number of seconds without changes to wait for before updating the
+                campaign, so a burst of saves only updates it once. Defaults to 0.25.
+        """
+        self.mmorpdnd = mmorpdnd if mmorpdnd is not None else MMORPDND()
+        self.directory = os.path.normpath(os.path.abspath(directory))
+        self.directory_prefix = os.path.join(self.directory, "")
+        self.host = host
+        self.port = port
+        self.watcher = MMORPDND_WATCHER(self.mmorpdnd, self.directory, interval, debounce)
+        self.render_directory = os.path.join(self.directory, global_vars.cache_dir, global_vars.render_dir)
+        # The (page path, rendered path) of the page each edited input file creates, keyed by input file path.
+        self.input_pages = {}
+        # The (key, contents, checked links, whether each link is valid) of each rendered page, keyed by path. See
+        # render_page().
+        self.rendered_pages = {}
+        # The requests are served on separate threads, while the campaign is updated on the watching thread.
+        self.lock = threading.Lock()
+        self.build = None
+        self.templates = None
+        self.linker = None
+        self.layout_hash = None
+        self.linked_pages_hash = None
+        # The pages rendered from the input files of an earlier run are outdated.
+        shutil.rmtree(self.render_directory, ignore_errors=True)
+        self.load_site()
+
+
+    def load_site(self):
+        """
+        Scans the campaign (see MMORPDND_BUILD.scan()), adds the pages rendered from the edited input files and reads
+        the templates. Called at start and after every change.
+
+        Returns:
+            None
+        """
+        build = MMORPDND_BUILD(self.mmorpdnd, self.directory)
+        build.scan()
+        for page_path, rendered_path in sorted(self.input_pages.values()):
+            with open(rendered_path, "r") as f:
+                build.add_page(page_path, f.read())
+
+        self.build = build
+        self.templates = self.mmorpdnd.get_layout_templates()
+        self.linker = None
+        # The header and navigation of every page depend on the templates, and the links of the pages (other than the
+        # index pages) on the pages they can be linked to. See render_page().
+        template, nav_contents, layout_script = self.templates
+        self.layout_hash = get_content_hash(template + nav_contents + global_vars.css_path)
+        self.linked_pages_hash = get_content_hash(repr(sorted(file['full_path'] for file in self.get_html_files())))
+        self.rendered_pages = {path: rendered for path, rendered in self.rendered_pages.items() if path in build.pages}
+
+
+    def get_html_files(self):
+        """
+        Returns the find_all_html_files() entries of the pages other pages link to. See
+        MMORPDND_BUILD.update_html_links().
+        """
+        return [{'name_no_ext': os.path.splitext(page.filename)[0], 'name_with_ext': page.filename,
+                 'full_path': page.path}
+                for page in self.build.html_pages() if "index.html" not in page.filename]
+
+
+    def render_page(self, path):
+        """
+        Returns a page of the campaign as update_all would write it, rendered in memory. See the class description.
+
+        Args:
+            path (str): The normalized path of the page.
+
+        Returns:
+            str: The rendered page, or None if there is no such page.
+        """
+        page = self.build.pages.get(path)
+        if page is None or page.text is None or self.build.is_excluded(path):
+            return None
+        is_html = page.filename.endswith(".html")
+        is_linked = is_html and "index.html" not in page.filename and "_public" not in page.filename
+        key = get_content_hash(page.text)
+        if is_html:
+            key += self.layout_hash
+        if page.filename == "index.html":
+            index_entries = self.build.list_index_entries(page.root)
+            key += get_content_hash(repr(index_entries))
+        if is_linked:
+            key += self.linked_pages_hash
+        rendered = self.rendered_pages.get(path)
+        if rendered is not None and rendered[0] == key and self.get_link_states(rendered[2], page.root) == rendered[3]:
+            return rendered[1]
+
+        start = time.monotonic()
+        text = page.text
+        links = []
+        link_states = []
+        template, nav_contents, layout_script = self.templates
+        if page.filename == "index.html":
+            text = self.mmorpdnd.update_index_file_content(text, *index_entries, page.root)
+        if is_html and "template" not in page.filename:
+            text = self.mmorpdnd.apply_header_template(text, page.filename, page.root, template)
+            text = self.mmorpdnd.apply_navigation_template(text, nav_contents)
+        if is_html:
+            links = [link for link in extract_links(text) if self.mmorpdnd.is_checked_link(link)]
+            link_states = self.get_link_states(links, page.root)
+        # Most pages have no broken links, which is told without parsing the page.
+        if not all(link_states):
+            text = self.build.remove_broken_links_from_page(text, path) or text
+        if is_linked:
+            if self.linker is None:
+                self.linker = self.mmorpdnd.create_linker(self.get_html_files())
+            file_info = {'name_no_ext': os.path.splitext(page.filename)[0], 'name_with_ext': page.filename,
+                         'full_path': path}
+            text = self.mmorpdnd.link_html_page(text, file_info, self.linker)
+        text = self.mmorpdnd.prettify_file_content(page.filename, text)
+
+        self.rendered_pages[path] = (key, text, links, link_states)
+        output_text(f"Rendered {path} in {time.monotonic() - start:.3f} seconds.", option="note")
+        return text
+
+
+    def get_link_states(self, links, root):
+        """
+        Returns whether each link of a page points to a file of the campaign. See MMORPDND_BUILD.is_valid_link().
+
+        Args:
+            links (list): The links of the page which are checked, see MMORPDND.is_checked_link().
+            root (str): The directory of the page.
+
+        Returns:
+            list: Whether each link is valid.
+        """
+        return [self.build.is_valid_link(link, root) for link in links]
+
+
+    def get_response(self, url):
+        """
+        Returns the contents served for a URL which is rendered in memory: the pages and style sheets, the JSON
+        manifests of the paginated index pages and the shared layout script of the "include" layout mode.
+
+        Args:
+            url (str): The path of the request.
+
+        Returns:
+            tuple: The contents (bytes) and content type, or None if the URL is served from disk.
+        """
+        url_path = unquote(urlsplit(url).path)
+        path = os.path.normpath(os.path.join(self.directory, url_path.lstrip("/")))
+        if path != self.directory and not path.startswith(self.directory_prefix):
+            return None
+        # Directories are served as their index page. The URLs of directories without the trailing slash are
+        # redirected by http.server, so the relative links of the index page still work.
+        if url_path.endswith("/"):
+            path = os.path.join(path, "index.html")
+
+        with self.lock:
+            template, nav_contents, layout_script = self.templates
+            if path == os.path.join(self.directory, global_vars.layout_script_path) and layout_script is not None:
+                return layout_script.encode("utf-8"), "text/javascript; charset=utf-8"
+            if os.path.basename(path) == global_vars.index_manifest_file:
+                manifest = self.mmorpdnd.get_index_manifest(*self.build.list_index_entries(os.path.dirname(path)))
+                if manifest is not None:
+                    return manifest.encode("utf-8"), "application/json; charset=utf-8"
+            if path.endswith((".html", ".css")):
+                text = self.render_page(path)
+                if text is not None:
+                    content_type = "text/html" if path.endswith(".html") else "text/css"
+                    return text.encode("utf-8"), f"{content_type}; charset=utf-8"
+        return None
+
+
+    def render_input_files(self, input_files):
+        """
+        Renders the pages of edited input files with the creator, into the render directory instead of the campaign
+        (see --output-root in templates/creator.py), and records which page of the campaign each one creates.
+
+        Args:
+            input_files (list): The paths of the .input and .char files.
+
+        Returns:
+            None
+        """
+        for input_file in input_files:
+            states = self.get_rendered_states()
+            output_text(f"Rendering {input_file}", option="note")
+            # The creator expects to be ran from the templates directory.
+            result = subprocess.run([sys.executable, "creator.py", "-f", input_file, "--no-update", "--output-root",
+                                     self.render_directory], cwd=os.path.join(self.directory, "templates"),
+                                    stdout=subprocess.DEVNULL)
+            if result.returncode != 0:
+                output_text(f"The creator failed for {input_file}", option="error")
+                continue
+            for rendered_path in MMORPDND_WATCHER.get_changes(states, self.get_rendered_states()):
+                page_path = os.path.join(self.directory, os.path.relpath(rendered_path, self.render_directory))
+                self.input_pages[input_file] = (os.path.normpath(page_path), rendered_path)
+
+
+    def get_rendered_states(self):
+        """
+        Returns the (modification time, size) of every page in the render directory, keyed by path.
+        """
+        states = {}
+        for root, dirnames, filenames in walk_directory(self.render_directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                stat = os.stat(path)
+                states[path] = (stat.st_mtime_ns, stat.st_size)
+        return states
+
+
+    def update(self, changes):
+        """
+        Updates the campaign after some files changed: renders the pages of the edited input files, forgets the ones
+        of the removed input files and scans the campaign again. The cached pages whose key changed are rendered again
+        when they are next requested.
+
+        Args:
+            changes (set): The paths of the changed files.
+
+        Returns:
+            None
+        """
+        input_prefix = os.path.join(self.watcher.input_directory, "")
+        input_files = sorted(path for path in changes
+                             if path.startswith(input_prefix) and path.endswith((".input", ".char")))
+        for input_file in input_files:
+            if not os.path.isfile(input_file):
+                self.input_pages.pop(input_file, None)
+        self.render_input_files([input_file for input_file in input_files if os.path.isfile(input_file)])
+        self.load_site()
+        output_text(f"Updated the preview after {len(changes)} changed files.", option="success")
+
+
+    def watch(self):
+        """
+        Polls the campaign for changes and updates the preview, until the process exits.
+        """
+        while True:
+            changes = self.watcher.wait_for_changes()
+            with self.lock:
+                self.update(changes)
+
+
+    def create_handler(self):
+        """
+        Returns the request handler of the HTTP server: the rendered contents (see get_response()), or the files on
+        disk for everything else.
+        """
+        server = self
+
+        class MMORPDND_REQUEST_HANDLER(http.server.SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=server.directory, **kwargs)
+
+            def do_GET(self):
+                response = server.get_response(self.path)
+                if response is None:
+                    return super().do_GET()
+                contents, content_type = response
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(contents)))
+                # The pages change as they are edited.
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(contents)
+
+        return MMORPDND_REQUEST_HANDLER
+
+
+    def run(self):
+        """
+        Serves the campaign and updates it on changes until interrupted with Ctrl+C.
+
+        Returns:
+            None
+        """
+        threading.Thread(target=self.watch, daemon=True).start()
+        with http.server.ThreadingHTTPServer((self.host, self.port), self.create_handler()) as httpd:
+            output_text(f"Previewing {self.directory} at http://{self.host}:{self.port}/ Press Ctrl+C to stop.",
+                        option="note")
+            try:
+                httpd.serve_forever()
+            except KeyboardInterrupt:
+                output_text("Stopped serving.", option="note")
+
+
+class MMORPDND_GUI:
+    """
+    Class to store GUI functions and operations.
+    """
+
+    def __init__(self):
         """
         Initialization method.
         Creates and configures the GUI window, sets up menu bar, and defines button styles.
+        tkinter is only imported here, so the command line tools run on machines without a display or tkinter.
         """
+        import tkinter as tk
+        from tkinter import PhotoImage
+
         self.mmorpdnd = MMORPDND()
         self.gui = tk.Tk()
         self.gui.title("MMORPDND")
@@ -1300,35 +3828,14 @@ class MMORPDND_GUI:
         """
         This method will update all files.
         """
-        self.create_directories()
-        self.create_dummy_html_files()
-        self.create_index_files()
-        self.update_index_links()
-        self.update_headers()
-        self.update_navigation()
-        self.remove_broken_links()
-        self.update_html_links()
-        self.beautify_files()
-        self.publicize_files()
-        output_text("...Finished test for all files!", option="success")
+        test_all(self.mmorpdnd)
 
 
-    def update_all(self):
+    def update_all(self, full=False, jobs=None, profiler=None):
         """
-        This method will update all files.
-
-        Note: The order of these matter!
+        This method will update all files. See update_all().
         """
-        self.create_directories()
-        self.create_index_files()
-        self.update_index_links()
-        self.update_headers()
-        self.update_navigation()
-        self.remove_broken_links()
-        self.update_html_links()
-        self.beautify_files()
-        self.publicize_files()
-        output_text("...Finished updating all files!", option="success")
+        update_all(self.mmorpdnd, full=full, jobs=jobs, profiler=profiler)
 
 
     def create_directories(self):
@@ -1359,39 +3866,179 @@ class MMORPDND_GUI:
         self.mmorpdnd.update_html_links(global_vars.root_dir)
         
     def publicize_files(self):
-        self.mmorpdnd.publicize_files()
+        MMORPDND_BUILD(self.mmorpdnd, global_vars.root_dir).run(["export_public"])
     	
 
+def test_all(mmorpdnd):
+    """
+    Creates the directories and dummy files, then runs every stage on the campaign one after the other.
+
+    Args:
+        mmorpdnd (MMORPDND): The MMORPDND instance running the stages.
+
+    Returns:
+        None
+    """
+    mmorpdnd.create_directories(global_vars.root_dir, global_vars.directory_structure)
+    create_dummy_html_files(global_vars.root_dir)
+    mmorpdnd.create_index_files(global_vars.root_dir)
+    mmorpdnd.update_index_files()
+    mmorpdnd.update_headers(global_vars.root_dir)
+    mmorpdnd.update_navigation(global_vars.root_dir)
+    mmorpdnd.remove_broken_links(global_vars.root_dir)
+    mmorpdnd.update_html_links(global_vars.root_dir)
+    mmorpdnd.beautify_files(global_vars.root_dir)
+    MMORPDND_BUILD(mmorpdnd, global_vars.root_dir).run(["export_public"])
+    output_text("...Finished test for all files!", option="success")
+
+
+def update_all(mmorpdnd, full=False, jobs=None, profiler=None, public_closure=False, dist=False):
+    """
+    Updates all files. The stages are ran in a single pass by MMORPDND_BUILD, which reads and writes each file at most
+    once and skips the files which are already up to date.
+
+    Args:
+        mmorpdnd (MMORPDND): The MMORPDND instance providing the stage transforms.
+        full (bool, optional): Whether to reprocess every file, ignoring the build manifest. Defaults to False.
+        jobs (int, optional): The number of processes to use. Defaults to the number of CPUs.
+        profiler (MMORPDND_PROFILER, optional): A profiler recording the cost of each step of the build.
+        public_closure (bool, optional): Whether to also export the pages the public pages link to. Defaults to False.
+        dist (bool, optional): Whether to also export the minified copy of the campaign, see
+            MMORPDND_BUILD.export_dist(). Defaults to False.
+
+    Returns:
+        None
+    """
+    mmorpdnd.create_directories(global_vars.root_dir, global_vars.directory_structure)
+    stages = MMORPDND_BUILD.stages + (["export_dist"] if dist else [])
+    MMORPDND_BUILD(mmorpdnd, global_vars.root_dir, incremental=not full, jobs=jobs or os.cpu_count(),
+                   profiler=profiler, public_closure=public_closure).run(stages)
+    output_text("...Finished updating all files!", option="success")
+
+
+def save_profile(profiler):
+    """
+    Prints the summary of a --profile run and writes its report.
+
+    Args:
+        profiler (MMORPDND_PROFILER): The profiler of the build.
+
+    Returns:
+        None
+    """
+    profiler.print_summary()
+    profiler.save(args.profile, os.path.join(global_vars.cache_dir, global_vars.profile_history_file),
+                  directory=global_vars.root_dir, full=args.full, jobs=args.jobs,
+                  command=" ".join(sys.argv[1:]))
+
+
 def main():
     # main method code here
-    gui = MMORPDND_GUI()
-
+    # The GUI (and tkinter) is only loaded when no command is given, so the commands also run headless.
+    command = args.command
     if args.test:
-        gui.test_all()
-        exit(0)
+        command = "test"
     elif args.update:
-        gui.update_all()
-        exit(0)
+        command = "all"
+    elif args.watch:
+        command = "watch"
     elif args.remove:
-        gui.remove_broken_links()
-        exit(0)
-    else:
+        command = "remove"
+
+    if command is None:
         parser.print_help()
+        MMORPDND_GUI().run()
+        return
+
+    mmorpdnd = MMORPDND(html_formatter=args.formatter, layout_mode=args.layout)
+    profiler = None
+    if args.profile is not None:
+        profiler = MMORPDND_PROFILER(os.path.splitext(args.profile)[0] if args.cprofile else None)
+
+    if command == "test":
+        test_all(mmorpdnd)
+    elif command == "all":
+        update_all(mmorpdnd, full=args.full, jobs=args.jobs, profiler=profiler, public_closure=args.public_closure,
+                   dist=args.dist)
+    elif command == "watch":
+        # Start from an up to date campaign, then rebuild on every change.
+        update_all(mmorpdnd, full=args.full, jobs=args.jobs, public_closure=args.public_closure, dist=args.dist)
+        MMORPDND_WATCHER(mmorpdnd, global_vars.root_dir, jobs=args.jobs).run()
+    elif command == "serve":
+        MMORPDND_SERVER(mmorpdnd, global_vars.root_dir, port=args.port).run()
+    elif command == "remove":
+        # Check every file, spread across the requested number of processes.
+        MMORPDND_BUILD(mmorpdnd, global_vars.root_dir, incremental=False,
+                       jobs=args.jobs, profiler=profiler).run(["remove_broken_links"])
+    else:
+        stages = MMORPDND_BUILD.commands[command]
+        if args.dist and "export_dist" not in stages:
+            stages = stages + ["export_dist"]
+        MMORPDND_BUILD(mmorpdnd, global_vars.root_dir, incremental=not args.full, jobs=args.jobs, profiler=profiler,
+                       public_closure=args.public_closure).run(stages)
+        output_text(f"...Finished running {command}!", option="success")
 
-    gui.run()
+    if profiler is not None:
+        save_profile(profiler)
+    exit(0)
 
 
 if __name__ == '__main__':
-    import tkinter as tk
-    from tkinter import PhotoImage
-    from cssbeautifier import beautify
-    from bs4 import BeautifulSoup
-    
     # Move the args here so they are not ran when importing this script as a package/module for testing.
-    parser = argparse.ArgumentParser(description='MMORPDND Tools and apps.')
+    # tkinter, BeautifulSoup and cssbeautifier are imported when first needed, see MMORPDND_GUI and
+    # import_html_libraries().
+    parser = argparse.ArgumentParser(description='MMORPDND Tools and apps. Runs the GUI when no command is given.')
+    # The command list of the help is built from MMORPDND_BUILD.commands, so a new command is always listed.
+    commands = list(MMORPDND_BUILD.commands) + ["test", "watch", "serve"]
+    command_descriptions = {
+        "index": "create and update the index files",
+        "images": "resized WebP copies of the images, needs Pillow",
+        "search": "the full-text search page in search/index.html",
+        "publicize": "export the public pages to dist/public",
+        "dist": "see --dist",
+        "all": "every stage",
+        "test": "the test-all feature",
+        "watch": "see --watch",
+        "serve": "preview the campaign on a local server which renders the pages on request, without writing them",
+    }
+    command_help = [f"{command} ({command_descriptions[command]})" if command in command_descriptions else command
+                    for command in commands]
+    parser.add_argument('command', nargs='?', choices=commands,
+                        help=f'Runs the stages of a command on the campaign then exits: {", ".join(command_help[:-1])} '
+                             f'or {command_help[-1]}.')
     parser.add_argument('-t', '--test', action='store_true', help='Runs the test-all feature then exits.')
     parser.add_argument('-u', '--update', action='store_true', help='Runs the update_all feature then exits.')
+    parser.add_argument('-f', '--full', action='store_true',
+                        help='Reprocesses every file during --update or a command instead of only the changed ones.')
+    parser.add_argument('-w', '--watch', action='store_true',
+                        help='Runs the update_all feature, then watches for changes and rebuilds what they affect.')
     parser.add_argument('-r', '--remove', action='store_true', help='Runs the remove_broken_links feature then exits.')
+    parser.add_argument('--port', type=int, default=global_vars.server_port,
+                        help='The port of the preview server of the serve command. Defaults to 8000.')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='The number of processes to use for --update, --remove and the commands. Defaults to the '
+                             'number of CPUs.')
+    parser.add_argument('--public-closure', action='store_true',
+                        help='Also exports every page the public pages link to when exporting the public pages to '
+                             'dist/public (during --update, or the all and publicize commands).')
+    parser.add_argument('--dist', action='store_true',
+                        help='Also exports a minified copy of the campaign for static hosting to dist/site, with '
+                             'precompressed .gz (and .br, if brotli is installed) copies of its text files (during '
+                             '--update or a command).')
+    parser.add_argument('--formatter', choices=["bs4", "fast"], default=global_vars.html_formatter,
+                        help='The HTML formatter of the beautify stage: bs4 (BeautifulSoup) or fast (the same output '
+                             'without building a parse tree). Defaults to bs4.')
+    parser.add_argument('--layout', choices=["inline", "include"], default=global_vars.layout_mode,
+                        help='How the pages get the header and navigation templates: inline (copied into every page) '
+                             'or include (moved into one shared script every page loads, so editing the templates only '
+                             'changes that script). Defaults to inline.')
+    parser.add_argument('-p', '--profile', nargs='?',
+                        const=os.path.join(global_vars.cache_dir, global_vars.profile_file),
+                        help='Profiles each step of --update, --remove or a command, prints a summary and writes a '
+                             'JSON report to the given path (.mmorpdnd/profile.json by default).')
+    parser.add_argument('--cprofile', action='store_true',
+                        help='With --profile, also dumps the cProfile statistics of each step to a directory named '
+                             'after the report.')
     
 
     args = parser.parse_args()
@@ -4,6 +4,11 @@ import re
 import shutil
 import random
 import json
+import io
+import sys
+import time
+import contextlib
+import multiprocessing
 
 # Used for program arguments.
 import argparse
@@ -14,6 +19,15 @@ terminal_mode = False
 # Import helper functions from common tools file.
 from mmorpdnd_tools import output_text
 from mmorpdnd_tools import is_image_file
+from mmorpdnd_tools import write_file
+from mmorpdnd_tools import get_random_lines
+from mmorpdnd_names import NAME_MODEL_ORDER
+from mmorpdnd_names import NAME_LISTS_DIRECTORY
+from mmorpdnd_names import NameModel
+from mmorpdnd_names import generate_unique_names
+from mmorpdnd_names import load_name_model
+from mmorpdnd_names import read_known_names
+from mmorpdnd_workspace import WorkspaceIndex
 
 
 def ensure_directory_exists(directory_path):
@@ -513,36 +527,68 @@ def generate_prob_matrix(words):
     return prob_matrix
 
 
-def generate_word_from_file(file_name):
+def generate_word_from_file(file_name, order=NAME_MODEL_ORDER):
     """
-    This will generate a random word from a probability matrix from a file.
+    This will generate a random word from the name model of a file. The model is compiled once per file contents and
+    cached (see load_name_model() in mmorpdnd_names.py), so only the first word generated from a file reads it.
     
     Args:
         file_name (str): The file name to parse. It should be a .list or .names file.
+        order (int, optional): The number of letters each letter of the word is picked from. Defaults to
+            NAME_MODEL_ORDER.
         
     Returns:
         word (str): The generated word.
     """
     
-    if file_name.endswith(".names") or file_name.endswith(".list"):
-        file_content_list = read_lines_from_file(file_name)
-    else:
+    if not (file_name.endswith(".names") or file_name.endswith(".list")):
         output_text(f"ERROR: Invalid file for generate_word_from_file(): {file_name}", "error")
         return ""
-        
-    output_text("Generating word.")
-    
-    # Generate probability matrix and word generation parameters.
-    prob_matrix = generate_prob_matrix(file_content_list)
-    shortest, longest = find_longest_and_shortest(file_content_list)
-    print_prob_matrix(prob_matrix)
-    
+
     # Generate word.
-    word = "{0}".format(generate_word(prob_matrix, shortest, longest))
+    word = load_name_model(file_name, order).generate()
     output_text(f"Generated word: {word}", "success")
     return word
     
 
+def generate_names(list_file, count, output_file=None, order=NAME_MODEL_ORDER):
+    """
+    Generates names from the name model of a list which are in none of the name lists, and writes them one per line as
+    they are generated. The names are within the length bounds of the list, the same as find_longest_and_shortest()
+    gives. Used by the names command (`./creator.py names --list elven.names --count 5000`).
+
+    Args:
+        list_file (str): The list to generate the names from. A file name which is not found is looked for in
+            templates/lists.
+        count (int): The number of names to generate.
+        output_file (str, optional): The file to write the names to. Defaults to None (standard output).
+        order (int, optional): The number of letters each letter of a name is picked from. Defaults to
+            NAME_MODEL_ORDER.
+
+    Returns:
+        int: The number of names written. This is less than count when the list can not make that many new names.
+    """
+    if not os.path.isfile(list_file):
+        list_file = os.path.join(NAME_LISTS_DIRECTORY, list_file)
+    model = load_name_model(list_file, order)
+    # The case folded names of every *.names list, so only names which are in none of them are generated.
+    known_names = read_known_names()
+
+    written = 0
+    output = open(output_file, "w", encoding="utf-8") if output_file else sys.stdout
+    try:
+        for batch in generate_unique_names(model, count, known_names):
+            output.write("\n".join(batch) + "\n")
+            written += len(batch)
+    finally:
+        if output_file:
+            output.close()
+
+    if written < count:
+        output_text(f"Only {written} new names could be generated from {list_file}.", "warning")
+    return written
+
+
 def generate_word(prob_matrix, min_length=4, max_length=10):
     """
     Generate a random word using a probability matrix.
@@ -624,9 +670,17 @@ class Variables:
         self.current_list = []
         self.output_file_folder = ""
         self.character_template_file = "characterTemplate.html"
+        # The directory the pages are written to instead of the workspace, at the same relative path (see
+        # --output-root and get_output_path()). Used to preview the pages of the input files without changing the
+        # workspace.
+        self.output_root = None
 
         # Define directories to exclude
-        self.directories_to_exclude = ["templates", "css", ".git", ".idea", ".github", "scripts", "docs"]
+        self.directories_to_exclude = ["templates", "css", ".git", ".idea", ".github", "scripts", "docs",
+                                       # The build cache and outputs of mmorpdnd.py.
+                                       ".mmorpdnd", "dist", "assets"]
+        # The file the workspace index is stored in (see get_workspace_index()), in the cache directory of mmorpdnd.py.
+        self.workspace_index_file = os.path.join("..", ".mmorpdnd", "workspace.json")
 
         # Define the root directory
         self.root_dir = os.getcwd()
@@ -681,6 +735,24 @@ class Variables:
 global_vars = Variables()
 
 
+def get_output_path(path):
+    """
+    Returns the path a created page is written to: its destination in the workspace, or the same place under
+    global_vars.output_root when it is set. The directory of the returned path is created if needed.
+
+    Args:
+        path (str): The destination of the page in the workspace, relative to the templates directory.
+
+    Returns:
+        str: The path to write the page to.
+    """
+    if global_vars.output_root is None:
+        return path
+    output_path = os.path.join(global_vars.output_root, os.path.relpath(path, ".."))
+    ensure_directory_exists(os.path.dirname(output_path))
+    return output_path
+
+
 def get_character_fields(file):
     """
     Read a file containing character fields and their values, and return a dictionary of the fields.
@@ -1044,12 +1116,15 @@ def add_number_to_filename(filename, number):
     return new_filename
 
 
-def create_html_img(input_line):
+def create_html_img(input_line, workspace_index=None):
     """
     Create an HTML block for an image section.
 
     Args:
         input_line (str): The input string of the form "image_file, image_source, caption".
+        workspace_index (WorkspaceIndex, optional): The workspace index to look up the image files in, so the numbered
+            copies of an image are found from one listing of its directory. Defaults to None (each file is checked
+            on disk).
 
     Returns:
         str: The HTML block representing the image section.
@@ -1070,11 +1145,14 @@ def create_html_img(input_line):
     image_source = input_line[1].strip()
     image_caption = input_line[2].strip()
 
-    if not os.path.isfile(image_file):
+    is_file = os.path.isfile if workspace_index is None else workspace_index.is_file
+    if not is_file(image_file):
         output_text(f"Image NOT found: {image_file}.", "warning")
         if "www." in image_source or "https:" in image_source:
             if not download_image(image_source, image_file):
                 output_text(f"No image found: image section will be incomplete.", "warning")
+            elif workspace_index is not None:
+                workspace_index.forget(image_file)
     else:
         output_text(f"Image found: {image_file}.", "success")
 
@@ -1082,21 +1160,21 @@ def create_html_img(input_line):
     if " (1)" in image_file:
         img_file_enum = image_file
         count = 2
-        while os.path.isfile(img_file_enum):
+        while is_file(img_file_enum):
             image_files.append(img_file_enum)
             img_file_enum = img_file_enum.replace(f" ({count - 1})", f" ({count})")
             count += 1
-    elif os.path.isfile(add_number_to_filename(image_file, 1)):
-        if os.path.isfile(image_file):
+    elif is_file(add_number_to_filename(image_file, 1)):
+        if is_file(image_file):
             image_files.append(image_file)
         img_file_enum = add_number_to_filename(image_file, 1)
         count = 2
-        while os.path.isfile(img_file_enum):
+        while is_file(img_file_enum):
             output_text(f"Image file with added number found: {img_file_enum}.", "success")
             image_files.append(img_file_enum)
             img_file_enum = img_file_enum.replace(f" ({count - 1})", f" ({count})")
             count += 1
-    elif os.path.isfile(image_file):
+    elif is_file(image_file):
         image_files.append(image_file)
 
     # Generate the HTML block
@@ -1118,25 +1196,30 @@ def create_html_img(input_line):
     return html_block, image_files
 
 
-def fix_image_extensions():
+def fix_image_extensions(directory="./img"):
     """
-    Updates all image extensions by running the fix_image_extensions.py script.
+    Updates all image extensions, renaming the .jpeg images of a directory to .jpg the same as the
+    img/fix_image_extensions.py script does, without changing the working directory or starting another process.
+
+    Args:
+        directory (str, optional): The image directory. Defaults to "./img".
+
+    Returns:
+        int: The number of images renamed.
 
     Example usage:
         fix_image_extensions()
     """
-    current_dir = os.getcwd()
-    ensure_directory_exists("./img")
-    os.chdir("./img")
-    if os.path.isfile("fix_image_extensions.py"):
-        command = f"./fix_image_extensions.py"
-        os.system(command)
-    else:
-        output_text("Error: 'fix_image_extensions.py' file not found.", "error")
-        
-    # Return to the original directory 
-    os.chdir(current_dir)
-    return
+    ensure_directory_exists(directory)
+    count = 0
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(".jpeg"):
+            new_name = file_name.replace(".jpeg", ".jpg")
+            os.rename(os.path.join(directory, file_name), os.path.join(directory, new_name))
+            output_text(f"Renamed file: {file_name} -> {new_name}")
+            count += 1
+    output_text(f"Renamed {count} file(s).")
+    return count
 
 
 def update_all():
@@ -1168,7 +1251,7 @@ def update_all():
 
 def get_random_line(file_path):
     """
-    Return a random line from a file.
+    Return a random line from a file. See get_random_lines() in mmorpdnd_tools.py to get many lines in one call.
 
     Args:
         file_path (str): The path to the file.
@@ -1181,10 +1264,7 @@ def get_random_line(file_path):
         IOError: If there is an error reading the file.
     """
     try:
-        with open(file_path, "r") as file:
-            lines = file.readlines()
-            random_line = random.choice(lines)
-            return random_line.strip()
+        return get_random_lines(file_path)[0]
     except FileNotFoundError:
         raise FileNotFoundError(f"File not found: {file_path}")
     except IOError:
@@ -1214,9 +1294,78 @@ def extract_first_integer(string):
         return None
 
 
+# The creator of a pool worker process of Creator.create_directory_pages(). See init_pool_worker().
+pool_creator = None
+
+
+def init_pool_worker(output_root, workspace_index):
+    """
+    Initializes a pool worker process of Creator.create_directory_pages() with its own creator, in terminal mode.
+
+    Args:
+        output_root (str): The output root the pages are written under, see global_vars.output_root.
+        workspace_index (WorkspaceIndex): The workspace index of the create_pages() run.
+
+    Returns:
+        None
+    """
+    global pool_creator, terminal_mode
+    terminal_mode = True
+    global_vars.output_root = output_root
+    pool_creator = Creator()
+    pool_creator.workspace_index = workspace_index
+
+
+def create_input_file_page(creator, file_path):
+    """
+    Creates the page of an input file (.input) or character file (.char), catching any error so a file which fails
+    does not stop the others.
+
+    Args:
+        creator (Creator): The creator to create the page with.
+        file_path (str): The path of the file.
+
+    Returns:
+        tuple: Whether the page was created, the error message if it was not, and the seconds it took.
+    """
+    start = time.perf_counter()
+    try:
+        if file_path.endswith(".char"):
+            creator.generate_char(file_path)
+        else:
+            creator.create_page(file_path)
+    except Exception as e:
+        output_text(f"An error occurred for {file_path}: {e}", "error")
+        return False, str(e) or type(e).__name__, time.perf_counter() - start
+    return True, None, time.perf_counter() - start
+
+
+def run_pool_task(file_path):
+    """
+    Creates the page of an input file in a pool worker process, capturing everything it prints.
+
+    Args:
+        file_path (str): The path of the file.
+
+    Returns:
+        tuple: Whether the page was created, the error message if it was not, the seconds it took, the workspace
+            directories it wrote to (see WorkspaceIndex.refresh()) and its printed output.
+    """
+    output = io.StringIO()
+    pool_creator.workspace_index.refreshed.clear()
+    with contextlib.redirect_stdout(output):
+        succeeded, error, seconds = create_input_file_page(pool_creator, file_path)
+    return succeeded, error, seconds, sorted(pool_creator.workspace_index.refreshed), output.getvalue()
+
+
 class Creator:
     def __init__(self):
         self.last_user_input = None
+        # The workspace index shared by the pages of a create_pages() run. See get_workspace_index().
+        self.workspace_index = None
+        # The checkboxes of the gui. See is_checked().
+        self.trash_checkbox_value = None
+        self.download_checkbox_value = None
 
         if not terminal_mode:
             self.gui = tk.Tk()
@@ -1422,7 +1571,7 @@ class Creator:
                 output_text(f"File already exists: {mp3_path}", "warning")
                 return mp3_path
 
-            if not self.download_checkbox_value.get():
+            if not self.is_checked(self.download_checkbox_value):
                 output_text(f"Downloading option not checked: {mp3_path}")
                 return mp3_path
             else:            
@@ -1493,9 +1642,9 @@ class Creator:
         self.output_text_to_gui(f"Generating {number} random place names!")
         self.output_text_to_gui(f"---------------------------------")
         if os.path.isfile(global_vars.current_file):
-            for i in range(number):
-                place = get_random_line(global_vars.current_file)
-                place_type = get_random_line(type_list)
+            places = get_random_lines(global_vars.current_file, number)
+            place_types = get_random_lines(type_list, number)
+            for place, place_type in zip(places, place_types):
                 place_combo = f"{place} {place_type}"
                 self.output_text_to_gui(place_combo)
                 random_places.append(place_combo)
@@ -1506,14 +1655,19 @@ class Creator:
                 f.write(place + '\n')
                 
 
-    def create_pages(self, input_file=None):
+    def create_pages(self, input_file=None, jobs=None):
         """
         Generate page files for a file or each file within a directory.
 
         This method checks if the current file (global_vars.current_file) is a directory.
         If it is a file, it calls the generate_char() or create_page() method based on the file extension.
-        If it is a directory, it iterates through each file within the directory and calls the generate_char()
-        or create_page() method for each individual file.
+        If it is a directory, the generate_char() or create_page() method is called for each individual file, spread
+        across a pool of processes (see create_directory_pages()).
+
+        Args:
+            input_file (str, optional): The file or directory. Defaults to the input file entered in the gui.
+            jobs (int, optional): The number of processes to create the pages of a directory with. Defaults to the
+                number of CPUs.
 
         Returns:
             None
@@ -1524,6 +1678,20 @@ class Creator:
         self.update_input_file(input_file)
         fix_image_extensions()
 
+        # Only index the workspace once for all the files.
+        self.workspace_index = self.get_workspace_index()
+        try:
+            self.create_input_pages(jobs)
+        finally:
+            self.workspace_index.save()
+            self.workspace_index = None
+
+
+    def create_input_pages(self, jobs=None):
+        """
+        Generate the page files of the current file (global_vars.current_file), or of each file within it if it is a
+        directory. See create_pages().
+        """
         # Check if the input is a file.
         if os.path.isfile(global_vars.current_file):
             if global_vars.current_file.endswith(".char"):
@@ -1534,25 +1702,107 @@ class Creator:
         # Otherwise it should be a directory.
         elif os.path.isdir(global_vars.current_file):
             directory = global_vars.current_file
-            
-            # Iterate through all files in the directory.
-            for file_name in os.listdir(directory):
-                file_path = os.path.join(directory, file_name)
-                if os.path.isfile(file_path):
-                    try:
-                        if file_path.endswith(".char"):
-                            self.generate_char(file_path)
-                        elif file_path.endswith(".input"):
-                            self.create_page(file_path)
-                    except Exception as e:
-                        print(f"An error occurred: {e}")
-
+            self.create_directory_pages(directory, jobs)
             self.output_text_to_gui(f"Page generation completed for all files in the directory: {directory}.")
         else:
             # If the current file is not a file or directory, display an error message and return.
             self.output_text_to_gui(f"Error: {global_vars.current_file} is not a file or directory.")
             return
-            
+
+
+    def create_directory_pages(self, directory, jobs=None):
+        """
+        Generate the page files of each .input and .char file within a directory, spread across a pool of processes
+        when there is more than one job. Each worker process has its own creator and global_vars (see
+        init_pool_worker()), and a file which fails does not stop the others. A summary of each file is printed at the
+        end.
+
+        The files are created one at a time when the trash or download option is checked, since trashing moves the
+        images pages may share and downloading needs the gui.
+
+        Args:
+            directory (str): The directory of the input files.
+            jobs (int, optional): The number of processes to use. Defaults to the number of CPUs.
+
+        Returns:
+            list: The (file, succeeded, error message, seconds) of each file.
+        """
+        files = sorted(os.path.join(directory, file_name) for file_name in os.listdir(directory)
+                       if file_name.endswith((".char", ".input")))
+        files = [file_path for file_path in files if os.path.isfile(file_path)]
+        processes = min(jobs or os.cpu_count() or 1, len(files))
+
+        results = []
+        if (processes > 1 and not self.is_checked(self.trash_checkbox_value)
+                and not self.is_checked(self.download_checkbox_value)):
+            workspace_index = self.get_workspace_index()
+            with multiprocessing.Pool(processes, initializer=init_pool_worker,
+                                      initargs=(global_vars.output_root, workspace_index)) as pool:
+                for file_path, (succeeded, error, seconds, directories, output) in zip(
+                        files, pool.imap(run_pool_task, files)):
+                    sys.stdout.write(output)
+                    # The workers wrote to these directories, see finish_workspace_index().
+                    for written_directory in directories:
+                        workspace_index.refresh(written_directory)
+                    results.append((file_path, succeeded, error, seconds))
+            if workspace_index is not self.workspace_index:
+                workspace_index.save()
+        else:
+            for file_path in files:
+                results.append((file_path, *create_input_file_page(self, file_path)))
+
+        self.output_page_summary(results)
+        return results
+
+
+    def output_page_summary(self, results):
+        """
+        Outputs a table of the files create_directory_pages() created pages for: whether each succeeded, how long it
+        took and why it failed.
+
+        Args:
+            results (list): The (file, succeeded, error message, seconds) of each file.
+        """
+        self.output_text_to_gui(f"{'status':<8}{'seconds':>9}  file")
+        for file_path, succeeded, error, seconds in results:
+            line = f"{'ok' if succeeded else 'failed':<8}{seconds:>9.3f}  {os.path.basename(file_path)}"
+            self.output_text_to_gui(line if succeeded else f"{line}: {error}")
+        failed = sum(1 for result in results if not result[1])
+        total = sum(result[3] for result in results)
+        self.output_text_to_gui(f"{len(results) - failed} ok, {failed} failed, {total:.2f} seconds of page generation.")
+
+
+    def get_workspace_index(self):
+        """
+        Returns the index of the workspace (the parent directory of the templates folder), without the directories in
+        global_vars.directories_to_exclude. Used to find the destination folders of pages and their images.
+
+        The index of the current create_pages() run is shared by all its pages. Otherwise the index stored by the last
+        run is loaded, and only rebuilt (by walking the workspace) if a directory changed since. See WorkspaceIndex.
+
+        Returns:
+            WorkspaceIndex: The workspace index.
+        """
+        if self.workspace_index is not None:
+            return self.workspace_index
+        workspace_index = WorkspaceIndex("../", global_vars.directories_to_exclude, global_vars.workspace_index_file)
+        workspace_index.load()
+        return workspace_index
+
+
+    def finish_workspace_index(self, workspace_index):
+        """
+        Updates the workspace index after a page was written to global_vars.output_file_folder, and stores it unless
+        it belongs to a create_pages() run (which stores it once all its pages are written).
+
+        Args:
+            workspace_index (WorkspaceIndex): The index the page was created with.
+        """
+        if global_vars.output_root is None:
+            workspace_index.refresh(global_vars.output_file_folder)
+        if workspace_index is not self.workspace_index:
+            workspace_index.save()
+
 
     def create_page(self, file=global_vars.current_file):
         """
@@ -1584,24 +1834,16 @@ class Creator:
         output_text(f"Application being ran from: {os.getcwd()}", "note")
 
         global_vars.output_file_folder = os.getcwd()  # used for testing mainly
-        for dirpath, dirnames, filenames in os.walk("../"):
-
-            # Check if we are looking at a file in our exclude list.
-            if any(exclude in dirnames for exclude in global_vars.directories_to_exclude):
-                continue
-
-            # Check if we are looking at a file in our exclude list.
-            if any(exclude in dirpath for exclude in global_vars.directories_to_exclude):
-                continue
-
-            if folder in dirnames:
-                output_text(f"Matching folder found: {folder} in {dirpath}", "note")             
+        workspace_index = self.get_workspace_index()
+        match = workspace_index.find_page_folder(folder)
+        if match is not None:
+            dirpath, is_subdirectory = match
+            if is_subdirectory:
+                output_text(f"Matching folder found: {folder} in {dirpath}", "note")
                 global_vars.output_file_folder = dirpath + "/" + folder + "/"
-                break
-            elif dirpath.endswith(folder):
-                output_text(f"No matching folder found: {folder} in {dirpath}", "note")   
+            else:
+                output_text(f"No matching folder found: {folder} in {dirpath}", "note")
                 global_vars.output_file_folder = dirpath + "/"
-                break
 
         # Check if the folder was not found (still default value). Means no folder existed.
         if global_vars.output_file_folder == os.getcwd():
@@ -1618,8 +1860,8 @@ class Creator:
             output_file = global_vars.output_file_folder + output_fn + ".html"
         output_text(f"Output file: {output_file}", "note")
 
-        # create HTML file
-        with open(output_file, 'w') as f:
+        # create HTML file, in memory first so it is only written if it changed.
+        with io.StringIO() as f:
             # write HTML boilerplate
             f.write('<!DOCTYPE html>\n<html>\n<head>\n<title></title>\n</head>\n<body>\n')
 
@@ -1653,7 +1895,7 @@ class Creator:
 
                 elif class_name == "dnd-image" and ";" in value:
                     # Create HTML image element.
-                    html_img, image_files = create_html_img(value)
+                    html_img, image_files = create_html_img(value, workspace_index)
                     image_name = value.split(';')[0].strip()
                     for img in image_files:       
                         output_text(f"Processed {img}.")
@@ -1681,20 +1923,24 @@ class Creator:
 
             # close HTML file
             f.write('</body>\n</html>')
-            f.close()
 
-            output_text(f'HTML file created: {output_file}', "note")
+            output_file = get_output_path(output_file)
+            if write_file(output_file, f.getvalue()):
+                output_text(f'HTML file created: {output_file}', "note")
+            else:
+                output_text(f'HTML file unchanged: {output_file}', "note")
 
-        # copy images to correct location.
-        if len(output_images) > 0:
+        # copy images to correct location, unless the page is only previewed.
+        if len(output_images) > 0 and global_vars.output_root is None:
             for image in output_images:
                 if os.path.isfile(image):
                     output_image_dir = global_vars.output_file_folder + "img"
                     ensure_directory_exists(output_image_dir)
 
                     # trash image if needed.
-                    if self.trash_checkbox_value.get():
+                    if self.is_checked(self.trash_checkbox_value):
                         move_file_to_directory(image, output_image_dir)
+                        workspace_index.forget(image)
                         if os.path.isfile(image):
                             global_vars.trash_file(image)
                     else:
@@ -1707,6 +1953,8 @@ class Creator:
                     if os.path.isfile(output_image_file):
                         output_text(f'Image file exists in target directory: {output_image_file}', "warning")
 
+        self.finish_workspace_index(workspace_index)
+
         # move the files to the trash if this option is selected.
         if not terminal_mode:
             if self.trash_checkbox_value.get():
@@ -1715,6 +1963,14 @@ class Creator:
         return True            
 
 
+    def is_checked(self, checkbox_value):
+        """
+        Returns whether a checkbox of the gui (such as self.trash_checkbox_value) is checked. In terminal mode there are
+        no checkboxes, so none are checked.
+        """
+        return checkbox_value is not None and checkbox_value.get()
+
+
     def checkbox_changed(self):
         """
         This method is called when checkboxes are checked or unchecked.
@@ -1777,6 +2033,7 @@ class Creator:
         char_class = char_fields['class']
 
         global_vars.output_file_folder = '.'  # used for testing mainly
+        workspace_index = self.get_workspace_index()
 
         if "folder" in char_fields:
             folder = char_fields['folder'].strip()
@@ -1785,24 +2042,17 @@ class Creator:
 
             output_text(f"Destination folder detected as {folder}", "note")
 
-            for dirpath, dirnames, filenames in os.walk("../"):
-
-                # Check if we are looking at a file in our exclude list.
-                if any(exclude in dirnames for exclude in global_vars.directories_to_exclude):
-                    continue
-                # Check if we are looking at a file in our exclude list.
-                if any(exclude in dirpath for exclude in global_vars.directories_to_exclude):
-                    continue
-
-                if folder in dirpath:
-                    # add the class to the folder path if it's a non-player character.
-                    if "characters/non-player" in folder:
-                        # Take just the first word of the class (to remove subclass data).
-                        global_vars.output_file_folder = dirpath + "/" + char_class.lower().split(" ")[0] + "/"
-                        ensure_directory_exists(global_vars.output_file_folder)               
-                    else:
-                        global_vars.output_file_folder = dirpath + "/"
-                    break
+            dirpath = workspace_index.find_char_folder(folder)
+            if dirpath is not None:
+                # add the class to the folder path if it's a non-player character.
+                if "characters/non-player" in folder:
+                    # Take just the first word of the class (to remove subclass data).
+                    global_vars.output_file_folder = dirpath + "/" + char_class.lower().split(" ")[0] + "/"
+                    ensure_directory_exists(global_vars.output_file_folder)
+                    # The class directory may be new.
+                    workspace_index.refresh(dirpath)
+                else:
+                    global_vars.output_file_folder = dirpath + "/"
 
             output_text(f"Output file folder set to: {global_vars.output_file_folder}", "note")
 
@@ -1991,7 +2241,7 @@ class Creator:
 
             elif class_name == "dnd-image" and ";" in value:
                 # Create HTML image element.
-                html_img, image_files = create_html_img(value)
+                html_img, image_files = create_html_img(value, workspace_index)
                 image_name = value.split(';')[0].strip()
                 for img in image_files:       
                     output_text(f"Processed {img}.")
@@ -2016,25 +2266,26 @@ class Creator:
         
             template += html_element
         
-        # Write the new character file
-        with open(filepath, 'w') as f:
-            f.write(template)
+        # Write the new character file, if it changed.
+        filepath = get_output_path(filepath)
+        write_file(filepath, template)
 
         output_text(f'Character file created: {filepath}', "note")       
         
         # Remove duplicate images if any.
         output_images = list(dict.fromkeys(output_images))
         
-        # copy images to correct location.
-        if len(output_images) > 0:
+        # copy images to correct location, unless the page is only previewed.
+        if len(output_images) > 0 and global_vars.output_root is None:
             for image in output_images:
                 if os.path.isfile(image):
                     output_image_dir = global_vars.output_file_folder + "img"
                     ensure_directory_exists(output_image_dir)
 
                     # trash image if needed.
-                    if self.trash_checkbox_value.get():
+                    if self.is_checked(self.trash_checkbox_value):
                         move_file_to_directory(image, output_image_dir)
+                        workspace_index.forget(image)
                         if os.path.isfile(image):
                             global_vars.trash_file(image)
                     else:
@@ -2047,6 +2298,8 @@ class Creator:
                     if os.path.isfile(output_image_file):
                         output_text(f'Image file exists in target directory: {output_image_file}', "warning")
 
+        self.finish_workspace_index(workspace_index)
+
         # move the files to the trash if this option is selected.
         if not terminal_mode:
             if self.trash_checkbox_value.get():
@@ -2296,10 +2549,9 @@ class Creator:
         The method performs the following steps:
         1. Prints a message indicating that a word is being generated.
         2. Updates the input file.
-        3. Generates a probability matrix based on the current list.
-        4. Prints the generated probability matrix.
-        5. Enters a loop that continues until the last user input is "reset".
-            a. Generates a word using the current probability matrix.
+        3. Loads the name model of the current file (see load_name_model()), or compiles one from the current list.
+        4. Enters a loop that continues until the last user input is "reset".
+            a. Generates a word using the name model.
             b. Outputs the generated word.
             c. Asks the user if they want to append the word to the file.
             d. Retrieves the user's choice.
@@ -2315,11 +2567,12 @@ class Creator:
         """
         output_text("Generating word.")
         self.update_input_file()
-        global_vars.current_prob_matrix = generate_prob_matrix(global_vars.current_list)
-        shortest, longest = find_longest_and_shortest(global_vars.current_list)
-        print_prob_matrix(global_vars.current_prob_matrix)
+        if global_vars.current_file.endswith((".names", ".list")):
+            global_vars.current_prob_matrix = load_name_model(global_vars.current_file)
+        else:
+            global_vars.current_prob_matrix = NameModel.from_names(global_vars.current_list)
         while self.last_user_input != "reset":
-            word = "{0}".format(generate_word(global_vars.current_prob_matrix, shortest, longest))
+            word = "{0}".format(global_vars.current_prob_matrix.generate())
             self.output_text_to_gui(f"Generated word: {word}")
             self.output_text_to_gui("Do you want to append this word to the file? (y/n)")
             # Get the user's choice
@@ -2339,16 +2592,44 @@ class Creator:
 
 
 if __name__ == '__main__':
-    import requests
-    from bs4 import BeautifulSoup
-    
     parser = argparse.ArgumentParser(description='MMORPDND Creator Tool.')
+    parser.add_argument('command', nargs='?', choices=["names"],
+                        help='Run a command without the gui. names generates --count new names from --list.')
     parser.add_argument('-f', '--file', action='store', help='Run the creator for a single input file and update all files.')
+    parser.add_argument('-j', '--jobs', action='store', type=int,
+                        help='The number of processes to create the pages of a directory (given with --file) with. '
+                             'Defaults to the number of CPUs.')
+    parser.add_argument('-n', '--no-update', action='store_true',
+                        help='Skip updating all files after running the creator for a single input file.')
+    parser.add_argument('-o', '--output-root', action='store',
+                        help='Write the page of a single input file under this directory (at the same path as in the '
+                             'workspace) instead of the workspace, without copying its images or updating all files. '
+                             'Used by the preview server of mmorpdnd.py.')
+    parser.add_argument('-l', '--list', action='store', default="names.names",
+                        help='The list the names command generates names from, a path or a file in templates/lists. '
+                             'Defaults to names.names.')
+    parser.add_argument('-c', '--count', action='store', type=int, default=100,
+                        help='The number of names the names command generates. Defaults to 100.')
+    parser.add_argument('--names-file', action='store',
+                        help='The file the names command writes the names to. Defaults to the standard output.')
+    parser.add_argument('--order', action='store', type=int, default=NAME_MODEL_ORDER,
+                        help=f'The number of letters each letter of a generated name is picked from. '
+                             f'Defaults to {NAME_MODEL_ORDER}.')
 
     args = parser.parse_args()
+
+    # The names command only reads the name lists.
+    if args.command == "names":
+        generate_names(args.list, args.count, args.names_file, args.order)
+        sys.exit(0)
+
+    import requests
+    from bs4 import BeautifulSoup
     
     if args.file != None:
         terminal_mode = True
+    if args.output_root != None:
+        global_vars.output_root = args.output_root
 
     if not terminal_mode:
         import tkinter as tk
@@ -2367,5 +2648,6 @@ if __name__ == '__main__':
         app.run()
     else:
         print(f"Running crator processes in single file mode for: {args.file}")
-        app.create_pages(args.file)
-        update_all()
+        app.create_pages(args.file, args.jobs)
+        if not args.no_update and global_vars.output_root is None:
+            update_all()
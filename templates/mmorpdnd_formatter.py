@@ -0,0 +1,347 @@
+# mmorpdnd_formatter.py
+# This file contains the fast HTML formatter used by the beautify_files stage of mmorpdnd.py.
+# Purpose: To pretty print HTML exactly like BeautifulSoup(contents, "html.parser").prettify() does, without building a
+# parse tree. The markup is read with the same standard library parser BeautifulSoup uses, and every element is
+# written out as soon as it is parsed, so formatting a page costs a single pass over it.
+
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+
+# The elements which never have contents. They are closed as soon as they are opened and written as <tag/>.
+VOID_ELEMENTS = {"area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr", "image", "img",
+                 "input", "isindex", "keygen", "link", "menuitem", "meta", "nextid", "param", "source", "spacer",
+                 "track", "wbr"}
+# The elements whose contents are written as they are, without indentation.
+PRESERVE_WHITESPACE_ELEMENTS = {"pre", "textarea"}
+# The elements whose text is written without escaping.
+CDATA_ELEMENTS = {"script", "style"}
+# The attributes holding a whitespace separated list of values, which are written separated by single spaces. The
+# attributes listed under "*" are lists on every element.
+LIST_ATTRIBUTES = {
+    "*": {"class", "accesskey", "dropzone"},
+    "a": {"rel", "rev"},
+    "link": {"rel", "rev"},
+    "td": {"headers"},
+    "th": {"headers"},
+    "form": {"accept-charset"},
+    "object": {"archive"},
+    "area": {"rel"},
+    "icon": {"sizes"},
+    "iframe": {"sandbox"},
+    "output": {"for"},
+}
+# The characters a string can be made of to be collapsed to a single space or newline.
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+# The encoding written in the charset of the <meta> tags.
+OUTPUT_ENCODING = "utf-8"
+CHARSET_REGEX = re.compile(r"((^|;)\s*charset=)([^;]*)", re.M)
+NON_WHITESPACE_REGEX = re.compile(r"\S+")
+DECIMAL_REFERENCE_REGEX = re.compile("^([0-9]+)(.*)")
+HEX_REFERENCE_REGEX = re.compile("^([0-9a-f]+)(.*)")
+
+# The character of each named entity, keyed by its name without the semicolon.
+ENTITY_CHARACTERS = {}
+for _name, _character in sorted(html5.items()):
+    ENTITY_CHARACTERS.setdefault(_name.rstrip(";"), _character)
+
+# The prefix and suffix each kind of string is written with.
+TEXT = ("", "")
+COMMENT = ("<!--", "-->")
+DOCTYPE = ("<!DOCTYPE ", ">\n")
+DECLARATION = ("<?", "?>")
+CDATA = ("<![CDATA[", "]]>")
+PROCESSING_INSTRUCTION = ("<?", ">")
+
+
+def get_character_reference(number):
+    """
+    Returns the character a numeric character reference stands for, following the HTML specification.
+
+    Args:
+        number (int): The number of the reference.
+
+    Returns:
+        str: The character. References to code points which can not be in a document are replaced with U+FFFD, and
+            the references to the C1 control characters are read as Windows-1252, like browsers do.
+    """
+    if number == 0 or number > 0x10ffff or 0xd800 <= number <= 0xdfff:
+        return "\ufffd"
+    if 0x80 <= number <= 0x9f:
+        try:
+            return bytes([number]).decode("cp1252")
+        except UnicodeDecodeError:
+            pass
+    return chr(number)
+
+
+def escape(text):
+    """
+    Escapes the ampersands and angle brackets of a text or attribute value.
+    """
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def quote_attribute_value(value):
+    """
+    Returns an escaped attribute value in quotes. Values containing double quotes are quoted with single quotes,
+    unless they also contain single quotes, in which case the double quotes are escaped.
+    """
+    value = escape(value)
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    return '"' + value.replace('"', "&quot;") + '"'
+
+
+class PrettyPrinter(HTMLParser):
+    """
+    An HTML parser writing out the markup it reads pretty printed, one element per line with one space of indentation
+    per level, the same way BeautifulSoup's html.parser tree builder and prettify() do:
+        - End tags close the most recent open element with their name, and every element opened after it. End tags
+          without an open element are dropped.
+        - Strings made only of whitespace become a single newline or space, and the text of every line is stripped.
+        - The contents of <pre> and <textarea> elements are written as they are.
+        - Attributes are sorted by name, and the text outside of scripts and styles is escaped.
+    """
+
+    def __init__(self):
+        """
+        Initialization method.
+        """
+        super().__init__(convert_charrefs=False)
+        self.pieces = []
+        # The names of the open elements.
+        self.stack = []
+        # The data of the string being read, written once the next tag, comment or declaration starts.
+        self.data = []
+        # The void elements closed when they were opened, whose redundant end tags are dropped.
+        self.closed_void_elements = []
+        # The number of open elements preserving whitespace, and the depth of the one whose contents are being written
+        # as they are, if any.
+        self.preserve_depth = 0
+        self.literal_depth = None
+
+
+    def end_data(self, kind=TEXT):
+        """
+        Writes the string read since the last tag, comment or declaration, if any.
+
+        Args:
+            kind (tuple): The prefix and suffix of the string, TEXT for text.
+        """
+        if not self.data:
+            return
+        data = "".join(self.data)
+        self.data = []
+        if not self.preserve_depth and not data.strip(ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        if kind is TEXT:
+            if not self.stack or self.stack[-1] not in CDATA_ELEMENTS:
+                data = escape(data)
+            self.write_string(data)
+        else:
+            self.write_string(kind[0] + data + kind[1])
+
+
+    def write_string(self, piece):
+        """
+        Writes a string, stripped and on its own line unless the contents of a <pre> or <textarea> element are being
+        written.
+        """
+        if self.literal_depth is not None:
+            self.pieces.append(piece)
+            return
+        piece = piece.strip()
+        if piece:
+            if self.stack:
+                self.pieces.append(" " * len(self.stack))
+            self.pieces.append(piece)
+            self.pieces.append("\n")
+
+
+    def write_tag(self, piece, literal=False):
+        """
+        Writes a tag indented by the depth of the open elements and on its own line, unless the contents of a <pre>
+        or <textarea> element are being written. Opening such an element (literal=True) starts writing its contents
+        as they are.
+        """
+        if self.literal_depth is not None:
+            self.pieces.append(piece)
+            return
+        if self.stack:
+            self.pieces.append(" " * len(self.stack))
+        self.pieces.append(piece)
+        if literal:
+            self.literal_depth = len(self.stack)
+        else:
+            self.pieces.append("\n")
+
+
+    def get_start_tag(self, tag, attrs):
+        """
+        Returns the start tag of an element, with its attributes sorted by name.
+        """
+        values = {}
+        for key, value in attrs:
+            values[key] = "" if value is None else value
+        if not values:
+            return f"<{tag}/>" if tag in VOID_ELEMENTS else f"<{tag}>"
+
+        list_attributes = LIST_ATTRIBUTES["*"] | LIST_ATTRIBUTES.get(tag, set())
+        for key in list_attributes.intersection(values):
+            values[key] = " ".join(NON_WHITESPACE_REGEX.findall(values[key]))
+        if tag == "meta":
+            # The charset of the document is written as the encoding of the output.
+            if "charset" in values:
+                values["charset"] = OUTPUT_ENCODING
+            elif "content" in values and values.get("http-equiv", "").lower() == "content-type":
+                values["content"] = CHARSET_REGEX.sub(lambda match: match.group(1) + OUTPUT_ENCODING, values["content"])
+
+        attributes = " ".join(f"{key}={quote_attribute_value(value)}" for key, value in sorted(values.items()))
+        return f"<{tag} {attributes}/>" if tag in VOID_ELEMENTS else f"<{tag} {attributes}>"
+
+
+    def handle_starttag(self, tag, attrs, void=True):
+        """
+        Writes a start tag. Void elements are closed right away.
+        """
+        self.end_data()
+        piece = self.get_start_tag(tag, attrs)
+        if tag in VOID_ELEMENTS:
+            self.write_tag(piece)
+            if void:
+                # A later end tag for this element is redundant.
+                self.closed_void_elements.append(tag)
+            return
+
+        self.write_tag(piece, literal=self.literal_depth is None and tag in PRESERVE_WHITESPACE_ELEMENTS)
+        self.stack.append(tag)
+        if tag in PRESERVE_WHITESPACE_ELEMENTS:
+            self.preserve_depth += 1
+
+
+    def handle_startendtag(self, tag, attrs):
+        """
+        Writes a self closing tag (<tag/>) as an empty element.
+        """
+        if tag in VOID_ELEMENTS:
+            self.handle_starttag(tag, attrs, void=False)
+            return
+        self.handle_starttag(tag, attrs)
+        self.pop_element()
+
+
+    def handle_endtag(self, tag):
+        """
+        Closes the most recent open element with the name of an end tag, and every element opened after it.
+        """
+        if tag in self.closed_void_elements:
+            self.closed_void_elements.remove(tag)
+            return
+        self.end_data()
+        if tag not in self.stack:
+            return
+        while self.pop_element() != tag:
+            pass
+
+
+    def pop_element(self):
+        """
+        Closes the most recently opened element and returns its name.
+        """
+        tag = self.stack.pop()
+        if tag in PRESERVE_WHITESPACE_ELEMENTS:
+            self.preserve_depth -= 1
+        if self.literal_depth is None:
+            if self.stack:
+                self.pieces.append(" " * len(self.stack))
+            self.pieces.append(f"</{tag}>\n")
+        elif self.literal_depth == len(self.stack):
+            # The contents of the element were written as they are, so only a newline follows its end tag.
+            self.pieces.append(f"</{tag}>\n")
+            self.literal_depth = None
+        else:
+            self.pieces.append(f"</{tag}>")
+        return tag
+
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+
+    def handle_charref(self, name):
+        base, regex = 10, DECIMAL_REFERENCE_REGEX
+        if name[:1] in ("x", "X"):
+            name, base, regex = name[1:], 16, HEX_REFERENCE_REGEX
+        extra_data = ""
+        try:
+            character = get_character_reference(int(name, base))
+        except ValueError:
+            # Any data after the digits of a reference without a semicolon is text.
+            match = regex.search(name)
+            if match is None:
+                character, extra_data = "", name
+            else:
+                character, extra_data = get_character_reference(int(match.group(1), base)), match.group(2)
+        self.data.append(character)
+        self.data.append(extra_data)
+
+
+    def handle_entityref(self, name):
+        # Unknown entities are text.
+        self.data.append(ENTITY_CHARACTERS.get(name, "&" + name))
+
+
+    def handle_comment(self, data):
+        self.end_data()
+        self.data.append(data)
+        self.end_data(COMMENT)
+
+
+    def handle_decl(self, decl):
+        self.end_data()
+        self.data.append(decl[len("DOCTYPE "):])
+        self.end_data(DOCTYPE)
+
+
+    def unknown_decl(self, data):
+        self.end_data()
+        kind = DECLARATION
+        if data.upper().startswith("CDATA["):
+            kind, data = CDATA, data[len("CDATA["):]
+        self.data.append(data)
+        self.end_data(kind)
+
+
+    def handle_pi(self, data):
+        self.end_data()
+        self.data.append(data)
+        self.end_data(PROCESSING_INSTRUCTION)
+
+
+    def close(self):
+        """
+        Reads the rest of the markup and closes the elements left open.
+        """
+        super().close()
+        self.end_data()
+        while self.stack:
+            self.pop_element()
+
+
+def prettify_html(contents):
+    """
+    Pretty prints an HTML document. The output is the same as BeautifulSoup(contents, "html.parser").prettify().
+
+    Args:
+        contents (str): The HTML document.
+
+    Returns:
+        str: The pretty printed document.
+    """
+    printer = PrettyPrinter()
+    printer.feed(contents)
+    printer.close()
+    return "".join(printer.pieces)
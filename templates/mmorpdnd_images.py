@@ -0,0 +1,282 @@
+# mmorpdnd_images.py
+# This file contains the responsive image derivatives used by mmorpdnd.py.
+# Purpose: To create resized WebP copies of the campaign images once, named by the hash of the image, and to give the
+# <img> tags of the pages a srcset listing them, so browsers download an image of the size they show instead of the
+# original (some maps are several MB). The index image links also get a small thumbnail.
+#
+# Creating the derivatives needs Pillow (pip install Pillow). It is only imported when derivatives are created, and
+# the image stage of mmorpdnd.py is skipped when it is not installed.
+
+import hashlib
+import html
+import importlib.util
+import os
+import re
+from urllib.parse import quote
+
+# The images derivatives are created for. Other images (such as animated gifs) are left as they are.
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+# The widths of the derivatives, in pixels. Only the widths smaller than the original are created.
+IMAGE_WIDTHS = (320, 640, 1280)
+WEBP_QUALITY = 80
+# The widths the images are shown at, used by browsers to pick a derivative. Campaign images are shown at most as wide
+# as the page.
+IMAGE_SIZES = "(max-width: 1280px) 100vw, 1280px"
+# The class of the thumbnails added to the index image links.
+THUMBNAIL_CLASS = "index-thumbnail"
+# The settings the derivatives are created with. The derivatives are named by the hash of the image and these, so
+# changing them creates new derivatives.
+DERIVATIVE_SETTINGS = f"webp:{WEBP_QUALITY}:{','.join(map(str, IMAGE_WIDTHS))}"
+
+# The <img> and <a> tags, with the thumbnail following them if any.
+TAG_REGEX = re.compile(r'<(img|a)\b([^>]*)>(\s*<img\b[^>]*\bclass="' + THUMBNAIL_CLASS + r'"[^>]*>)?', re.IGNORECASE)
+ATTRIBUTE_REGEX = re.compile(r"""([^\s"'=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+)))?""")
+
+
+def is_pillow_available():
+    """
+    Returns whether Pillow is installed, without importing it.
+    """
+    return importlib.util.find_spec("PIL") is not None
+
+
+def get_attributes(attribute_text):
+    """
+    Returns the attributes of a tag.
+
+    Args:
+        attribute_text (str): The text of the tag after its name.
+
+    Returns:
+        dict: The unescaped value of each attribute, keyed by lower case name. Like BeautifulSoup, the last of any
+            duplicate attributes is used and an attribute without a value has an empty value.
+    """
+    attributes = {}
+    for match in ATTRIBUTE_REGEX.finditer(attribute_text):
+        value = next((group for group in match.groups()[1:] if group is not None), "")
+        attributes[match.group(1).lower()] = html.unescape(value)
+    return attributes
+
+
+def get_image_link(tag, attributes):
+    """
+    Returns the local image a tag shows or links to, if any: the src of <img> tags and the href of the index image
+    links. See get_index_entries() in mmorpdnd.py.
+    """
+    if tag == "img":
+        link = attributes.get("src")
+    elif "image-index-link" in attributes.get("class", "").split():
+        link = attributes.get("href")
+    else:
+        return None
+    if not link or "://" in link or link.startswith(("/", "data:", "#")):
+        return None
+    return link if link.lower().endswith(IMAGE_EXTENSIONS) else None
+
+
+def resolve_image_link(link, page_path):
+    """
+    Returns the normalized path of the image a relative link of a page points to, the same as resolve_link() in
+    mmorpdnd_link_index.py.
+    """
+    return os.path.normpath(os.path.join(os.path.dirname(page_path), link))
+
+
+def find_page_images(content, page_path):
+    """
+    Returns the local images a page shows or links to from its index.
+
+    Args:
+        content (str): The contents of the page.
+        page_path (str): The path of the page, used to resolve relative links.
+
+    Returns:
+        set: The normalized paths of the images.
+    """
+    images = set()
+    for match in TAG_REGEX.finditer(content):
+        link = get_image_link(match.group(1).lower(), get_attributes(match.group(2)))
+        if link is not None:
+            images.add(resolve_image_link(link, page_path))
+    return images
+
+
+def find_index_images(entries, page_path):
+    """
+    Returns the local images linked from the JSON manifest of a paginated index page. See get_index_manifest() in
+    mmorpdnd.py.
+
+    Args:
+        entries (list): The [link_text, href, link_class] of each link of the manifest.
+        page_path (str): The path of the manifest, used to resolve relative links.
+
+    Returns:
+        set: The normalized paths of the images.
+    """
+    images = set()
+    for entry in entries:
+        link = get_image_link("a", {"class": entry[2] or "", "href": entry[1]})
+        if link is not None:
+            images.add(resolve_image_link(link, page_path))
+    return images
+
+
+def get_image_hash(path):
+    """
+    Returns the hash of the contents of an image and the derivative settings, which names its derivatives.
+    """
+    digest = hashlib.sha256(DERIVATIVE_SETTINGS.encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_derivative_path(assets_directory, image_hash, width):
+    """
+    Returns the path of the derivative of an image at a width. The derivatives are spread across directories named by
+    the first characters of their hash.
+    """
+    return os.path.join(assets_directory, image_hash[:2], f"{image_hash[:40]}-{width}.webp")
+
+
+def create_image_derivatives(path, assets_directory):
+    """
+    Creates the derivatives of an image which do not exist yet. Derivatives are named by the hash of the image, so
+    they are never created twice, even for copies of the same image.
+
+    Args:
+        path (str): The path of the image.
+        assets_directory (str): The directory the derivatives are stored in.
+
+    Returns:
+        tuple: The width of the image (once rotated as its EXIF orientation says), the (width, path) of each
+            derivative, smallest first, and the number of derivatives created. Images narrower than every derivative
+            width have no derivatives.
+    """
+    from PIL import Image
+    from PIL import ImageOps
+
+    image_hash = get_image_hash(path)
+    derivatives = []
+    created = 0
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        for derivative_width in IMAGE_WIDTHS:
+            if derivative_width >= width:
+                break
+            derivative_path = get_derivative_path(assets_directory, image_hash, derivative_width)
+            derivatives.append((derivative_width, derivative_path))
+            if os.path.isfile(derivative_path):
+                continue
+
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info or "A" in image.mode else "RGB")
+            derivative_height = max(round(height * derivative_width / width), 1)
+            resized = image.resize((derivative_width, derivative_height), Image.LANCZOS)
+            os.makedirs(os.path.dirname(derivative_path), exist_ok=True)
+            # Write to a temporary file first, so an interrupted build never leaves a partial derivative behind.
+            temporary_path = derivative_path + ".tmp"
+            resized.save(temporary_path, "WEBP", quality=WEBP_QUALITY)
+            os.replace(temporary_path, derivative_path)
+            created += 1
+    return width, derivatives, created
+
+
+def get_url(path, page_path):
+    """
+    Returns the relative URL of a file from a page, with the characters srcset can not hold (such as spaces) escaped.
+    """
+    return quote(os.path.relpath(path, os.path.dirname(page_path)).replace(os.sep, "/"), safe="/()")
+
+
+def get_srcset(image, width, derivatives, page_path):
+    """
+    Returns the srcset of an image with derivatives. The original is listed too when it is not wider than the widest
+    derivative size, so browsers showing the image larger than its derivatives do not upscale one.
+    """
+    candidates = [f"{get_url(derivative_path, page_path)} {derivative_width}w"
+                  for derivative_width, derivative_path in derivatives]
+    if width <= IMAGE_WIDTHS[-1]:
+        candidates.append(f"{get_url(image, page_path)} {width}w")
+    return ", ".join(candidates)
+
+
+def set_attribute(tag_text, name, value):
+    """
+    Returns the text of a start tag with an attribute set, replacing the attribute if the tag already has it.
+    """
+    value = html.escape(value)
+    # The attributes start after the tag name.
+    for match in ATTRIBUTE_REGEX.finditer(tag_text, re.match(r"<\w+", tag_text).end()):
+        if match.group(1).lower() == name:
+            return tag_text[:match.start()] + f'{name}="{value}"' + tag_text[match.end():]
+    end = len(tag_text) - (2 if tag_text.endswith("/>") else 1)
+    return tag_text[:end].rstrip() + f' {name}="{value}"' + tag_text[end:]
+
+
+def add_image_srcsets(content, page_path, images):
+    """
+    Returns the contents of a page with a srcset listing the derivatives of each image it shows, and a thumbnail in
+    each of its index image links. The src of the images is left as it is, for the browsers which do not read srcset.
+
+    Args:
+        content (str): The contents of the page.
+        page_path (str): The path of the page, used to resolve relative links.
+        images (dict): The (width, derivatives) of the images, keyed by normalized path. See
+            create_image_derivatives(). Images which are not listed or have no derivatives are left as they are.
+
+    Returns:
+        str: The updated contents.
+    """
+    def replace_tag(match):
+        # The thumbnails are only kept after the index image links of images which still have derivatives.
+        tag_text = match.group(0)[:match.end(2) + 1 - match.start()]
+        tag = match.group(1).lower()
+        attributes = get_attributes(match.group(2))
+        if tag == "img" and THUMBNAIL_CLASS in attributes.get("class", "").split():
+            return ""
+        link = get_image_link(tag, attributes)
+        if link is None:
+            return tag_text
+        image = resolve_image_link(link, page_path)
+        width, derivatives = images.get(image, (0, []))
+        if not derivatives:
+            return tag_text
+
+        if tag == "img":
+            tag_text = set_attribute(tag_text, "srcset", get_srcset(image, width, derivatives, page_path))
+            return set_attribute(tag_text, "sizes", IMAGE_SIZES)
+        thumbnail = get_url(derivatives[0][1], page_path)
+        # A thumbnail which is already there is left as it is, so formatting the page again changes nothing.
+        if match.group(3) and get_attributes(match.group(3).strip()[len("<img"):-1]).get("src") == thumbnail:
+            return match.group(0)
+        return f'{tag_text}<img alt="" class="{THUMBNAIL_CLASS}" loading="lazy" src="{html.escape(thumbnail)}"/>'
+
+    return TAG_REGEX.sub(replace_tag, content)
+
+
+def add_index_thumbnails(entries, page_path, images):
+    """
+    Returns the links of the JSON manifest of a paginated index page with the link of a thumbnail added to each image
+    link, the same thumbnail add_image_srcsets() adds to the index image links of the pages.
+
+    Args:
+        entries (list): The [link_text, href, link_class] of each link of the manifest, see find_index_images().
+        page_path (str): The path of the manifest, used to resolve relative links.
+        images (dict): The (width, derivatives) of the images, keyed by normalized path. See add_image_srcsets().
+
+    Returns:
+        list: The links, with the thumbnail link as a fourth item of the image links which have derivatives.
+    """
+    updated_entries = []
+    for entry in entries:
+        entry = entry[:3]
+        link = get_image_link("a", {"class": entry[2] or "", "href": entry[1]})
+        if link is not None:
+            width, derivatives = images.get(resolve_image_link(link, page_path), (0, []))
+            if derivatives:
+                entry.append(get_url(derivatives[0][1], page_path))
+        updated_entries.append(entry)
+    return updated_entries
@@ -0,0 +1,228 @@
+# mmorpdnd_link_index.py
+# This file contains the link index used by mmorpdnd.py and visualize_nodes.py.
+# Purpose: To store the pages of the campaign and the links between them in a local SQLite database which is updated
+# as pages change, so the link stages and the node graph can look links up instead of parsing every page again.
+
+import os
+import sqlite3
+from html.parser import HTMLParser
+
+
+class LinkExtractor(HTMLParser):
+    """
+    An HTML parser collecting the href of every <a> tag. This uses the same tokenizer as BeautifulSoup's 'html.parser'
+    builder, so it finds the same links (with the same attribute values) as soup.find_all('a', href=True).
+    """
+
+    def __init__(self):
+        """
+        Initialization method.
+        """
+        super().__init__(convert_charrefs=True)
+        self.links = []
+
+
+    def handle_starttag(self, tag, attrs):
+        """
+        Records the href of <a> tags. Like BeautifulSoup, the last of any duplicate attributes is used and an attribute
+        without a value has an empty value.
+        """
+        if tag != "a":
+            return
+        href = dict(attrs).get("href", False)
+        if href is not False:
+            self.links.append(href if href is not None else "")
+
+
+    def handle_startendtag(self, tag, attrs):
+        """
+        Records the href of self closing <a/> tags.
+        """
+        self.handle_starttag(tag, attrs)
+
+
+def extract_links(contents):
+    """
+    Returns the href of every <a> tag in the contents of an HTML file, in document order.
+
+    Args:
+        contents (str): The contents of the HTML file.
+
+    Returns:
+        list: The href values.
+    """
+    parser = LinkExtractor()
+    parser.feed(contents)
+    parser.close()
+    return parser.links
+
+
+def resolve_link(link, page_path):
+    """
+    Returns the path a relative link of a page points to.
+
+    Args:
+        link (str): The href of the link.
+        page_path (str): The path of the page containing the link.
+
+    Returns:
+        str: The normalized path of the link target, relative to the same directory as page_path.
+    """
+    return os.path.normpath(os.path.join(os.path.dirname(page_path), link))
+
+
+class MMORPDND_LINK_INDEX:
+    """
+    A class storing the pages of the campaign and their outgoing links in an SQLite database.
+
+    Each page is stored with the hash of the contents its links were extracted from, its name (for pages which other
+    pages can link to) and the href and resolved target of each of its links. Paths are relative to the campaign root.
+    Pages are only parsed again when their contents change, see update_page().
+    """
+
+    # Bump this when the schema changes. Older databases are then rebuilt.
+    version = 1
+
+
+    def __init__(self, path):
+        """
+        Initialization method. The database is created if it does not exist yet.
+
+        Args:
+            path (str): The path of the database file.
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != self.version:
+            self.connection.executescript("""
+                DROP TABLE IF EXISTS links;
+                DROP TABLE IF EXISTS pages;
+                CREATE TABLE pages (path TEXT PRIMARY KEY, name TEXT, hash TEXT NOT NULL);
+                CREATE TABLE links (source TEXT NOT NULL, position INTEGER NOT NULL, href TEXT NOT NULL,
+                                    target TEXT NOT NULL, PRIMARY KEY (source, position));
+                CREATE INDEX links_target ON links (target);
+            """)
+            self.connection.execute(f"PRAGMA user_version = {self.version}")
+            self.connection.commit()
+
+
+    def close(self):
+        """
+        Commits any changes and closes the database.
+        """
+        self.connection.commit()
+        self.connection.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def get_pages(self):
+        """
+        Returns the indexed pages.
+
+        Returns:
+            dict: The hash of the indexed contents of each page, keyed by path.
+        """
+        return dict(self.connection.execute("SELECT path, hash FROM pages"))
+
+
+    def get_names(self):
+        """
+        Returns the names of the pages other pages can link to.
+
+        Returns:
+            set: The (name, path) of each page with a name.
+        """
+        return set(self.connection.execute("SELECT name, path FROM pages WHERE name IS NOT NULL"))
+
+
+    def get_links(self, path):
+        """
+        Returns the href of every link of a page, in document order.
+        """
+        return [href for href, in self.connection.execute(
+            "SELECT href FROM links WHERE source = ? ORDER BY position", (path,))]
+
+
+    def get_all_links(self):
+        """
+        Returns every link in the index.
+
+        Returns:
+            list: The (source, href, target) of each link, in document order for each source.
+        """
+        return list(self.connection.execute("SELECT source, href, target FROM links ORDER BY source, position"))
+
+
+    def get_pages_linking_to(self, targets):
+        """
+        Returns the pages with at least one link to any of the given paths.
+
+        Args:
+            targets (iterable): The target paths.
+
+        Returns:
+            set: The paths of the linking pages.
+        """
+        sources = set()
+        targets = list(targets)
+        # Stay well below the SQLite limit on query parameters.
+        for start in range(0, len(targets), 500):
+            chunk = targets[start:start + 500]
+            query = f"SELECT DISTINCT source FROM links WHERE target IN ({','.join('?' * len(chunk))})"
+            sources.update(source for source, in self.connection.execute(query, chunk))
+        return sources
+
+
+    def update_page(self, path, content_hash, contents, name=None, links=None):
+        """
+        Indexes a page, replacing any previous entry. Nothing is done if the page is already indexed with the same hash.
+
+        Args:
+            path (str): The path of the page.
+            content_hash (str): The hash of the contents.
+            contents (str): The contents of the page, parsed for links when links is not given.
+            name (str, optional): The name other pages link to this page by, or None if it is not linked to.
+            links (list, optional): The href of every link of the page, if they are already known.
+
+        Returns:
+            bool: True if the page was (re)indexed.
+        """
+        row = self.connection.execute("SELECT hash, name FROM pages WHERE path = ?", (path,)).fetchone()
+        if row == (content_hash, name):
+            return False
+
+        if links is None:
+            links = extract_links(contents)
+        self.connection.execute("INSERT OR REPLACE INTO pages (path, name, hash) VALUES (?, ?, ?)",
+                                (path, name, content_hash))
+        self.connection.execute("DELETE FROM links WHERE source = ?", (path,))
+        self.connection.executemany("INSERT INTO links (source, position, href, target) VALUES (?, ?, ?, ?)",
+                                    [(path, position, href, resolve_link(href, path))
+                                     for position, href in enumerate(links)])
+        return True
+
+
+    def remove_pages(self, paths):
+        """
+        Removes pages and their links from the index.
+
+        Args:
+            paths (iterable): The paths of the pages.
+
+        Returns:
+            None
+        """
+        paths = [(path,) for path in paths]
+        self.connection.executemany("DELETE FROM links WHERE source = ?", paths)
+        self.connection.executemany("DELETE FROM pages WHERE path = ?", paths)
@@ -0,0 +1,290 @@
+# mmorpdnd_linker.py
+# This file contains the automatic page linker used by mmorpdnd.py.
+# Purpose: To find the names of all campaign pages in the body text of a page in a single pass, using one
+# Aho-Corasick automaton built from every page name and its variants, instead of one regular expression per name.
+
+import re
+from collections import deque
+
+# Matches an HTML tag. Names are only linked in the text between tags.
+TAG_REGEX = re.compile(r"<[^>]*>")
+# Matches the element name of an opening or closing HTML tag.
+TAG_NAME_REGEX = re.compile(r"<\s*(/?)\s*([a-zA-Z0-9]+)")
+
+
+def is_word_character(character):
+    """
+    Returns whether a character is a word character, the same as \\w in a regular expression.
+    """
+    return character.isalnum() or character == "_"
+
+
+def lower_text(text):
+    """
+    Returns the lower case version of some text with the same length, so indexes into it are also valid indexes into
+    the original text. Characters whose lower case form has a different length are left unchanged.
+
+    Args:
+        text (str): The text to lower.
+
+    Returns:
+        str: The lower case text.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(character.lower() if len(character.lower()) == 1 else character for character in text)
+
+
+class MMORPDND_LINKER:
+    """
+    A class for linking the names of campaign pages in the body text of other pages.
+
+    Every page name is added to an Aho-Corasick automaton along with its variants (spaces instead of underscores,
+    plurals and possessives), so all the names in a page are found in one pass over its text regardless of how many
+    pages there are. The matching rules are the same as the original per-name regular expressions of
+    MMORPDND.update_html_links():
+        - Matches are case insensitive and must start and end on a word boundary.
+        - A match can not be preceded by '-', '/', '"' or '>', nor end with '-', '/' or '.'.
+        - Text inside tags (such as attribute values), inside <a>, <script> and <style> elements, and text directly
+          followed by a closing </a> tag is never linked.
+        - Pages are never linked to themselves (or to other pages with the same name).
+    Where several names match at the same place the longest match wins, and the page added first breaks any ties.
+    """
+
+    # Text inside these elements is never linked.
+    skipped_elements = ("a", "script", "style")
+
+    # Characters a match can not be preceded by, or end with.
+    invalid_previous_characters = '-/">'
+    invalid_last_characters = "-/."
+
+
+    def __init__(self):
+        """
+        Initialization method.
+        """
+        # The automaton transitions, failure links and matched patterns of each state. State 0 is the root.
+        self.transitions = [{}]
+        self.failures = [0]
+        self.outputs = [()]
+        # The (name, target) of each added name.
+        self.targets = []
+        self.is_built = True
+        # The number of name matches checked against the matching rules so far, reported by build profiles.
+        self.evaluations = 0
+
+
+    @staticmethod
+    def get_name_variants(name):
+        """
+        Returns the ways a page name can be written in the text of other pages.
+
+        Args:
+            name (str): The page name (the file name without the extension).
+
+        Returns:
+            list: The (variant, suffix length) pairs of the name. The suffix is the part of the variant which is kept
+                after the link, such as the 's of a possessive.
+        """
+        spaced_name = name.replace('_', ' ')
+        if not name.endswith('s'):
+            suffixes = ['s', '\'s']
+        else:
+            suffixes = ['\'', 'es']
+
+        variants = [(name, 0), (spaced_name, 0)]
+        for suffix in suffixes:
+            variants.append((spaced_name + suffix, len(suffix)))
+            variants.append((name + suffix, len(suffix)))
+
+        # Names without underscores have duplicate variants.
+        unique_variants = []
+        for variant in variants:
+            if variant not in unique_variants:
+                unique_variants.append(variant)
+        return unique_variants
+
+
+    def add_name(self, name, target):
+        """
+        Adds a page name and its variants to the linker.
+
+        Args:
+            name (str): The page name (the file name without the extension).
+            target: The value returned for matches of this name, such as the path of the page.
+
+        Returns:
+            None
+        """
+        target_index = len(self.targets)
+        self.targets.append((name, target))
+
+        for variant, suffix_length in self.get_name_variants(name):
+            state = 0
+            for character in lower_text(variant):
+                next_state = self.transitions[state].get(character)
+                if next_state is None:
+                    next_state = len(self.transitions)
+                    self.transitions.append({})
+                    self.failures.append(0)
+                    self.outputs.append(())
+                    self.transitions[state][character] = next_state
+                state = next_state
+            self.outputs[state] += ((len(variant), target_index, suffix_length),)
+        self.is_built = False
+
+
+    def build(self):
+        """
+        Computes the failure links of the automaton. This is called automatically before the first search after names
+        are added.
+
+        Returns:
+            None
+        """
+        # Breadth first, so the failure state of each state is always computed before the state itself.
+        queue = deque(self.transitions[0].values())
+        for state in queue:
+            self.failures[state] = 0
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                failure = self.failures[state]
+                while failure and character not in self.transitions[failure]:
+                    failure = self.failures[failure]
+                failure = self.transitions[failure].get(character, 0)
+                self.failures[next_state] = failure
+                # A state also matches everything its failure state matches.
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[failure]
+        self.is_built = True
+
+
+    def get_text_ranges(self, text):
+        """
+        Returns the ranges of the text between tags which can contain links.
+
+        Args:
+            text (str): The HTML text.
+
+        Returns:
+            list: The (start, end) indexes of each range.
+        """
+        ranges = []
+        skipped_depth = 0
+        start = 0
+        for tag in TAG_REGEX.finditer(text):
+            # Text directly followed by a closing </a> tag is treated as part of a link.
+            if start < tag.start() and not skipped_depth and tag.group(0).lower() != "</a>":
+                ranges.append((start, tag.start()))
+            start = tag.end()
+
+            tag_name = TAG_NAME_REGEX.match(tag.group(0))
+            if tag_name and tag_name.group(2).lower() in self.skipped_elements:
+                if tag_name.group(1):
+                    skipped_depth = max(skipped_depth - 1, 0)
+                elif not tag.group(0).endswith("/>"):
+                    skipped_depth += 1
+
+        if start < len(text) and not skipped_depth:
+            ranges.append((start, len(text)))
+        return ranges
+
+
+    def is_valid_match(self, text, start, end):
+        """
+        Returns whether the text between two indexes can be linked, following the word boundary and character rules.
+        """
+        if start > 0:
+            previous_character = text[start - 1]
+            if previous_character in self.invalid_previous_characters:
+                return False
+            if is_word_character(previous_character) == is_word_character(text[start]):
+                return False
+        elif not is_word_character(text[start]):
+            return False
+
+        last_character = text[end - 1]
+        if last_character in self.invalid_last_characters:
+            return False
+        if end < len(text):
+            return is_word_character(last_character) != is_word_character(text[end])
+        return is_word_character(last_character)
+
+
+    def find_matches(self, text, skipped_name=None):
+        """
+        Finds the page names in some HTML text.
+
+        Args:
+            text (str): The HTML text to search.
+            skipped_name (str, optional): A page name to ignore, used to avoid linking a page to itself.
+
+        Returns:
+            list: The non-overlapping (start, end, target index, suffix length) of each match, in order.
+        """
+        if not self.is_built:
+            self.build()
+
+        transitions = self.transitions
+        failures = self.failures
+        outputs = self.outputs
+        lowered = lower_text(text)
+        matches = []
+        evaluations = 0
+
+        for range_start, range_end in self.get_text_ranges(text):
+            candidates = []
+            state = 0
+            for index in range(range_start, range_end):
+                character = lowered[index]
+                while state and character not in transitions[state]:
+                    state = failures[state]
+                state = transitions[state].get(character, 0)
+                for length, target_index, suffix_length in outputs[state]:
+                    evaluations += 1
+                    start = index + 1 - length
+                    if self.targets[target_index][0] == skipped_name:
+                        continue
+                    if self.is_valid_match(text, start, index + 1):
+                        candidates.append((start, -length, target_index, suffix_length))
+
+            # Leftmost match first, then the longest, then the page added first.
+            candidates.sort()
+            end = range_start
+            for start, negative_length, target_index, suffix_length in candidates:
+                if start >= end:
+                    end = start - negative_length
+                    matches.append((start, end, target_index, suffix_length))
+
+        self.evaluations += evaluations
+        return matches
+
+
+    def link_text(self, text, get_link, skipped_name=None):
+        """
+        Replaces the page names in some HTML text with links.
+
+        Args:
+            text (str): The HTML text.
+            get_link (function): Returns the link to use for a target added with add_name().
+            skipped_name (str, optional): A page name to ignore, used to avoid linking a page to itself.
+
+        Returns:
+            tuple: The updated text and the list of (name, target) that were linked, in order of first occurrence.
+        """
+        parts = []
+        linked = []
+        previous_end = 0
+        for start, end, target_index, suffix_length in self.find_matches(text, skipped_name):
+            name, target = self.targets[target_index]
+            parts.append(text[previous_end:start])
+            parts.append("<a href=\"{0}\">{1}</a>".format(get_link(target), name.replace('_', ' ')))
+            # Keep the plural or possessive ending of the matched text after the link.
+            parts.append(text[end - suffix_length:end])
+            previous_end = end
+            if (name, target) not in linked:
+                linked.append((name, target))
+        parts.append(text[previous_end:])
+        return "".join(parts), linked
@@ -0,0 +1,185 @@
+# mmorpdnd_minify.py
+# This file contains the minifiers and compression used by the export_dist stage of mmorpdnd.py.
+# Purpose: To shrink the pages and style sheets of the campaign for static hosting. The campaign itself stays
+# prettified (so its diffs stay readable), and the export_dist stage writes a minified copy of it with precompressed
+# .gz (and .br) siblings, which static file servers can send as they are to the browsers accepting them.
+#
+# Writing the .br files needs the brotli package (pip install brotli). It is only imported when compressing, and only
+# the .gz files are written when it is not installed.
+
+import gzip
+import importlib.util
+import re
+
+# The elements around which whitespace is not shown, so the whitespace between them and the text next to them is
+# removed. The whitespace next to other (inline) elements is collapsed to a single space instead.
+BLOCK_ELEMENTS = {"!doctype", "address", "article", "aside", "base", "blockquote", "body", "br", "caption", "col",
+                  "colgroup", "dd", "details", "dialog", "div", "dl", "dt", "fieldset", "figcaption", "figure",
+                  "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "head", "header", "hgroup", "hr", "html", "li",
+                  "link", "main", "meta", "nav", "noscript", "ol", "optgroup", "option", "p", "script", "section",
+                  "style", "summary", "table", "tbody", "td", "tfoot", "th", "thead", "title", "tr", "ul"}
+# The comments, the elements whose contents are kept as they are, the tags and the text of a page.
+HTML_TOKEN_REGEX = re.compile(r"<!--.*?-->|<(pre|textarea|script|style)\b[^>]*>.*?</\1\s*>|<[!/]?[a-zA-Z][^>]*>|"
+                              r"[^<]+|<", re.DOTALL | re.IGNORECASE)
+TAG_NAME_REGEX = re.compile(r"<[/]?(!?[a-zA-Z][\w-]*)")
+# The comments, strings, whitespace and other text of a style sheet.
+CSS_TOKEN_REGEX = re.compile(r"""/\*.*?\*/|"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|\s+|[^"'/\s]+|/""", re.DOTALL)
+# The characters next to which the whitespace of a style sheet is not needed.
+CSS_SEPARATORS_BEFORE = "{};,>:("
+CSS_SEPARATORS_AFTER = "{};,>)"
+WHITESPACE_REGEX = re.compile(r"\s+")
+
+# The files which are minified, the files which get compressed siblings, and the files which are copied as they are
+# (images, which are already compressed).
+MINIFIED_EXTENSIONS = (".html", ".css")
+COMPRESSED_EXTENSIONS = (".html", ".css", ".js", ".json", ".svg", ".txt", ".xml")
+COPIED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".ico")
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# Bump this when the minified output changes, so the exported files are written again.
+MINIFY_VERSION = 1
+
+
+def is_brotli_available():
+    """
+    Returns whether the brotli package is installed, without importing it.
+    """
+    return importlib.util.find_spec("brotli") is not None
+
+
+def get_dist_settings():
+    """
+    Returns the settings the exported files are written with. The files are written again when these change, for
+    example once brotli is installed.
+    """
+    brotli_quality = BROTLI_QUALITY if is_brotli_available() else None
+    return f"minify:{MINIFY_VERSION}:gzip:{GZIP_LEVEL}:br:{brotli_quality}"
+
+
+def get_tag_name(token):
+    """
+    Returns the lower case name of a tag, or None if the token is not a tag.
+    """
+    match = TAG_NAME_REGEX.match(token)
+    return match.group(1).lower() if match else None
+
+
+def minify_html(content):
+    """
+    Returns a page with its comments and the whitespace which is not shown removed.
+
+    The whitespace between and inside block elements (such as the lines and indentation written by
+    BeautifulSoup's prettify()) is removed, and the whitespace next to inline elements and inside the text is collapsed
+    to a single space, so the page renders the same. The contents of <pre> and <textarea> elements and of scripts are
+    kept as they are, the style elements are minified like style sheets and conditional comments are kept.
+
+    Args:
+        content (str): The contents of the page.
+
+    Returns:
+        str: The minified contents.
+    """
+    tokens = []
+    for match in HTML_TOKEN_REGEX.finditer(content):
+        token = match.group(0)
+        if token.startswith("<!--") and not token.startswith("<!--[if"):
+            continue
+        if match.group(1) and match.group(1).lower() == "style":
+            start = token.index(">") + 1
+            end = token.rindex("</")
+            token = token[:start] + minify_css(token[start:end]) + token[end:]
+        is_text = token == "<" or not token.startswith("<")
+        # The text around a removed comment is one text.
+        if is_text and tokens and tokens[-1][0] is None:
+            tokens[-1] = (None, tokens[-1][1] + token)
+        else:
+            tokens.append((None if is_text else get_tag_name(token), token))
+
+    minified = []
+    for index, (name, token) in enumerate(tokens):
+        if name is not None:
+            minified.append(token)
+            continue
+        text = WHITESPACE_REGEX.sub(" ", token)
+        if index == 0 or tokens[index - 1][0] in BLOCK_ELEMENTS:
+            text = text.lstrip(" ")
+        if index == len(tokens) - 1 or tokens[index + 1][0] in BLOCK_ELEMENTS:
+            text = text.rstrip(" ")
+        minified.append(text)
+    return "".join(minified)
+
+
+def minify_css(content):
+    """
+    Returns a style sheet with its comments and the whitespace which is not needed removed. Strings are kept as they
+    are.
+
+    Args:
+        content (str): The contents of the style sheet.
+
+    Returns:
+        str: The minified contents.
+    """
+    tokens = []
+    for match in CSS_TOKEN_REGEX.finditer(content):
+        token = match.group(0)
+        # Comments separate the tokens around them, like whitespace.
+        if token.startswith("/*") or token.isspace():
+            if tokens and tokens[-1] != " ":
+                tokens.append(" ")
+            continue
+        tokens.append(token)
+
+    minified = []
+    for index, token in enumerate(tokens):
+        if token == " ":
+            if (not minified or index == len(tokens) - 1 or minified[-1][-1] in CSS_SEPARATORS_BEFORE
+                    or tokens[index + 1][0] in CSS_SEPARATORS_AFTER):
+                continue
+        elif token[0] not in "\"'":
+            # The last declaration of a block does not need its semicolon.
+            token = token.replace(";}", "}")
+            if token[0] == "}" and minified and minified[-1][-1] == ";" and minified[-1][0] not in "\"'":
+                minified[-1] = minified[-1][:-1]
+                if not minified[-1]:
+                    minified.pop()
+        minified.append(token)
+    return "".join(minified)
+
+
+def minify_file(name, content):
+    """
+    Returns the minified contents of a file, or the contents as they are for the files which are not minified.
+
+    Args:
+        name (str): The name of the file, telling its type.
+        content (str): The contents of the file.
+
+    Returns:
+        str: The minified contents.
+    """
+    lower_name = name.lower()
+    if lower_name.endswith(".html"):
+        return minify_html(content)
+    if lower_name.endswith(".css"):
+        return minify_css(content)
+    return content
+
+
+def compress_contents(data):
+    """
+    Returns the precompressed copies of a file. The copies do not depend on when they are made, so compressing an
+    unchanged file again gives the same bytes.
+
+    Args:
+        data (bytes): The contents of the file.
+
+    Returns:
+        dict: The compressed contents, keyed by the extension of the copy (".gz", and ".br" when brotli is installed).
+            Copies which are not smaller than the file are left out.
+    """
+    copies = {".gz": gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)}
+    if is_brotli_available():
+        import brotli
+        copies[".br"] = brotli.compress(data, quality=BROTLI_QUALITY)
+    return {extension: copy for extension, copy in copies.items() if len(copy) < len(data)}
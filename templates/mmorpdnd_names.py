@@ -0,0 +1,284 @@
+# mmorpdnd_names.py
+# This file contains the name models used by creator.py to generate words and names.
+# Purpose: To generate names which read like the names of a list (such as lists/elven.names) quickly. Each list is
+# compiled once into an order-k Markov model: for every run of k letters found in the list, the letters which follow
+# it and their cumulative counts, so a letter is picked with a single bisect. Compiled models are kept in memory and
+# stored in the cache directory, named by the hash of the list, so a list is only compiled again when it changes.
+# Names can also be generated in bulk, skipping the names which are already in any of the lists.
+
+import bisect
+import hashlib
+import json
+import os
+import random
+
+# The number of letters each letter is picked from. Order 1 picks each letter from the one before it (bigrams), and
+# higher orders give names closer to the ones in the list.
+NAME_MODEL_ORDER = 2
+# The tokens padding the start of a name and marking its end. Neither is a letter of any name.
+START_TOKEN = "\x02"
+END_TOKEN = "\x03"
+# The number of names generated before giving up on one within the length bounds of the list, and on a new one.
+MAX_ATTEMPTS = 100
+MAX_UNIQUE_ATTEMPTS = 10000
+# The directory of the name lists.
+NAME_LISTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lists")
+# The directory the compiled models are stored in. Bump the version when the stored models change.
+NAME_CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, ".mmorpdnd", "names")
+NAME_MODEL_VERSION = 1
+
+# The models loaded by this process, keyed by (path, order), with the (modification time, size) of the list.
+loaded_models = {}
+
+
+class NameModel:
+    """
+    An order-k Markov model of the names of a list, compiled for sampling.
+
+    Attributes:
+        order (int): The number of letters each letter is picked from.
+        contexts (dict): The (letters, cumulative counts) following each run of order letters found in the names.
+            Names start with order START_TOKEN letters, and END_TOKEN follows their last letter.
+        shortest (int): The length of the shortest name of the list.
+        longest (int): The length of the longest name of the list.
+    """
+
+    def __init__(self, order, contexts, shortest, longest):
+        self.order = order
+        self.contexts = contexts
+        self.shortest = shortest
+        self.longest = longest
+
+    @classmethod
+    def from_names(cls, names, order=NAME_MODEL_ORDER):
+        """
+        Compiles the model of a list of names.
+
+        Args:
+            names (list): The names. Empty names are skipped.
+            order (int, optional): The number of letters each letter is picked from. Defaults to NAME_MODEL_ORDER.
+
+        Returns:
+            NameModel: The compiled model.
+
+        Raises:
+            ValueError: If the list has no names, or the order is less than 1.
+        """
+        names = [name for name in names if name]
+        if not names:
+            raise ValueError("Input list cannot be empty.")
+        if order < 1:
+            raise ValueError(f"Invalid name model order: {order}")
+
+        counts = {}
+        for name in names:
+            padded = START_TOKEN * order + name + END_TOKEN
+            for i in range(order, len(padded)):
+                following = counts.setdefault(padded[i - order:i], {})
+                following[padded[i]] = following.get(padded[i], 0) + 1
+
+        contexts = {}
+        for context, following in counts.items():
+            letters = sorted(following)
+            cumulative_counts = []
+            total = 0
+            for letter in letters:
+                total += following[letter]
+                cumulative_counts.append(total)
+            contexts[context] = (letters, cumulative_counts)
+
+        lengths = [len(name) for name in names]
+        return cls(order, contexts, min(lengths), max(lengths))
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Returns the model stored by to_json().
+        """
+        contexts = {context: (list(letters), counts) for context, (letters, counts) in data["contexts"].items()}
+        return cls(data["order"], contexts, data["shortest"], data["longest"])
+
+    def to_json(self):
+        """
+        Returns the model as a dictionary which can be stored as JSON. The letters of each context are stored as one
+        string.
+        """
+        return {
+            "version": NAME_MODEL_VERSION,
+            "order": self.order,
+            "shortest": self.shortest,
+            "longest": self.longest,
+            "contexts": {context: ["".join(letters), counts] for context, (letters, counts) in self.contexts.items()},
+        }
+
+    def generate(self, min_length=None, max_length=None, rng=random):
+        """
+        Generates a name. Every run of letters the model reaches was found in the list, so a name always ends.
+
+        Args:
+            min_length (int, optional): The minimum length of the name. Defaults to the shortest name of the list.
+            max_length (int, optional): The maximum length of the name. Defaults to the longest name of the list.
+            rng (random.Random, optional): The random number generator to use. Defaults to the random module.
+
+        Returns:
+            str: The generated name. After MAX_ATTEMPTS names outside of the length bounds, the last one is cut to the
+                maximum length.
+        """
+        min_length = self.shortest if min_length is None else min_length
+        max_length = self.longest if max_length is None else max_length
+        name = ""
+        for _ in range(MAX_ATTEMPTS):
+            context = START_TOKEN * self.order
+            name = ""
+            while len(name) <= max_length:
+                letters, cumulative_counts = self.contexts[context]
+                letter = letters[bisect.bisect_right(cumulative_counts, rng.randrange(cumulative_counts[-1]))]
+                if letter == END_TOKEN:
+                    break
+                name += letter
+                context = context[1:] + letter
+            if min_length <= len(name) <= max_length:
+                return name
+        return name[:max_length]
+
+
+def get_names_hash(names, order):
+    """
+    Returns the hash of a list of names and a model order, which names the stored model.
+    """
+    digest = hashlib.sha256(f"{NAME_MODEL_VERSION}:{order}\n".encode())
+    digest.update("\n".join(names).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_name_model(names, order=NAME_MODEL_ORDER, cache_directory=NAME_CACHE_DIRECTORY):
+    """
+    Returns the model of a list of names, loading it from the cache directory if it was compiled before, and compiling
+    and storing it otherwise.
+
+    Args:
+        names (list): The names.
+        order (int, optional): The number of letters each letter is picked from. Defaults to NAME_MODEL_ORDER.
+        cache_directory (str, optional): The directory the models are stored in, or None to not store them. Defaults to
+            NAME_CACHE_DIRECTORY.
+
+    Returns:
+        NameModel: The model.
+    """
+    # Empty lines are not names, so they do not change the model.
+    names = [name for name in names if name]
+    if cache_directory is None:
+        return NameModel.from_names(names, order)
+
+    path = os.path.join(cache_directory, get_names_hash(names, order) + ".json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return NameModel.from_json(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        # Missing and unreadable models are compiled again.
+        pass
+
+    model = NameModel.from_names(names, order)
+    try:
+        os.makedirs(cache_directory, exist_ok=True)
+        # Write to a temporary file first, so an interrupted write never leaves a partial model behind.
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(model.to_json(), f, separators=(",", ":"))
+        os.replace(temporary_path, path)
+    except OSError:
+        # The model is only compiled again next time.
+        pass
+    return model
+
+
+def load_name_model(file_name, order=NAME_MODEL_ORDER, cache_directory=NAME_CACHE_DIRECTORY):
+    """
+    Returns the model of a list file (such as lists/elven.names), one name per line. A model loaded before is returned
+    without reading the list again, unless the list changed since.
+
+    Args:
+        file_name (str): The path of the list.
+        order (int, optional): The number of letters each letter is picked from. Defaults to NAME_MODEL_ORDER.
+        cache_directory (str, optional): The directory the models are stored in, see get_name_model().
+
+    Returns:
+        NameModel: The model.
+
+    Raises:
+        FileNotFoundError: If the list does not exist.
+        ValueError: If the list has no names.
+
+    Example:
+        >>> model = load_name_model("lists/elven.names")
+        >>> names = [model.generate() for _ in range(10)]
+    """
+    key = (os.path.abspath(file_name), order)
+    status = os.stat(file_name)
+    state = (status.st_mtime_ns, status.st_size)
+    loaded = loaded_models.get(key)
+    if loaded is not None and loaded[0] == state:
+        return loaded[1]
+
+    with open(file_name, "r", encoding="utf-8") as f:
+        names = [line.strip() for line in f]
+    model = get_name_model(names, order, cache_directory)
+    loaded_models[key] = (state, model)
+    return model
+
+
+def read_known_names(directory=NAME_LISTS_DIRECTORY, extension=".names"):
+    """
+    Returns every name of the lists in a directory, case folded, so new names can be checked against all of them with
+    one set lookup.
+
+    Args:
+        directory (str, optional): The directory of the lists. Defaults to NAME_LISTS_DIRECTORY.
+        extension (str, optional): The extension of the lists. Defaults to ".names".
+
+    Returns:
+        set: The case folded names.
+    """
+    known_names = set()
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(extension):
+            with open(os.path.join(directory, file_name), "r", encoding="utf-8") as f:
+                known_names.update(line.strip().casefold() for line in f)
+    known_names.discard("")
+    return known_names
+
+
+def generate_unique_names(model, count, known_names=(), batch_size=1000, rng=random):
+    """
+    Generates names which are not known yet (see read_known_names()) and not generated before, in batches.
+
+    Args:
+        model (NameModel): The model to generate the names with. The names are within its length bounds.
+        count (int): The number of names to generate.
+        known_names (set, optional): The case folded names to skip. Defaults to none.
+        batch_size (int, optional): The number of names in each batch. Defaults to 1000.
+        rng (random.Random, optional): The random number generator to use. Defaults to the random module.
+
+    Yields:
+        list: The next batch of names. Fewer than count names are generated when MAX_UNIQUE_ATTEMPTS names in a row
+            were not new, which happens once the model runs out of names (small lists with a high order).
+    """
+    seen = set()
+    batch = []
+    generated = 0
+    misses = 0
+    while generated < count and misses < MAX_UNIQUE_ATTEMPTS:
+        name = model.generate(rng=rng)
+        folded = name.casefold()
+        if folded in seen or folded in known_names:
+            misses += 1
+            continue
+        misses = 0
+        seen.add(folded)
+        batch.append(name)
+        generated += 1
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
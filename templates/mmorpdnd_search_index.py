@@ -0,0 +1,420 @@
+# mmorpdnd_search_index.py
+# This file contains the full-text search index used by mmorpdnd.py.
+# Purpose: To tokenize the body text of every campaign page as it is built, keep the terms of each page in a local
+# SQLite database which is updated as pages change, and write the index as small JSON shards a static search page
+# (templates/searchTemplate.html) can load a few at a time, so searching never downloads every page.
+
+import json
+import os
+import re
+import sqlite3
+import unicodedata
+from html.parser import HTMLParser
+
+# The terms of the index are made of these characters, after removing accents. The search page splits queries the
+# same way.
+TERM_REGEX = re.compile(r"[a-z0-9]+")
+# The terms are sharded by their first characters. The search page loads the shard of each query term. Terms shorter
+# than this are stored in the shard of their exact name, which holds no other term.
+TERM_SHARD_LENGTH = 3
+# Term shards larger than this (in bytes) are split by the next character of their terms, see get_shard_files().
+MAX_SHARD_SIZE = 8192
+# The pages are sharded by their id, this many pages per shard.
+DOC_SHARD_SIZE = 25
+# Only the pages with the most occurrences of a term are kept in its shard, so common terms stay small.
+MAX_POSTINGS = 100
+# The key listing the child shards of a split term shard. It can not be a term.
+CHILD_SHARDS_KEY = "#shards"
+# Words too common to be worth indexing.
+STOP_WORDS = {"an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have", "he", "her", "his",
+              "in", "is", "it", "its", "of", "on", "or", "she", "that", "the", "their", "they", "this", "to", "was",
+              "were", "with"}
+
+
+class SearchTextExtractor(HTMLParser):
+    """
+    An HTML parser collecting the title and the body text of a page. The text of scripts, styles and the navigation
+    bar is left out.
+    """
+
+    def __init__(self):
+        """
+        Initialization method.
+        """
+        super().__init__(convert_charrefs=True)
+        self.title = []
+        self.text = []
+        self.in_title = False
+        self.in_body = False
+        # The number of open elements whose text is skipped, and of open divs inside the navigation bar.
+        self.skip_depth = 0
+        self.navigation_depth = 0
+
+
+    def handle_starttag(self, tag, attrs):
+        """
+        Tracks the elements whose text is skipped.
+        """
+        if tag == "title":
+            self.in_title = True
+        elif tag == "body":
+            self.in_body = True
+        elif tag in ("script", "style"):
+            self.skip_depth += 1
+        elif tag == "div":
+            if self.navigation_depth:
+                self.navigation_depth += 1
+            elif "navigation" in (dict(attrs).get("class") or "").split():
+                self.navigation_depth = 1
+
+
+    def handle_endtag(self, tag):
+        """
+        Tracks the elements whose text is skipped.
+        """
+        if tag == "title":
+            self.in_title = False
+        elif tag in ("script", "style"):
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag == "div" and self.navigation_depth:
+            self.navigation_depth -= 1
+
+
+    def handle_data(self, data):
+        """
+        Records the text of the title and the body.
+        """
+        if self.in_title:
+            self.title.append(data)
+        elif self.in_body and not self.skip_depth and not self.navigation_depth:
+            self.text.append(data)
+
+
+def extract_search_text(contents):
+    """
+    Returns the title and body text of the contents of an HTML file.
+
+    Args:
+        contents (str): The contents of the HTML file.
+
+    Returns:
+        tuple: The title, with its whitespace collapsed, and the body text.
+    """
+    parser = SearchTextExtractor()
+    parser.feed(contents)
+    parser.close()
+    return " ".join("".join(parser.title).split()), " ".join(parser.text)
+
+
+def tokenize(text):
+    """
+    Splits text into search terms: lower case words without accents, leaving out single characters and stop words.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        list: The terms, in the order they appear.
+    """
+    text = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode("ascii")
+    return [term for term in TERM_REGEX.findall(text) if len(term) > 1 and term not in STOP_WORDS]
+
+
+def get_search_terms(contents):
+    """
+    Returns the title of a page and the number of occurrences of each term of its body text.
+
+    Args:
+        contents (str): The contents of the HTML file.
+
+    Returns:
+        tuple: The title, and the occurrences of each term keyed by term.
+    """
+    title, text = extract_search_text(contents)
+    terms = {}
+    for term in tokenize(text):
+        terms[term] = terms.get(term, 0) + 1
+    return title, terms
+
+
+def get_term_shard(term):
+    """
+    Returns the name of the shard a term is stored in.
+    """
+    return term[:TERM_SHARD_LENGTH]
+
+
+def get_shard_file_tree(directory, name):
+    """
+    Returns the files of a term shard written by an earlier build: its own file, and the files of its child shards if
+    it was split (see MMORPDND_SEARCH_INDEX.add_term_shard_files()).
+
+    Args:
+        directory (str): The directory of the shard files.
+        name (str): The name of the shard.
+
+    Returns:
+        set: The names of the shard files which exist.
+    """
+    file_name = f"terms_{name}.json"
+    try:
+        with open(os.path.join(directory, file_name), "r", encoding="utf-8") as f:
+            children = json.load(f).get(CHILD_SHARDS_KEY, [])
+    except (OSError, ValueError, AttributeError):
+        return set()
+    files = {file_name}
+    for child in children:
+        # A child shard extends its parent by one character, anything else is not part of this shard.
+        if isinstance(child, str) and len(child) == len(name) + 1 and child.startswith(name):
+            files.update(get_shard_file_tree(directory, child))
+    return files
+
+
+def get_page_title(path):
+    """
+    Returns the title a page is shown with when its <title> is missing, the same as the link text of index pages.
+    """
+    return os.path.basename(path).replace(".html", "").replace("_", " ")
+
+
+class MMORPDND_SEARCH_INDEX:
+    """
+    A class storing the search terms of the pages of the campaign in an SQLite database, and writing them as the JSON
+    shards of the static search page.
+
+    Each page has a stable id, its path relative to the campaign root (with '/' separators, as linked from the site),
+    its title and the hash of the contents its terms were extracted from. Pages are only tokenized again when their
+    contents change, and only the shards containing their terms are written again, see update_page().
+    """
+
+    # Bump this when the schema changes. Older databases are then rebuilt.
+    version = 2
+
+
+    def __init__(self, path):
+        """
+        Initialization method. The database is created if it does not exist yet.
+
+        Args:
+            path (str): The path of the database file.
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != self.version:
+            self.connection.executescript(f"""
+                DROP TABLE IF EXISTS postings;
+                DROP TABLE IF EXISTS docs;
+                CREATE TABLE docs (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, title TEXT NOT NULL,
+                                   hash TEXT NOT NULL);
+                CREATE TABLE postings (term TEXT NOT NULL, doc INTEGER NOT NULL, count INTEGER NOT NULL,
+                                       PRIMARY KEY (term, doc));
+                CREATE INDEX postings_doc ON postings (doc);
+                CREATE INDEX postings_shard ON postings (substr(term, 1, {TERM_SHARD_LENGTH}));
+            """)
+            self.connection.execute(f"PRAGMA user_version = {self.version}")
+            self.connection.commit()
+
+
+    def close(self):
+        """
+        Commits any changes and closes the database.
+        """
+        self.connection.commit()
+        self.connection.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def get_pages(self):
+        """
+        Returns the indexed pages.
+
+        Returns:
+            dict: The hash of the indexed contents of each page, keyed by path.
+        """
+        return dict(self.connection.execute("SELECT path, hash FROM docs"))
+
+
+    def remove_doc(self, doc):
+        """
+        Removes the terms of a page from the index.
+
+        Returns:
+            set: The term shards the page was in.
+        """
+        shards = {get_term_shard(term) for term, in self.connection.execute(
+            "SELECT term FROM postings WHERE doc = ?", (doc,))}
+        self.connection.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+        return shards
+
+
+    def update_page(self, path, content_hash, title, terms):
+        """
+        Indexes the terms of a page, replacing any previous entry.
+
+        Args:
+            path (str): The path of the page.
+            content_hash (str): The hash of the contents the terms were extracted from.
+            title (str): The title of the page.
+            terms (dict): The number of occurrences of each term, keyed by term.
+
+        Returns:
+            tuple: The term shards and the page shard which changed.
+        """
+        row = self.connection.execute("SELECT id FROM docs WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            doc = self.connection.execute("INSERT INTO docs (path, title, hash) VALUES (?, ?, ?)",
+                                          (path, title, content_hash)).lastrowid
+            shards = set()
+        else:
+            doc = row[0]
+            self.connection.execute("UPDATE docs SET title = ?, hash = ? WHERE id = ?", (title, content_hash, doc))
+            shards = self.remove_doc(doc)
+
+        self.connection.executemany("INSERT INTO postings (term, doc, count) VALUES (?, ?, ?)",
+                                    [(term, doc, count) for term, count in terms.items()])
+        shards.update(get_term_shard(term) for term in terms)
+        return shards, doc // DOC_SHARD_SIZE
+
+
+    def remove_pages(self, paths):
+        """
+        Removes pages and their terms from the index.
+
+        Args:
+            paths (iterable): The paths of the pages.
+
+        Returns:
+            tuple: The term shards and the page shards which changed.
+        """
+        shards = set()
+        doc_shards = set()
+        for path in paths:
+            row = self.connection.execute("SELECT id FROM docs WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                continue
+            shards.update(self.remove_doc(row[0]))
+            self.connection.execute("DELETE FROM docs WHERE id = ?", row)
+            doc_shards.add(row[0] // DOC_SHARD_SIZE)
+        return shards, doc_shards
+
+
+    def get_all_shards(self):
+        """
+        Returns every term shard and page shard of the index.
+
+        Returns:
+            tuple: The term shards and the page shards.
+        """
+        shards = {shard for shard, in self.connection.execute(
+            f"SELECT DISTINCT substr(term, 1, {TERM_SHARD_LENGTH}) FROM postings")}
+        doc_shards = {doc_shard for doc_shard, in self.connection.execute(
+            f"SELECT DISTINCT id / {DOC_SHARD_SIZE} FROM docs")}
+        return shards, doc_shards
+
+
+    def get_term_shard(self, shard):
+        """
+        Returns the postings of the terms of a term shard.
+
+        Args:
+            shard (str): The name of the shard, see get_term_shard().
+
+        Returns:
+            dict: The page ids and occurrences of the pages with the most occurrences of each term in the shard, as a
+                flat [page id, occurrences, page id, occurrences, ...] list, keyed by term.
+        """
+        # The first characters of a term are its shard name, so a shorter shard only holds the term of its exact name.
+        postings = {}
+        for term, doc, count in self.connection.execute(
+                f"SELECT term, doc, count FROM postings WHERE substr(term, 1, {TERM_SHARD_LENGTH}) = ? "
+                "ORDER BY term, count DESC, doc", (shard,)):
+            term_postings = postings.setdefault(term, [])
+            if len(term_postings) < 2 * MAX_POSTINGS:
+                term_postings += [doc, count]
+        return postings
+
+
+    def get_doc_shard(self, doc_shard):
+        """
+        Returns the contents of a page shard.
+
+        Args:
+            doc_shard (int): The number of the shard.
+
+        Returns:
+            dict: The [path] of each page in the shard, or [path, title] if the title is not the one get_page_title()
+                gives, keyed by page id.
+        """
+        return {str(doc): [path] if title == get_page_title(path) else [path, title]
+                for doc, path, title in self.connection.execute(
+                    "SELECT id, path, title FROM docs WHERE id >= ? AND id < ? ORDER BY id",
+                    (doc_shard * DOC_SHARD_SIZE, (doc_shard + 1) * DOC_SHARD_SIZE))}
+
+
+    def add_term_shard_files(self, files, name, postings):
+        """
+        Adds the shard file of some postings to files. A shard larger than MAX_SHARD_SIZE is split: its file lists its
+        child shards (one per next character of its longer terms) under CHILD_SHARDS_KEY, and the longer terms are
+        stored in the child shard files, which are split again if needed.
+
+        Args:
+            files (dict): The shard files, see get_shard_files().
+            name (str): The name of the shard.
+            postings (dict): The postings of the terms starting with the name, see get_term_shard().
+
+        Returns:
+            None
+        """
+        text = json.dumps(postings, separators=(",", ":"))
+        if len(text) <= MAX_SHARD_SIZE or all(len(term) <= len(name) for term in postings):
+            files[f"terms_{name}.json"] = text
+            return
+
+        children = {}
+        shard = {}
+        for term, term_postings in postings.items():
+            if len(term) > len(name):
+                children.setdefault(term[:len(name) + 1], {})[term] = term_postings
+            else:
+                shard[term] = term_postings
+        shard[CHILD_SHARDS_KEY] = sorted(children)
+        files[f"terms_{name}.json"] = json.dumps(shard, separators=(",", ":"))
+        for child, child_postings in children.items():
+            self.add_term_shard_files(files, child, child_postings)
+
+
+    def get_shard_files(self, shards, doc_shards):
+        """
+        Returns the contents of the shard files of the search page.
+
+        Args:
+            shards (iterable): The term shards.
+            doc_shards (iterable): The page shards.
+
+        Returns:
+            dict: The JSON contents of each shard file, or None if the shard is empty, keyed by file name. The files of
+                a term shard start with 'terms_' and the name of the shard, those of a page shard are named
+                'docs_<number>.json'.
+        """
+        files = {}
+        for shard in shards:
+            postings = self.get_term_shard(shard)
+            if postings:
+                self.add_term_shard_files(files, shard, postings)
+            else:
+                files[f"terms_{shard}.json"] = None
+        for doc_shard in doc_shards:
+            docs = self.get_doc_shard(doc_shard)
+            files[f"docs_{doc_shard}.json"] = json.dumps(docs, separators=(",", ":")) if docs else None
+        return files
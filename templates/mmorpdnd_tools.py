@@ -3,6 +3,18 @@
 # Purpose: To centralize reusable code for tasks like text output, file processing, 
 # and other tools, improving modularity and maintainability across the project.
 
+import array
+import contextlib
+import mmap
+import os
+import random
+import stat
+
+# The line offsets and open memory map of the files sampled by get_random_lines(), keyed by path, with the
+# (modification time, size) of each file.
+line_offset_cache = {}
+
+
 def output_text(text, option="text"):
     """
     Print text to the console in a specified color using ANSI escape codes.
@@ -60,3 +72,215 @@ def is_image_file(file_name):
         if file_name.lower().endswith(ext):
             return True
     return False
+
+
+def list_directory(path, snapshot=None):
+    """
+    Lists the entries of a directory in the order the file system returns them, using os.scandir() so the type of
+    each entry is known without an extra stat call.
+
+    Args:
+        path (str): The directory to list.
+        snapshot (dict, optional): A dictionary to cache listings in, keyed by path. A listing already in the snapshot
+            is returned without reading the file system again. Defaults to None (no caching).
+
+    Returns:
+        list: The (name, is_dir, is_symlink) of each entry. Empty if the directory can not be read.
+    """
+    if snapshot is not None and path in snapshot:
+        return snapshot[path]
+
+    entries = []
+    try:
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                entries.append((entry.name, is_dir, is_dir and entry.is_symlink()))
+    except OSError:
+        # Unreadable directories are skipped, the same as os.walk() does.
+        pass
+
+    if snapshot is not None:
+        snapshot[path] = entries
+    return entries
+
+
+def walk_directory(directory, directories_to_exclude=(), snapshot=None):
+    """
+    Walks a directory tree top-down, the same as os.walk(), but prunes excluded directories instead of descending into
+    them.
+
+    Args:
+        directory (str): The directory to walk.
+        directories_to_exclude (iterable, optional): The names of directories to skip, along with everything in them.
+        snapshot (dict, optional): A dictionary to cache the directory listings in, see list_directory(). Pass the
+            same dictionary to every walk of a run to only read each directory once. Defaults to None.
+
+    Yields:
+        tuple: The (root, dirnames, filenames) of each directory, the same as os.walk(). Like os.walk(), names removed
+            from dirnames by the caller are not walked.
+
+    Example:
+        >>> for root, dirnames, filenames in walk_directory(".", [".git", "templates"]):
+        ...     print(root)
+    """
+    directories_to_exclude = set(directories_to_exclude)
+    stack = [os.fspath(directory)]
+    while stack:
+        root = stack.pop()
+        dirnames = []
+        filenames = []
+        symlinks = set()
+        for name, is_dir, is_symlink in list_directory(root, snapshot):
+            if not is_dir:
+                filenames.append(name)
+            elif name not in directories_to_exclude:
+                dirnames.append(name)
+                if is_symlink:
+                    symlinks.add(name)
+
+        yield root, dirnames, filenames
+
+        # Symbolic links to directories are listed but not followed, the same as os.walk().
+        stack.extend(os.path.join(root, name) for name in reversed(dirnames) if name not in symlinks)
+
+
+def write_file(path, contents):
+    """
+    Writes a file, unless it already has the same contents. Unchanged files are not touched, so their modification
+    time stays the same and nothing watching the campaign (git, rsync, the watcher, ...) sees a change.
+
+    Changed files are written to a temporary file next to them first, which then replaces the file in one step, so an
+    interrupted write never leaves a partial file behind. The replaced file keeps its permissions.
+
+    Args:
+        path (str): The path of the file.
+        contents (str or bytes): The contents to write. Text is encoded as UTF-8, and bytes are written as they are.
+
+    Returns:
+        bool: True if the file was written, False if it already had these contents.
+
+    Example:
+        >>> if write_file("campaign/index.html", contents):
+        ...     output_text("Updated campaign/index.html")
+    """
+    # Bytes are read and written in binary mode, and text as UTF-8 without translating newlines.
+    binary = isinstance(contents, bytes)
+    encoding, newline = (None, None) if binary else ("utf-8", "")
+    mode = None
+    try:
+        with open(path, "rb" if binary else "r", encoding=encoding, newline=newline) as f:
+            if f.read() == contents:
+                return False
+            mode = stat.S_IMODE(os.fstat(f.fileno()).st_mode)
+    except (OSError, UnicodeDecodeError):
+        # Missing and unreadable files are written.
+        pass
+
+    temporary_path = path + ".tmp"
+    try:
+        with open(temporary_path, "wb" if binary else "w", encoding=encoding, newline=newline) as f:
+            f.write(contents)
+        if mode is not None:
+            os.chmod(temporary_path, mode)
+        os.replace(temporary_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporary_path)
+        raise
+    return True
+
+
+def get_mapped_lines(file_path):
+    """
+    Returns the offsets at which the lines of a file start and a memory map of the file. The file is mapped and its
+    offsets are found once, and both are cached until the file changes (its modification time or size), so sampling
+    the file again only costs a stat.
+
+    Args:
+        file_path (str): The path of the file.
+
+    Returns:
+        tuple: The offsets (see get_line_offsets()), and the read only memory map of the file, or None if it is empty.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    key = os.path.abspath(file_path)
+    status = os.stat(file_path)
+    state = (status.st_mtime_ns, status.st_size)
+    cached = line_offset_cache.get(key)
+    if cached is not None and cached[0] == state:
+        return cached[1], cached[2]
+    if cached is not None and cached[2] is not None:
+        # The file changed, so its old map is not read again.
+        cached[2].close()
+
+    offsets = array.array("q")
+    mapped = None
+    size = status.st_size
+    if size:
+        # The map keeps its own handle of the file, so the file is closed right away.
+        with open(file_path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = len(mapped)
+        offset = 0
+        while offset < size:
+            offsets.append(offset)
+            end = mapped.find(b"\n", offset)
+            offset = size if end == -1 else end + 1
+    offsets.append(size)
+    line_offset_cache[key] = (state, offsets, mapped)
+    return offsets, mapped
+
+
+def get_line_offsets(file_path):
+    """
+    Returns the offsets at which the lines of a file start, followed by the size of the file. The offsets are cached
+    until the file changes, see get_mapped_lines().
+
+    Args:
+        file_path (str): The path of the file.
+
+    Returns:
+        array: The offset of each line (the same lines readlines() gives), and the size of the file last.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    return get_mapped_lines(file_path)[0]
+
+
+def get_random_lines(file_path, k=1, replace=True, rng=random):
+    """
+    Returns random lines of a file in one call. Only the chosen lines are read, through the cached memory map of the
+    file and the cached offsets of its lines (see get_mapped_lines()), so sampling a large list many times neither
+    opens nor reads it again.
+
+    Args:
+        file_path (str): The path of the file.
+        k (int, optional): The number of lines to return. Defaults to 1.
+        replace (bool, optional): Whether a line can be chosen more than once. Defaults to True.
+        rng (random.Random, optional): The random number generator to use. Defaults to the random module.
+
+    Returns:
+        list: The chosen lines, with their leading and trailing whitespace stripped.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        IndexError: If the file is empty.
+        ValueError: If more lines are asked for without replacement than the file has.
+
+    Example:
+        >>> places = get_random_lines("lists/random_place.names", 100)
+    """
+    offsets, mapped = get_mapped_lines(file_path)
+    line_count = len(offsets) - 1
+    if line_count == 0 and k > 0:
+        raise IndexError(f"Cannot choose a line from an empty file: {file_path}")
+    indexes = rng.choices(range(line_count), k=k) if replace else rng.sample(range(line_count), k)
+    return [mapped[offsets[index]:offsets[index + 1]].decode("utf-8", errors="replace").strip()
+            for index in indexes]
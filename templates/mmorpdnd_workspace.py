@@ -0,0 +1,201 @@
+# mmorpdnd_workspace.py
+# This file contains the workspace index used by creator.py to find where pages go and which images they show.
+# Purpose: To find the destination folder of each created page without walking the workspace for every page. The
+# directories of the workspace are walked once and stored in the cache directory with their modification times, so
+# later runs only check that no directory changed (one stat per directory) instead of listing them all again. The
+# image files the pages show are looked up in one listing of their directory instead of a stat per numbered copy.
+
+import json
+import os
+
+from mmorpdnd_tools import list_directory
+from mmorpdnd_tools import walk_directory
+
+# Bump this when the stored index changes.
+WORKSPACE_INDEX_VERSION = 1
+
+
+class WorkspaceIndex:
+    """
+    The directories of a workspace, in the order walk_directory() walks them, and the files of the image directories.
+
+    Attributes:
+        root (str): The directory the workspace is walked from.
+        directories_to_exclude (list): The names of the directories which are not walked.
+        cache_file (str): The file the index is stored in, or None to not store it.
+        directories (list): The [dirpath, dirnames, modification time] of each directory, top-down.
+        stale (bool): Whether a directory changed since it was walked, so the stored index can not be used again.
+        modified (bool): Whether the index changed since it was loaded or stored.
+        refreshed (set): The directories passed to refresh(), so the directories a pool worker process wrote to can be
+            refreshed in the index of the main process too.
+    """
+
+    def __init__(self, root, directories_to_exclude=(), cache_file=None):
+        self.root = root
+        self.directories_to_exclude = sorted(directories_to_exclude)
+        self.cache_file = cache_file
+        self.directories = []
+        self.stale = False
+        self.modified = False
+        self.refreshed = set()
+        # The position of each directory in directories, keyed by normalized path.
+        self.positions = {}
+        # The folders already looked up, and the file names of the image directories already listed.
+        self.folders = {}
+        self.listings = {}
+
+    def load(self):
+        """
+        Loads the stored index if no directory changed since it was stored, and walks the workspace (and stores the
+        new index) otherwise.
+
+        Returns:
+            bool: True if the stored index was used, False if the workspace was walked.
+        """
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if (data["version"] == WORKSPACE_INDEX_VERSION and data["root"] == self.root
+                    and data["exclude"] == self.directories_to_exclude
+                    and all(os.stat(dirpath).st_mtime_ns == mtime for dirpath, _, mtime in data["directories"])):
+                self.set_directories(data["directories"])
+                return True
+        except (OSError, TypeError, ValueError, KeyError):
+            # Missing, unreadable and outdated indexes are built again.
+            pass
+
+        self.scan()
+        self.save()
+        return False
+
+    def scan(self):
+        """
+        Walks the workspace and indexes its directories.
+        """
+        directories = []
+        for dirpath, dirnames, filenames in walk_directory(self.root, self.directories_to_exclude):
+            try:
+                mtime = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                mtime = None
+            directories.append([dirpath, list(dirnames), mtime])
+        self.set_directories(directories)
+        self.modified = True
+
+    def set_directories(self, directories):
+        """
+        Sets the indexed directories, forgetting the folders looked up in the previous ones.
+        """
+        self.directories = directories
+        self.positions = {os.path.normpath(dirpath): position for position, (dirpath, _, _) in enumerate(directories)}
+        self.folders = {}
+        self.stale = False
+
+    def save(self):
+        """
+        Stores the index in the cache file, if it was modified since it was loaded or stored. A stale index is removed
+        from it instead, so the next run walks the workspace again.
+        """
+        if self.cache_file is None or not (self.modified or self.stale):
+            return
+        try:
+            if self.stale:
+                if os.path.isfile(self.cache_file):
+                    os.remove(self.cache_file)
+                return
+            os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+            # Write to a temporary file first, so an interrupted write never leaves a partial index behind.
+            temporary_path = self.cache_file + ".tmp"
+            with open(temporary_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"version": WORKSPACE_INDEX_VERSION, "root": self.root,
+                                    "exclude": self.directories_to_exclude, "directories": self.directories}))
+            os.replace(temporary_path, self.cache_file)
+            self.modified = False
+        except OSError:
+            # The workspace is only walked again next time.
+            pass
+
+    def refresh(self, directory):
+        """
+        Updates the modification time of a directory the creator wrote to, so writing a page does not make the next
+        run walk the workspace again. If the subdirectories of the directory changed, the index is marked stale
+        instead.
+
+        Args:
+            directory (str): The directory. Directories which are not in the index are ignored.
+        """
+        position = self.positions.get(os.path.normpath(directory))
+        if position is None:
+            return
+        self.refreshed.add(directory)
+        dirpath, dirnames, _ = self.directories[position]
+        try:
+            mtime = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            self.stale = True
+            return
+        current_dirnames = [name for name, is_dir, _ in list_directory(dirpath)
+                            if is_dir and name not in self.directories_to_exclude]
+        if current_dirnames != dirnames:
+            self.stale = True
+        elif mtime != self.directories[position][2]:
+            self.directories[position][2] = mtime
+            self.modified = True
+
+    def find_page_folder(self, folder):
+        """
+        Finds the destination of a page, the same as walking the workspace top-down would: the first directory with
+        a subdirectory named folder, or ending with folder.
+
+        Args:
+            folder (str): The folder= value of the input file.
+
+        Returns:
+            tuple: The matching directory and whether folder is its subdirectory (rather than its end), or None if
+                no directory matches.
+        """
+        key = ("page", folder)
+        if key not in self.folders:
+            self.folders[key] = None
+            for dirpath, dirnames, _ in self.directories:
+                if folder in dirnames:
+                    self.folders[key] = (dirpath, True)
+                    break
+                elif dirpath.endswith(folder):
+                    self.folders[key] = (dirpath, False)
+                    break
+        return self.folders[key]
+
+    def find_char_folder(self, folder):
+        """
+        Finds the destination of a character: the first directory, walking the workspace top-down, whose path contains
+        folder.
+
+        Args:
+            folder (str): The folder of the character file.
+
+        Returns:
+            str: The matching directory, or None if no directory matches.
+        """
+        key = ("char", folder)
+        if key not in self.folders:
+            self.folders[key] = next((dirpath for dirpath, _, _ in self.directories if folder in dirpath), None)
+        return self.folders[key]
+
+    def is_file(self, path):
+        """
+        Returns whether a file exists, from one cached listing of its directory. Used to find the numbered copies of
+        an image (image (1).jpg, image (2).jpg, ...) without a stat for each.
+        """
+        directory, name = os.path.split(path)
+        directory = os.path.normpath(directory or ".")
+        if directory not in self.listings:
+            self.listings[directory] = {entry_name for entry_name, is_dir, _ in list_directory(directory)
+                                        if not is_dir}
+        return name in self.listings[directory]
+
+    def forget(self, path):
+        """
+        Forgets the cached listing of the directory of a file, after the file was added, moved or removed.
+        """
+        self.listings.pop(os.path.normpath(os.path.dirname(path) or "."), None)
@@ -18,6 +18,10 @@ import matplotlib.pyplot as plt
 # Used for outputting data in a pretty format.
 from prettytable import PrettyTable
 
+# Import helper functions from common tools file.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from mmorpdnd_tools import get_random_lines
+
 
 def set_log_file_name():
     """
@@ -678,7 +682,7 @@ def move_file(source_file_path, destination_folder_path):
 
 def get_random_line(file_path):
     """
-    Return a random line from a file.
+    Return a random line from a file. See get_random_lines() in mmorpdnd_tools.py to get many lines in one call.
 
     Args:
         file_path (str): The path to the file.
@@ -691,10 +695,7 @@ def get_random_line(file_path):
         IOError: If there is an error reading the file.
     """
     try:
-        with open(file_path, "r") as file:
-            lines = file.readlines()
-            random_line = random.choice(lines)
-            return random_line.strip()
+        return get_random_lines(file_path)[0]
     except FileNotFoundError:
         raise FileNotFoundError(f"File not found: {file_path}")
     except IOError:
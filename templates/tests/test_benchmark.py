@@ -0,0 +1,57 @@
+#!/bin/python3
+import os
+import pytest
+import sys
+sys.path.append('../../')
+from benchmark import create_synthetic_campaign
+from benchmark import find_super_linear_steps
+from benchmark import find_regressions
+from mmorpdnd import global_vars
+
+
+def test_create_synthetic_campaign(tmp_path):
+    """
+    Test case to verify that a synthetic campaign has the requested pages and the files the stages and creator need.
+    """
+    paths = create_synthetic_campaign(str(tmp_path / "one"), 40)
+    assert len(paths) == 40
+    assert all(os.path.isfile(path) and "<body>" in open(path).read() for path in paths)
+    assert (tmp_path / "one" / global_vars.header_template_file).is_file()
+    assert (tmp_path / "one" / "templates" / "lists" / "public_files.list").is_file()
+    assert any(name.endswith(".input") for name in os.listdir(tmp_path / "one" / global_vars.input_files_dir))
+
+    # The same seed creates the same campaign.
+    other_paths = create_synthetic_campaign(str(tmp_path / "two"), 40)
+    assert [os.path.relpath(path, tmp_path / "one") for path in paths] == \
+        [os.path.relpath(path, tmp_path / "two") for path in other_paths]
+    assert open(paths[0]).read() == open(other_paths[0]).read()
+
+
+def create_results(pages, link_time):
+    """
+    Helper function to create the results of a benchmark size with a given update_html_links time.
+    """
+    build = {"wall_time": link_time + 1.0, "steps": {"scan": {"wall_time": 1.0},
+                                                     "update_html_links": {"wall_time": link_time}}}
+    return {"pages": pages, "full_build": build, "noop_build": build, "single_change_build": build,
+            "creator": {"create_page": {"wall_time": 0.001}}}
+
+
+def test_find_super_linear_steps():
+    """
+    Test case to verify that only the timings growing faster than linearly are reported.
+    """
+    sizes = {"1k": create_results(1000, 1.0), "10k": create_results(10000, 100.0)}
+    super_linear = find_super_linear_steps(sizes)
+    assert ("full_build.update_html_links", "1k", "10k", pytest.approx(2.0)) in super_linear
+    assert not any(name.endswith("scan") for name, small_size, large_size, exponent in super_linear)
+
+
+def test_find_regressions():
+    """
+    Test case to verify that timings slower than the baseline by more than the tolerance are reported.
+    """
+    baseline = {"sizes": {"1k": create_results(1000, 1.0)}}
+    assert find_regressions({"1k": create_results(1000, 1.1)}, baseline) == []
+    regressions = find_regressions({"1k": create_results(1000, 2.0)}, baseline)
+    assert ("1k", "full_build.update_html_links", 1.0, 2.0) in regressions
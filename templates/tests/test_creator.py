@@ -815,7 +815,21 @@ def test_list_at_end():
 # Tests for the create_html_img(..) method
 ###########################################
 
-#TODO
+def test_create_html_img_numbered_copies(tmp_path, monkeypatch):
+    """
+    Test case to verify that an image section lists an image and its numbered copies, the same whether the files are
+    checked on disk or looked up in the workspace index.
+    """
+    monkeypatch.chdir(tmp_path)
+    for name in ["Aria.jpg", "Aria (1).jpg", "Aria (2).jpg", "Aria (4).jpg", "Bran (1).png"]:
+        (tmp_path / name).write_bytes(b"")
+
+    for workspace_index in [None, WorkspaceIndex(str(tmp_path))]:
+        html_block, image_files = create_html_img("Aria.jpg; local; Aria at the gate", workspace_index)
+        assert image_files == ["Aria.jpg", "Aria (1).jpg", "Aria (2).jpg"]
+        assert '<img src="Aria (2).jpg" alt="Image">' in html_block
+        assert create_html_img("Bran (1).png; local; Bran", workspace_index)[1] == ["Bran (1).png"]
+        assert create_html_img("Cael.jpg; local; Cael", workspace_index)[1] == []
 
 
 
@@ -833,3 +847,69 @@ def test_list_at_end():
 
 
 
+
+
+###########################################
+# Tests for the get_output_path(..) method
+###########################################
+
+def test_get_output_path(tmp_path, monkeypatch):
+    """
+    Test case to verify that pages are written to their destination, or to the same place under the output root.
+    """
+    destination = os.path.join("..", "campaign", "people", "Aria.html")
+    assert get_output_path(destination) == destination
+
+    monkeypatch.setattr(global_vars, "output_root", str(tmp_path / "render"))
+    assert get_output_path(destination) == str(tmp_path / "render" / "campaign" / "people" / "Aria.html")
+    assert (tmp_path / "render" / "campaign" / "people").is_dir()
+
+
+###########################################
+# Tests for the generate_names(..) method
+###########################################
+
+def test_generate_names(tmp_path):
+    """
+    Test case to verify that the names command writes the requested number of new names, none of which are in a name
+    list, within the length bounds of the list.
+    """
+    list_file = os.path.join("..", "lists", "elven.names")
+    output_file = str(tmp_path / "names.txt")
+    assert generate_names(list_file, 500, output_file) == 500
+
+    names = read_lines_from_file(output_file)
+    known_names = {name.casefold() for name in read_lines_from_file(list_file)}
+    shortest, longest = find_longest_and_shortest([name for name in read_lines_from_file(list_file) if name])
+    assert len(names) == len({name.casefold() for name in names}) == 500
+    assert all(name.casefold() not in known_names and shortest <= len(name) <= longest for name in names)
+
+
+###########################################
+# Tests for the create_pages(..) method
+###########################################
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_create_pages_isolates_failures(tmp_path, monkeypatch, jobs):
+    """
+    Test case to verify that the pages of a directory of input files are created one at a time or across a pool of
+    processes, that a file which fails does not stop the others, and that the result of each file is returned.
+    """
+    (tmp_path / "campaign" / "quests").mkdir(parents=True)
+    input_directory = tmp_path / "templates" / "input_files"
+    input_directory.mkdir(parents=True)
+    (input_directory / "Gate.input").write_text("folder=quests\nOverview [dnd-info]=The gate is shut.\n")
+    (input_directory / "Tower.input").write_text("folder=quests\nOverview [dnd-info]=The tower fell.\n")
+    (input_directory / "Broken.input").write_text("folder=quests\nThis line has no value\n")
+    (input_directory / "notes.txt").write_text("Not an input file.\n")
+    monkeypatch.chdir(tmp_path / "templates")
+    import creator
+    monkeypatch.setattr(creator, "terminal_mode", True)
+
+    app = Creator()
+    results = app.create_directory_pages(str(input_directory), jobs)
+    assert [(os.path.basename(file_path), succeeded) for file_path, succeeded, _, _ in results] == [
+        ("Broken.input", False), ("Gate.input", True), ("Tower.input", True)]
+    assert "not enough values to unpack" in results[0][2]
+    assert sorted(os.listdir(tmp_path / "campaign" / "quests")) == ["Gate.html", "Tower.html"]
+    assert "The tower fell." in (tmp_path / "campaign" / "quests" / "Tower.html").read_text()
@@ -1,12 +1,21 @@
 #!/bin/python3
+import gzip
+import json
 import os
 import tempfile
 import pytest
+import subprocess
 import sys
 sys.path.append('../../')
 from mmorpdnd import get_relative_path
+from mmorpdnd import get_content_hash
 from mmorpdnd import alphabetize_links
 from mmorpdnd import MMORPDND
+from mmorpdnd import MMORPDND_BUILD
+from mmorpdnd import MMORPDND_WATCHER
+from mmorpdnd import MMORPDND_PROFILER
+from mmorpdnd import MMORPDND_SERVER
+from mmorpdnd import global_vars
 
 
 def test_get_relative_path():
@@ -342,6 +351,103 @@ def test_move_img_items_to_end_mixed_order_preserved(mmorpdnd_instance):
     assert mmorpdnd_instance.move_img_items_to_end(input_string) == expected_result
 
 
+def test_create_index_links_matches_alphabetized_links(mmorpdnd_instance):
+    """
+    Test case to verify that create_index_links() lists the links in the order alphabetize_links(),
+    move_dir_items_to_end() and move_img_items_to_end() give them.
+    """
+    files_in_dir = ["zeta.html", "img", "Caves", "alpha_beta.html", "map.png", "svgimg", "notes.txt", "index.html"]
+    dir_names = {"img", "Caves", "svgimg"}
+    img_files = ["b.png", "a.jpg", "readme.txt"]
+
+    index_links = ('<li><a href="zeta.html">zeta</a></li>\n'
+                   '<li><a href="img/b.png" class="image-index-link">img/b.png</a></li>\n'
+                   '<li><a href="img/a.jpg" class="image-index-link">img/a.jpg</a></li>\n'
+                   '<li><a href="Caves/index.html" class="dir-index-link">Caves</a></li>\n'
+                   '<li><a href="alpha_beta.html">alpha beta</a></li>\n'
+                   '<li><a href="map.png">map.png</a></li>\n'
+                   '<li><a href="svgimg/index.html" class="dir-index-link">svgimg</a></li>\n'
+                   '<li><a href="notes.txt">notes.txt</a></li>\n')
+    expected = mmorpdnd_instance.move_img_items_to_end(
+        mmorpdnd_instance.move_dir_items_to_end(alphabetize_links(index_links)))
+
+    assert mmorpdnd_instance.create_index_links(files_in_dir, dir_names, img_files) == expected
+    assert mmorpdnd_instance.create_index_links(list(reversed(files_in_dir)), dir_names, img_files[::-1]) == expected
+    assert mmorpdnd_instance.create_index_links([], set(), []) == ""
+
+
+def test_update_index_files_skips_unchanged_directories(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that update_index_files only reads the index files whose directory or contents changed.
+    """
+    for directory in ["people", "places"]:
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "index.html").write_text("<html><body></body></html>")
+    (tmp_path / "people" / "Aria.html").write_text("<p>Aria</p>")
+    calls = count_calls(monkeypatch, mmorpdnd_instance, "update_index_file_content")
+
+    mmorpdnd_instance.update_index_files(str(tmp_path))
+    assert len(calls) == 2
+    assert '<li><a href="Aria.html">Aria</a></li>' in (tmp_path / "people" / "index.html").read_text()
+
+    calls.clear()
+    mmorpdnd_instance.update_index_files(str(tmp_path))
+    assert calls == []
+
+    (tmp_path / "places" / "Tavern.html").write_text("<p>Tavern</p>")
+    mmorpdnd_instance.update_index_files(str(tmp_path))
+    assert len(calls) == 1
+    assert '<li><a href="Tavern.html">Tavern</a></li>' in (tmp_path / "places" / "index.html").read_text()
+
+
+def test_update_index_file_content_paginates_large_directories(monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that the index files of directories with more than global_vars.index_page_size links only list
+    the first links, followed by the script rendering the others from the JSON manifest of the directory.
+    """
+    monkeypatch.setattr(global_vars, "index_page_size", 2)
+    files_in_dir = ["Aria.html", "Kael.html", "Zephyr.html"]
+    file_data = "<html><body></body></html>"
+
+    content = mmorpdnd_instance.update_index_file_content(file_data, files_in_dir, set(), [], "people")
+    assert '<li><a href="Aria.html">Aria</a></li>' in content
+    assert '<li><a href="Kael.html">Kael</a></li>' in content
+    assert "Zephyr" not in content
+    assert '</ul><script defer="" src="../css/mmorpdnd_index.js"></script></div>' in content
+
+    manifest = mmorpdnd_instance.get_index_manifest(files_in_dir, set(), [])
+    assert manifest.splitlines()[1:4] == ['["Aria", "Aria.html", null],', '["Kael", "Kael.html", null],',
+                                          '["Zephyr", "Zephyr.html", null]']
+    assert [entry[0] for entry in json.loads(manifest)["entries"]] == ["Aria", "Kael", "Zephyr"]
+
+    # Small directories list every link and have no manifest.
+    content = mmorpdnd_instance.update_index_file_content(file_data, files_in_dir[:2], set(), [], "people")
+    assert "<script" not in content
+    assert mmorpdnd_instance.get_index_manifest(files_in_dir[:2], set(), []) is None
+
+
+def test_beautify_files_skips_formatted_files(tmp_path, monkeypatch):
+    """
+    Test case to verify that beautify_files only formats the files which changed since it last formatted them.
+    """
+    mmorpdnd_instance = MMORPDND(html_formatter="fast")
+    (tmp_path / "Aria.html").write_text("<html><body><p>Aria</p></body></html>")
+    (tmp_path / "Tavern.html").write_text("<html><body><p>Tavern</p></body></html>")
+    calls = count_calls(monkeypatch, mmorpdnd_instance, "prettify_file_content")
+
+    mmorpdnd_instance.beautify_files(str(tmp_path))
+    assert sorted(calls) == ["Aria.html", "Tavern.html"]
+    assert (tmp_path / "Aria.html").read_text() == "<html>\n <body>\n  <p>\n   Aria\n  </p>\n </body>\n</html>\n"
+
+    calls.clear()
+    mmorpdnd_instance.beautify_files(str(tmp_path))
+    assert calls == []
+
+    (tmp_path / "Tavern.html").write_text("<html><body><p>Tavern</p><p>Inn</p></body></html>")
+    mmorpdnd_instance.beautify_files(str(tmp_path))
+    assert calls == ["Tavern.html"]
+
+
 def test_find_all_html_files_no_html_files(mmorpdnd_instance, tmp_path):
     """
     Test case to verify behavior when no HTML files are present.
@@ -432,3 +538,604 @@ def test_find_all_html_files_with_index_html_file(mmorpdnd_instance, tmp_path):
     sorted_list2 = sorted(expected_result, key=lambda x: x['name_no_ext'])
     assert sorted_list1 == sorted_list2
 
+
+def create_build_campaign(tmp_path, monkeypatch):
+    """
+    Helper function to create a small campaign and template files for testing MMORPDND_BUILD.
+
+    Returns:
+        pathlib.Path: The campaign directory.
+    """
+    header_template = tmp_path / "headerTemplate.html"
+    header_template.write_text("<head><title>DnD</title>%OPENAICSS%</head>")
+    nav_template = tmp_path / "navTemplate.html"
+    nav_template.write_text('<div class="navigation"><a href="../index.html">Up</a></div>')
+    monkeypatch.setattr(global_vars, "header_template_file", str(header_template))
+    monkeypatch.setattr(global_vars, "nav_template_file", str(nav_template))
+
+    campaign = tmp_path / "campaign"
+    (campaign / "people").mkdir(parents=True)
+    (campaign / "people" / "Aria_Thistlewood.html").write_text(
+        "<html><head></head><body><p>A friend of Kael Irfist.</p></body></html>")
+    (campaign / "people" / "Kael_Irfist.html").write_text(
+        "<html><head></head><body><p>A smith.</p></body></html>")
+    return campaign
+
+
+def test_build_runs_stages_in_memory(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that MMORPDND_BUILD applies the stages and writes each changed file once.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    stages = ["create_index_files", "update_index_files", "update_headers", "update_navigation", "update_html_links"]
+
+    build = MMORPDND_BUILD(mmorpdnd_instance, campaign)
+    # Two pages and two new index files.
+    assert build.run(stages) == 4
+
+    aria = (campaign / "people" / "Aria_Thistlewood.html").read_text()
+    assert '<a href="Kael_Irfist.html">Kael Irfist</a>' in aria
+    assert '<div class="navigation">' in aria
+    assert "<title>Aria Thistlewood</title>" in aria
+
+    index = (campaign / "people" / "index.html").read_text()
+    assert '<li><a href="Aria_Thistlewood.html">Aria Thistlewood</a></li>' in index
+    assert 'href="people/index.html" class="dir-index-link"' in (campaign / "index.html").read_text()
+
+
+def test_build_include_layout_mode(tmp_path, monkeypatch):
+    """
+    Test case to verify that in the "include" layout mode the pages load a shared layout script holding the scripts
+    of the header and the navigation block, and that editing the navigation template changes that script and the
+    version in its URL.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    (tmp_path / "headerTemplate.html").write_text(
+        '<head><title>DnD</title>%OPENAICSS%<script src="https://example.com/kit.js"></script>'
+        '<script>function goBack() {}</script></head>')
+    stages = ["update_headers", "update_navigation"]
+    mmorpdnd = MMORPDND(layout_mode="include")
+    assert MMORPDND_BUILD(mmorpdnd, campaign).run(stages) == 2
+
+    aria = (campaign / "people" / "Aria_Thistlewood.html").read_text()
+    assert '<div class="navigation"></div>' in aria
+    assert "goBack" not in aria and "mmorpdnd.css" in aria
+    layout_script = campaign / "css" / "mmorpdnd_layout.js"
+    version = get_content_hash(layout_script.read_text())[:12]
+    assert '<script defer="" src="' in aria and f'css/mmorpdnd_layout.js?v={version}"></script>' in aria
+    assert "function goBack() {}" in layout_script.read_text()
+    assert '"src", "https://example.com/kit.js"' in layout_script.read_text()
+    assert "../index.html" in layout_script.read_text()
+
+    (tmp_path / "navTemplate.html").write_text('<div class="navigation"><a href="../../index.html">Home</a></div>')
+    build = MMORPDND_BUILD(mmorpdnd, campaign)
+    assert build.run(stages) == 2
+    assert build.changed_files == {"update_headers": 3, "update_navigation": 0}
+    assert "../../index.html" in layout_script.read_text()
+    aria = (campaign / "people" / "Aria_Thistlewood.html").read_text()
+    assert f'css/mmorpdnd_layout.js?v={get_content_hash(layout_script.read_text())[:12]}"></script>' in aria
+
+
+def test_build_does_not_rewrite_unchanged_files(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that a second build over an up to date campaign writes nothing.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    stages = ["create_index_files", "update_index_files", "update_headers", "update_navigation", "update_html_links"]
+
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages)
+    assert MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages) == 0
+
+
+def test_build_paginates_large_index_files(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that MMORPDND_BUILD writes the JSON manifest of large directories, that adding a file past the
+    first page of a directory only changes its manifest, and that the manifest is removed once it is not needed.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    monkeypatch.setattr(global_vars, "index_page_size", 2)
+    stages = ["create_index_files", "update_index_files"]
+    (campaign / "people" / "Zephyr.html").write_text("<html><head></head><body><p>A bard.</p></body></html>")
+
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages)
+    index = (campaign / "people" / "index.html").read_text()
+    manifest = campaign / "people" / "index.json"
+    assert "Zephyr" not in index and "mmorpdnd_index.js" in index
+    assert [entry[1] for entry in json.loads(manifest.read_text())["entries"]] == [
+        "Aria_Thistlewood.html", "Kael_Irfist.html", "Zephyr.html"]
+    assert not (campaign / "index.json").exists()
+
+    (campaign / "people" / "Zorya.html").write_text("<html><head></head><body><p>A druid.</p></body></html>")
+    assert MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages) == 1
+    assert (campaign / "people" / "index.html").read_text() == index
+    assert '"Zorya.html"' in manifest.read_text()
+
+    monkeypatch.setattr(global_vars, "index_page_size", 100)
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages)
+    assert not manifest.exists()
+    assert "Zorya" in (campaign / "people" / "index.html").read_text()
+
+
+def test_build_is_valid_link(tmp_path, mmorpdnd_instance):
+    """
+    Test case to verify that MMORPDND_BUILD checks links against the scanned tree.
+    """
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir" / "file.html").touch()
+    (tmp_path / "other.html").touch()
+
+    build = MMORPDND_BUILD(mmorpdnd_instance, tmp_path)
+    build.scan()
+    assert build.is_valid_link("../other.html", str(tmp_path / "dir"))
+    assert build.is_valid_link("file.html", str(tmp_path / "dir"))
+    assert not build.is_valid_link("missing.html", str(tmp_path / "dir"))
+
+
+def count_calls(monkeypatch, instance, method_name):
+    """
+    Helper function to count the calls to a method of an instance.
+
+    Returns:
+        list: The first argument of each call.
+    """
+    calls = []
+    method = getattr(instance, method_name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(args[0])
+        return method(*args, **kwargs)
+
+    monkeypatch.setattr(instance, method_name, wrapper)
+    return calls
+
+
+def test_build_skips_up_to_date_pages(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that an incremental build only processes the pages which were edited.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    stages = ["create_index_files", "update_index_files", "update_headers", "update_navigation", "update_html_links"]
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages)
+    assert (campaign / global_vars.cache_dir / global_vars.manifest_file).is_file()
+
+    kael = campaign / "people" / "Kael_Irfist.html"
+    kael.write_text(kael.read_text().replace("A smith.", "A smith who knows Aria Thistlewood."))
+    headers = count_calls(monkeypatch, mmorpdnd_instance, "apply_header_template")
+    links = count_calls(monkeypatch, mmorpdnd_instance, "link_html_page")
+
+    assert MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages) == 1
+    assert len(headers) == 1
+    assert len(links) == 1
+    assert '<a href="Aria_Thistlewood.html">Aria Thistlewood</a>' in kael.read_text()
+
+
+def test_build_reports_files_changed_per_stage(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that the build counts the files each stage changed, and that a full build of an up to date
+    campaign changes and writes nothing.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    stages = ["create_index_files", "update_index_files", "update_headers", "update_html_links"]
+    build = MMORPDND_BUILD(mmorpdnd_instance, campaign)
+    build.run(stages)
+    # Both index files are created, and every page gets its header.
+    assert build.changed_files["create_index_files"] == 2
+    assert build.changed_files["update_headers"] == 4
+
+    kael = campaign / "people" / "Kael_Irfist.html"
+    os.utime(kael, ns=(0, 0))
+    build = MMORPDND_BUILD(mmorpdnd_instance, campaign, incremental=False)
+    assert build.run(stages) == 0
+    assert build.changed_files == dict.fromkeys(stages, 0)
+    assert kael.stat().st_mtime_ns == 0
+
+
+def test_build_rebuilds_pages_when_template_changes(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that changing a template rebuilds the pages depending on it.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    stages = ["create_index_files", "update_index_files", "update_headers", "update_navigation", "update_html_links"]
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages)
+
+    with open(global_vars.nav_template_file, "w") as f:
+        f.write('<div class="navigation"><a href="../../index.html">Home</a></div>')
+    headers = count_calls(monkeypatch, mmorpdnd_instance, "apply_header_template")
+
+    # Both pages and both index files use the navigation template.
+    assert MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages) == 4
+    assert len(headers) == 0
+    assert "Home" in (campaign / "people" / "Aria_Thistlewood.html").read_text()
+
+
+def test_build_full_ignores_manifest(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that a non-incremental build processes every page.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    stages = ["create_index_files", "update_index_files", "update_headers", "update_navigation", "update_html_links"]
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages)
+
+    headers = count_calls(monkeypatch, mmorpdnd_instance, "apply_header_template")
+    assert MMORPDND_BUILD(mmorpdnd_instance, campaign, incremental=False).run(stages) == 0
+    assert len(headers) == 4
+
+
+def test_build_with_jobs_matches_single_process(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that spreading the stages across processes gives the same files as a single process.
+    """
+    stages = ["create_index_files", "update_index_files", "update_headers", "update_navigation", "update_html_links"]
+    campaigns = []
+    for jobs in [1, 2]:
+        (tmp_path / str(jobs)).mkdir()
+        campaign = create_build_campaign(tmp_path / str(jobs), monkeypatch)
+        assert MMORPDND_BUILD(mmorpdnd_instance, campaign, jobs=jobs).run(stages) == 4
+        campaigns.append(campaign)
+
+    for path in ["index.html", "people/index.html", "people/Aria_Thistlewood.html", "people/Kael_Irfist.html"]:
+        assert (campaigns[0] / path).read_text() == (campaigns[1] / path).read_text()
+
+
+def test_build_reports_failed_files(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that a file which fails is reported and left unchanged without stopping the build.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    aria = campaign / "people" / "Aria_Thistlewood.html"
+    original_text = aria.read_text()
+    apply_header_template = mmorpdnd_instance.apply_header_template
+
+    def failing_apply_header_template(contents, filename, root, template):
+        if filename == "Aria_Thistlewood.html":
+            raise ValueError("bad page")
+        return apply_header_template(contents, filename, root, template)
+
+    monkeypatch.setattr(mmorpdnd_instance, "apply_header_template", failing_apply_header_template)
+    build = MMORPDND_BUILD(mmorpdnd_instance, campaign)
+    build.run(["update_headers"])
+
+    assert build.failed_files == [str(aria)]
+    assert aria.read_text() == original_text
+    assert "<title>Kael Irfist</title>" in (campaign / "people" / "Kael_Irfist.html").read_text()
+
+
+def test_build_only_parses_pages_with_broken_links(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that remove_broken_links only parses the pages the link index shows broken links for.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    stages = ["create_index_files", "update_index_files", "update_html_links", "remove_broken_links"]
+    parsed = []
+    monkeypatch.setattr(mmorpdnd_instance, "remove_broken_links_from_html",
+                        lambda contents, file_path, is_valid_link=None: parsed.append(file_path))
+
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages)
+    assert parsed == []
+    assert (campaign / global_vars.cache_dir / global_vars.link_index_file).is_file()
+
+    # Aria links to Kael, so only Aria needs parsing once Kael is removed.
+    (campaign / "people" / "Kael_Irfist.html").unlink()
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages)
+    assert parsed == [str(campaign / "people" / "Aria_Thistlewood.html")]
+
+
+def test_build_links_added_pages_incrementally(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that adding a page only relinks the pages which mention it.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    stages = ["create_index_files", "update_index_files", "update_html_links"]
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages)
+
+    (campaign / "people" / "Smith.html").write_text("<html><head></head><body><p>A trade.</p></body></html>")
+    links = count_calls(monkeypatch, mmorpdnd_instance, "link_html_page")
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages)
+
+    # The new page itself and Kael, who is a smith.
+    assert sorted(links) == ["<html><head></head><body><p>A smith.</p></body></html>",
+                             "<html><head></head><body><p>A trade.</p></body></html>"]
+    assert '<a href="Smith.html">Smith</a>' in (campaign / "people" / "Kael_Irfist.html").read_text()
+
+
+def test_watcher_get_changes():
+    """
+    Test case to verify that added, removed and modified files are all changes.
+    """
+    old_states = {"a.html": (1, 10), "b.html": (1, 10), "c.html": (1, 10)}
+    new_states = {"a.html": (1, 10), "b.html": (2, 12), "d.html": (1, 10)}
+    assert MMORPDND_WATCHER.get_changes(old_states, new_states) == {"b.html", "c.html", "d.html"}
+
+
+def test_watcher_waits_for_changes(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that the watcher returns the saved files once they stop changing.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    watcher = MMORPDND_WATCHER(mmorpdnd_instance, campaign, interval=0.01, debounce=0.05)
+
+    kael = campaign / "people" / "Kael_Irfist.html"
+    kael.write_text(kael.read_text().replace("A smith.", "A smith of Orbit."))
+    (campaign / "people" / "Aria_Thistlewood.html").unlink()
+
+    assert watcher.wait_for_changes() == {str(kael), str(campaign / "people" / "Aria_Thistlewood.html")}
+    assert str(kael) in watcher.file_states
+
+
+def test_build_profile_report(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that a profiled build records each step and writes the report and history.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    stages = ["create_index_files", "update_index_files", "update_headers", "update_html_links"]
+    profiler = MMORPDND_PROFILER(str(tmp_path / "profile"))
+    MMORPDND_BUILD(mmorpdnd_instance, campaign, profiler=profiler).run(stages)
+
+    steps = {step["name"]: step for step in profiler.steps}
+    assert list(steps) == ["scan"] + stages + ["write_pages", "update_manifest", "update_link_index"]
+    assert steps["scan"]["files_read"] == 2
+    assert steps["update_headers"]["files_processed"] == 4
+    assert steps["update_html_links"]["match_evaluations"] > 0
+    assert steps["write_pages"]["files_written"] == 4
+    assert all(step["wall_time"] >= 0 and step["peak_memory"] >= 0 for step in profiler.steps)
+    assert (tmp_path / "profile" / "01_scan.prof").is_file()
+
+    report_path = tmp_path / "profile.json"
+    history_path = tmp_path / "history.jsonl"
+    for _ in range(2):
+        profiler.save(str(report_path), str(history_path), jobs=1)
+    report = json.loads(report_path.read_text())
+    assert report["jobs"] == 1
+    assert report["totals"]["files_written"] == 4
+    assert len(history_path.read_text().splitlines()) == 2
+
+
+def test_server_renders_pages_in_memory(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that MMORPDND_SERVER renders the pages with the stages applied without writing them, caches
+    them until they change, and serves the pages the creator renders from edited input files.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    aria = campaign / "people" / "Aria_Thistlewood.html"
+    source = aria.read_text()
+    server = MMORPDND_SERVER(mmorpdnd_instance, campaign)
+    calls = count_calls(monkeypatch, mmorpdnd_instance, "apply_header_template")
+
+    contents, content_type = server.get_response("/people/Aria_Thistlewood.html?preview=1")
+    assert content_type == "text/html; charset=utf-8"
+    # The pages are served formatted, the same as beautify_files writes them.
+    text = " ".join(contents.decode().split())
+    assert '<a href="Kael_Irfist.html"> Kael Irfist </a>' in text
+    assert '<div class="navigation">' in text and "<title> Aria Thistlewood </title>" in text
+    assert aria.read_text() == source
+    assert server.get_response("/people/Aria_Thistlewood.html")[0] == contents
+    assert len(calls) == 1
+
+    # Adding a file no page shows or links to does not render the pages again.
+    (campaign / "people" / "notes.txt").write_text("Notes")
+    server.update({str(campaign / "people" / "notes.txt")})
+    assert server.get_response("/people/Aria_Thistlewood.html")[0] == contents
+    assert len(calls) == 1
+
+    # Index pages are listed from the campaign, even when they do not exist on disk yet.
+    assert server.get_response("/people/") is None
+    (campaign / "people" / "index.html").write_text("<html><head></head><body></body></html>")
+    server.update({str(campaign / "people" / "index.html")})
+    assert b'<a href="Aria_Thistlewood.html">\n' in server.get_response("/people/%20/../")[0]
+    assert server.get_response("/../outside.html") is None
+    assert server.get_response("/people/Kael.png") is None
+
+    # Editing a page renders it again, and an input file renders the page it creates.
+    aria.write_text(source.replace("A friend", "A cousin"))
+    server.update({str(aria)})
+    assert b"A cousin" in server.get_response("/people/Aria_Thistlewood.html")[0]
+
+    input_file = campaign / "templates" / "input_files" / "Zephyr.input"
+    input_file.parent.mkdir(parents=True)
+    input_file.write_text("folder=people\n")
+
+    def run_creator(args, cwd, stdout):
+        output_root = args[args.index("--output-root") + 1]
+        os.makedirs(os.path.join(output_root, "people"), exist_ok=True)
+        with open(os.path.join(output_root, "people", "Zephyr.html"), "w") as f:
+            f.write("<html><head></head><body><p>A bard who knows Aria Thistlewood.</p></body></html>")
+        return subprocess.CompletedProcess(args, 0)
+
+    monkeypatch.setattr(subprocess, "run", run_creator)
+    server.update({str(input_file)})
+    assert b'<a href="Aria_Thistlewood.html">\n' in server.get_response("/people/Zephyr.html")[0]
+    assert b"Zephyr.html" in server.get_response("/people/index.html")[0]
+    assert not (campaign / "people" / "Zephyr.html").exists()
+
+
+def test_build_commands_run_update_all_stages():
+    """
+    Test case to verify that each command of the command line tool runs stages of update_all (or the optional stages
+    which run after them), in the same order.
+    """
+    assert MMORPDND_BUILD.commands["all"] == MMORPDND_BUILD.stages
+    all_stages = MMORPDND_BUILD.stages + MMORPDND_BUILD.optional_stages
+    for stages in MMORPDND_BUILD.commands.values():
+        assert stages == [stage for stage in all_stages if stage in stages]
+
+
+def test_build_commands_run_without_gui_or_html_libraries(tmp_path, monkeypatch):
+    """
+    Test case to verify that the headers and nav commands do not import tkinter, BeautifulSoup or cssbeautifier.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    script = "\n".join([
+        "import sys",
+        "sys.path.append('../../')",
+        "from mmorpdnd import MMORPDND, MMORPDND_BUILD, global_vars",
+        f"global_vars.header_template_file = {global_vars.header_template_file!r}",
+        f"global_vars.nav_template_file = {global_vars.nav_template_file!r}",
+        "for command in ['headers', 'nav']:",
+        f"    MMORPDND_BUILD(MMORPDND(), {str(campaign)!r}).run(MMORPDND_BUILD.commands[command])",
+        "print(sorted(name for name in ('tkinter', 'bs4', 'cssbeautifier') if name in sys.modules))",
+    ])
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+
+    assert result.stdout.splitlines()[-1] == "[]"
+    aria = (campaign / "people" / "Aria_Thistlewood.html").read_text()
+    assert "<title>Aria Thistlewood</title>" in aria
+    assert '<div class="navigation">' in aria
+
+
+def test_build_public_pages_closure(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that export_public exports the listed pages, and with public_closure the pages they link to.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    (campaign / "places").mkdir()
+    (campaign / "places" / "Forge.html").write_text('<p><a href="../people/Kael_Irfist.html">Kael</a></p>')
+    (campaign / "people" / "Kael_Irfist.html").write_text(
+        '<div class="navigation"><a href="../index.html">Up</a></div><p><a href="index.html">All</a></p>')
+    public_files_list = tmp_path / "public_files.list"
+    public_files_list.write_text("# Public pages.\ncampaign/places/Forge.html\ncampaign/missing.html\n")
+    monkeypatch.setattr(global_vars, "public_files_list", str(public_files_list))
+    monkeypatch.setattr(global_vars, "script_dir", str(tmp_path))
+
+    build = MMORPDND_BUILD(mmorpdnd_instance, campaign)
+    build.scan()
+    forge = str(campaign / "places" / "Forge.html")
+    assert build.get_public_pages() == {forge}
+
+    build.public_closure = True
+    assert build.get_public_pages() == {forge, str(campaign / "people" / "Kael_Irfist.html")}
+    assert build.get_export_path(forge) == str(campaign / "dist" / "public" / "places" / "Forge.html")
+
+
+def test_build_export_dist(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that export_dist writes a minified copy of the campaign with compressed copies of its text
+    files, only exports the changed files again, and removes the files whose source was removed.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    (campaign / "people" / "Kael_Irfist.html").write_text(
+        "<html>\n <body>\n  <p>\n   A smith.\n  </p>\n" + "  <p>\n   Kael Irfist\n  </p>\n" * 20
+        + " </body>\n</html>\n")
+    (campaign / "people" / "Kael.png").write_bytes(b"\x89PNG")
+    (campaign / "templates").mkdir()
+    (campaign / "templates" / "template.html").write_text("<p>Template</p>")
+    site = campaign / "dist" / "site"
+
+    build = MMORPDND_BUILD(mmorpdnd_instance, campaign)
+    build.run(["export_dist"])
+    kael = (site / "people" / "Kael_Irfist.html").read_text()
+    assert kael.startswith("<html><body><p>A smith.</p><p>Kael Irfist</p>")
+    assert gzip.decompress((site / "people" / "Kael_Irfist.html.gz").read_bytes()).decode() == kael
+    assert (site / "people" / "Kael.png").read_bytes() == b"\x89PNG"
+    assert not (site / "templates").exists()
+    assert build.changed_files["export_dist"] == len(build.written_files)
+
+    build = MMORPDND_BUILD(mmorpdnd_instance, campaign)
+    build.run(["export_dist"])
+    assert build.written_files == []
+
+    (campaign / "people" / "Aria_Thistlewood.html").unlink()
+    (campaign / "people" / "Kael_Irfist.html").write_text("<p>\n A smith.\n</p>\n")
+    build = MMORPDND_BUILD(mmorpdnd_instance, campaign)
+    build.run(["export_dist"])
+    assert build.written_files == [str(site / "people" / "Kael_Irfist.html")]
+    assert not (site / "people" / "Aria_Thistlewood.html").exists()
+    assert not (site / "people" / "Kael_Irfist.html.gz").exists()
+
+
+def test_build_updates_search_index_incrementally(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that update_search_index writes the search page and shards, and only the changed shards after.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    search_template = tmp_path / "searchTemplate.html"
+    search_template.write_text("<html><body>Search</body></html>")
+    monkeypatch.setattr(global_vars, "search_template_file", str(search_template))
+    shards = campaign / "search" / "shards"
+
+    build = MMORPDND_BUILD(mmorpdnd_instance, campaign)
+    build.run(["update_search_index"])
+    assert (campaign / "search" / "index.html").read_text() == "<html><body>Search</body></html>"
+    assert json.loads((shards / "terms_smi.json").read_text()) == {"smith": [2, 1]}
+    assert json.loads((shards / "docs_0.json").read_text()) == {"1": ["people/Aria_Thistlewood.html"],
+                                                                 "2": ["people/Kael_Irfist.html"]}
+
+    build = MMORPDND_BUILD(mmorpdnd_instance, campaign)
+    build.run(["update_search_index"])
+    assert build.written_files == []
+
+    (campaign / "people" / "Kael_Irfist.html").write_text("<html><head></head><body><p>A baker.</p></body></html>")
+    build = MMORPDND_BUILD(mmorpdnd_instance, campaign)
+    build.run(["update_search_index"])
+    assert sorted(os.path.basename(path) for path in build.written_files) == ["terms_bak.json"]
+    assert not (shards / "terms_smi.json").exists()
+
+
+def test_build_first_full_build_is_stable(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that the root index lists the search page on the first full build, so a second build right
+    after it writes nothing.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    search_template = tmp_path / "searchTemplate.html"
+    search_template.write_text("<html><body>Search</body></html>")
+    monkeypatch.setattr(global_vars, "search_template_file", str(search_template))
+
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run()
+    assert 'href="search/index.html"' in (campaign / "index.html").read_text()
+    assert MMORPDND_BUILD(mmorpdnd_instance, campaign).run() == 0
+
+
+def test_build_search_index_keeps_unrelated_shards(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that editing a page only rewrites and removes the shard files of its own terms, so a shard
+    whose name starts with a shorter term of the page is kept and can still be searched.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    search_template = tmp_path / "searchTemplate.html"
+    search_template.write_text("<html><body>Search</body></html>")
+    monkeypatch.setattr(global_vars, "search_template_file", str(search_template))
+    shards = campaign / "search" / "shards"
+    (campaign / "people" / "Aria_Thistlewood.html").write_text("<html><body><p>Led 10 riders.</p></body></html>")
+    (campaign / "people" / "Kael_Irfist.html").write_text("<html><body><p>Owes 100 coins.</p></body></html>")
+
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run(["update_search_index"])
+    (campaign / "people" / "Aria_Thistlewood.html").write_text("<html><body><p>Led 10 knights.</p></body></html>")
+    build = MMORPDND_BUILD(mmorpdnd_instance, campaign)
+    build.run(["update_search_index"])
+
+    assert json.loads((shards / "terms_10.json").read_text()) == {"10": [1, 1]}
+    assert json.loads((shards / "terms_100.json").read_text()) == {"100": [2, 1]}
+    assert not (shards / "terms_rid.json").exists()
+    assert str(shards / "terms_100.json") not in build.written_files
+
+
+def test_server_renders_pages_as_the_build_writes_them(tmp_path, monkeypatch, mmorpdnd_instance):
+    """
+    Test case to verify that MMORPDND_SERVER serves the pages and style sheets the page stages of update_all write,
+    and renders a page again when a file it links to is added.
+    """
+    campaign = create_build_campaign(tmp_path, monkeypatch)
+    (campaign / "people" / "Aria_Thistlewood.html").write_text(
+        '<html><head></head><body><p>A friend of Kael Irfist, see <a href="map.png">the map</a>.</p></body></html>')
+    for index_file in [campaign / "index.html", campaign / "people" / "index.html"]:
+        index_file.write_text("<html><head></head><body></body></html>")
+    (campaign / "people" / "style.css").write_text("p{color:red}")
+    server = MMORPDND_SERVER(mmorpdnd_instance, campaign)
+    rendered = {path: server.get_response(path)[0].decode()
+                for path in ["/people/Aria_Thistlewood.html", "/people/index.html", "/people/style.css"]}
+    assert "the map" in rendered["/people/Aria_Thistlewood.html"]
+    assert 'href="map.png"' not in rendered["/people/Aria_Thistlewood.html"]
+    assert server.get_response("/people/style.css")[1] == "text/css; charset=utf-8"
+
+    # The build removes the broken link from the page on disk, so the link is added back before comparing.
+    source = (campaign / "people" / "Aria_Thistlewood.html").read_text()
+    stages = ["create_index_files", "update_index_files", "update_headers", "update_navigation",
+              "remove_broken_links", "update_html_links", "beautify_files"]
+    MMORPDND_BUILD(mmorpdnd_instance, campaign).run(stages)
+    for path, text in rendered.items():
+        assert (campaign / path.lstrip("/")).read_text() == text
+
+    (campaign / "people" / "Aria_Thistlewood.html").write_text(source)
+    (campaign / "people" / "map.png").write_bytes(b"png")
+    server.update({str(campaign / "people" / "Aria_Thistlewood.html"), str(campaign / "people" / "map.png")})
+    assert 'href="map.png"' in server.get_response("/people/Aria_Thistlewood.html")[0].decode()
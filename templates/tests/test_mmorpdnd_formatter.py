@@ -0,0 +1,61 @@
+#!/bin/python3
+import pytest
+import sys
+sys.path.append('../')
+from mmorpdnd_formatter import prettify_html
+from mmorpdnd_formatter import quote_attribute_value
+
+
+def test_prettify_html_indents_elements():
+    """
+    Test case to verify that every element and string is on its own line, indented by one space per level.
+    """
+    contents = "<!DOCTYPE html><html><body><p>Kael <b>Irfist</b> , smith</p>\n\n<br>after</body></html>"
+    assert prettify_html(contents) == ("<!DOCTYPE html>\n<html>\n <body>\n  <p>\n   Kael\n   <b>\n    Irfist\n   </b>\n"
+                                       "   , smith\n  </p>\n  <br/>\n  after\n </body>\n</html>\n")
+
+
+def test_prettify_html_keeps_preformatted_text():
+    """
+    Test case to verify that the contents of pre and textarea elements are written as they are.
+    """
+    contents = "<div><pre> a\n  <i>b</i></pre><textarea>\n x </textarea></div>"
+    assert prettify_html(contents) == ("<div>\n <pre> a\n  <i>b</i></pre>\n <textarea>\n x </textarea>\n</div>\n")
+
+
+@pytest.mark.parametrize("contents, expected", [
+    # End tags close every element opened after their element, and unmatched end tags are dropped.
+    ("<div><p>a</div></span>b", "<div>\n <p>\n  a\n </p>\n</div>\nb\n"),
+    # Redundant end tags of void elements are dropped.
+    ("<br>a</br>b", "<br/>\nab\n"),
+    # Self closing elements which are not void are written empty.
+    ("<div/>", "<div>\n</div>\n"),
+    # Text is escaped, except in scripts and styles, references are resolved and unknown entities lose their semicolon.
+    ("<p>a < b &amp; &copy; &#65; &foo;</p><script>a<b&</script>",
+     "<p>\n a &lt; b &amp; © A &amp;foo\n</p>\n<script>\n a<b&\n</script>\n"),
+    # Comments and other declarations.
+    ("<!-- c --><!----><?php x ?><![CDATA[ q ]]>", "<!-- c -->\n<!-- -->\n<?php x ?>\n<![CDATA[ q ]]>\n"),
+])
+def test_prettify_html_parses_like_beautifulsoup(contents, expected):
+    """
+    Test case to verify that markup is parsed the same way as BeautifulSoup's html.parser tree builder.
+    """
+    assert prettify_html(contents) == expected
+
+
+def test_prettify_html_attributes():
+    """
+    Test case to verify that attributes are sorted, deduplicated, quoted and have their lists normalized.
+    """
+    contents = "<a rel=' nofollow  me ' id='x' class=a id=\"y\" hidden href='a&b'>Link</a><meta charset=latin1>"
+    assert prettify_html(contents) == ('<a class="a" hidden="" href="a&amp;b" id="y" rel="nofollow me">\n Link\n'
+                                       '</a>\n<meta charset="utf-8"/>\n')
+
+
+def test_quote_attribute_value():
+    """
+    Test case to verify that attribute values are quoted with the quotes they do not contain.
+    """
+    assert quote_attribute_value("Bob's Bar") == '"Bob\'s Bar"'
+    assert quote_attribute_value('The "Bar"') == '\'The "Bar"\''
+    assert quote_attribute_value('Bob\'s "Bar"') == '"Bob\'s &quot;Bar&quot;"'
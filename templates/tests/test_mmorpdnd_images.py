@@ -0,0 +1,93 @@
+#!/bin/python3
+import os
+import pytest
+import sys
+sys.path.append('../')
+from mmorpdnd_images import add_image_srcsets
+from mmorpdnd_images import add_index_thumbnails
+from mmorpdnd_images import create_image_derivatives
+from mmorpdnd_images import find_index_images
+from mmorpdnd_images import find_page_images
+from mmorpdnd_images import set_attribute
+
+
+def test_find_page_images():
+    """
+    Test case to verify that the local images shown by a page and linked from its index are found.
+    """
+    content = ('<img src="images/Kael Irfist.jpg"/><img src="https://example.com/a.png"/><img src="anim.gif"/>'
+               '<a class="image-index-link" href="../maps/World.png">World</a><a href="other.png">Other</a>')
+    assert find_page_images(content, os.path.join("campaign", "people", "index.html")) == {
+        os.path.join("campaign", "people", "images", "Kael Irfist.jpg"),
+        os.path.join("campaign", "maps", "World.png"),
+    }
+
+
+def test_index_manifest_thumbnails():
+    """
+    Test case to verify that the images linked from the JSON manifest of a paginated index page are found, and that
+    the image links with derivatives get the link of a thumbnail.
+    """
+    page_path = os.path.join("campaign", "people", "index.json")
+    image = os.path.join("campaign", "people", "img", "Kael.jpg")
+    derivatives = [(320, os.path.join("campaign", "assets", "ab", "ab12-320.webp"))]
+    entries = [["Aria", "Aria.html", None], ["img/Kael.jpg", "img/Kael.jpg", "image-index-link"],
+               ["img/Map.png", "img/Map.png", "image-index-link", "old.webp"], ["img", "img/index.html", "dir-index-link"]]
+
+    assert find_index_images(entries, page_path) == {image, os.path.join("campaign", "people", "img", "Map.png")}
+    assert add_index_thumbnails(entries, page_path, {image: (800, derivatives)}) == [
+        ["Aria", "Aria.html", None], ["img/Kael.jpg", "img/Kael.jpg", "image-index-link", "../assets/ab/ab12-320.webp"],
+        ["img/Map.png", "img/Map.png", "image-index-link"], ["img", "img/index.html", "dir-index-link"]]
+
+
+def test_set_attribute():
+    """
+    Test case to verify that attributes are added to start tags, or replaced when the tag already has them.
+    """
+    assert set_attribute('<img src="a.png"/>', "sizes", "100vw") == '<img src="a.png" sizes="100vw"/>'
+    assert set_attribute('<img srcset="old" src="a.png">', "srcset", "a&b") == '<img srcset="a&amp;b" src="a.png">'
+
+
+def test_add_image_srcsets():
+    """
+    Test case to verify that images with derivatives get a srcset and sizes, that index image links get a single
+    thumbnail, and that images without derivatives are left as they are.
+    """
+    page_path = os.path.join("campaign", "index.html")
+    image = os.path.join("campaign", "Kael Irfist.jpg")
+    derivatives = [(320, os.path.join("assets", "ab", "ab12-320.webp")),
+                   (640, os.path.join("assets", "ab", "ab12-640.webp"))]
+    images = {image: (800, derivatives)}
+    content = ('<img alt="Kael" src="Kael Irfist.jpg"/><img src="other.jpg"/>'
+               '<a class="image-index-link" href="Kael Irfist.jpg">Kael</a>')
+
+    updated = add_image_srcsets(content, page_path, images)
+    assert updated == ('<img alt="Kael" src="Kael Irfist.jpg" srcset="../assets/ab/ab12-320.webp 320w, '
+                       '../assets/ab/ab12-640.webp 640w, Kael%20Irfist.jpg 800w" '
+                       'sizes="(max-width: 1280px) 100vw, 1280px"/><img src="other.jpg"/>'
+                       '<a class="image-index-link" href="Kael Irfist.jpg"><img alt="" class="index-thumbnail" '
+                       'loading="lazy" src="../assets/ab/ab12-320.webp"/>Kael</a>')
+    # Updating the page again changes nothing, even once formatted, and images which lost their derivatives lose
+    # their thumbnail.
+    assert add_image_srcsets(updated, page_path, images) == updated
+    formatted = updated.replace("<img alt=\"\" class", "\n  <img alt=\"\" class")
+    assert add_image_srcsets(formatted, page_path, images) == formatted
+    assert "index-thumbnail" not in add_image_srcsets(formatted, page_path, {})
+
+
+def test_create_image_derivatives(tmp_path):
+    """
+    Test case to verify that derivatives are created for the widths smaller than the image, once.
+    """
+    Image = pytest.importorskip("PIL.Image")
+    path = str(tmp_path / "map.png")
+    Image.new("RGB", (700, 350), "red").save(path)
+    assets_directory = str(tmp_path / "assets")
+
+    width, derivatives, created = create_image_derivatives(path, assets_directory)
+    assert (width, created) == (700, 2)
+    assert [derivative_width for derivative_width, derivative_path in derivatives] == [320, 640]
+    with Image.open(derivatives[0][1]) as derivative:
+        assert (derivative.format, derivative.size) == ("WEBP", (320, 160))
+    assert os.path.dirname(os.path.dirname(derivatives[1][1])) == assets_directory
+    assert create_image_derivatives(path, assets_directory) == (700, derivatives, 0)
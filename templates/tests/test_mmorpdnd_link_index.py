@@ -0,0 +1,71 @@
+#!/bin/python3
+import pytest
+import sys
+sys.path.append('../')
+from mmorpdnd_link_index import MMORPDND_LINK_INDEX
+from mmorpdnd_link_index import extract_links
+
+
+@pytest.fixture
+def link_index(tmp_path):
+    """
+    Fixture to provide an open link index in a temporary directory.
+    """
+    with MMORPDND_LINK_INDEX(str(tmp_path / ".mmorpdnd" / "links.sqlite")) as link_index:
+        yield link_index
+
+
+def test_extract_links():
+    """
+    Test case to verify that the href of every <a> tag is found, in order, with character references resolved.
+    """
+    contents = ('<p><a href="a.html">A</a> <A HREF="b.html?x=1&amp;y=2">B</A> <a name="top">Top</a>'
+                '<a href>Empty</a></p><script>var s = "<a href=\'no.html\'>";</script>')
+    assert extract_links(contents) == ["a.html", "b.html?x=1&y=2", ""]
+
+
+def test_update_page(link_index):
+    """
+    Test case to verify that pages are stored with their links, and only reindexed when their hash changes.
+    """
+    assert link_index.update_page("people/Aria.html", "1", '<a href="Kael.html">Kael</a>', "Aria")
+    assert not link_index.update_page("people/Aria.html", "1", "", "Aria")
+    assert link_index.get_pages() == {"people/Aria.html": "1"}
+    assert link_index.get_links("people/Aria.html") == ["Kael.html"]
+    assert link_index.get_names() == {("Aria", "people/Aria.html")}
+
+    assert link_index.update_page("people/Aria.html", "2", '<a href="../Orbit.html">Orbit</a>', "Aria")
+    assert link_index.get_all_links() == [("people/Aria.html", "../Orbit.html", "Orbit.html")]
+
+
+def test_get_pages_linking_to(link_index):
+    """
+    Test case to verify that the pages linking to a target are found from the resolved link targets.
+    """
+    link_index.update_page("people/Aria.html", "1", '<a href="Kael.html">Kael</a>', "Aria")
+    link_index.update_page("index.html", "2", '<a href="people/Kael.html">Kael</a>')
+    link_index.update_page("people/Kael.html", "3", '<a href="../Orbit.html">Orbit</a>', "Kael")
+
+    assert link_index.get_pages_linking_to(["people/Kael.html"]) == {"people/Aria.html", "index.html"}
+    assert link_index.get_pages_linking_to([]) == set()
+
+
+def test_remove_pages(link_index):
+    """
+    Test case to verify that removing a page removes its links.
+    """
+    link_index.update_page("people/Aria.html", "1", '<a href="Kael.html">Kael</a>', "Aria")
+    link_index.remove_pages(["people/Aria.html"])
+    assert link_index.get_pages() == {}
+    assert link_index.get_all_links() == []
+
+
+def test_index_is_persistent(tmp_path):
+    """
+    Test case to verify that the index is kept between runs.
+    """
+    path = str(tmp_path / "links.sqlite")
+    with MMORPDND_LINK_INDEX(path) as link_index:
+        link_index.update_page("Aria.html", "1", '<a href="Kael.html">Kael</a>', "Aria")
+    with MMORPDND_LINK_INDEX(path) as link_index:
+        assert link_index.get_links("Aria.html") == ["Kael.html"]
@@ -0,0 +1,95 @@
+#!/bin/python3
+import pytest
+import sys
+sys.path.append('../')
+from mmorpdnd_linker import MMORPDND_LINKER
+
+
+@pytest.fixture
+def linker():
+    """
+    Fixture to provide a linker with a few page names added.
+    """
+    linker = MMORPDND_LINKER()
+    linker.add_name("Orbit", "Orbit.html")
+    linker.add_name("Orbit_System", "Orbit_System.html")
+    linker.add_name("Kael_Irfist", "people/Kael_Irfist.html")
+    linker.add_name("Elves", "Elves.html")
+    return linker
+
+
+def link(linker, text, skipped_name=None):
+    """
+    Helper function to link some text, using the targets as the links.
+    """
+    return linker.link_text(text, lambda target: target, skipped_name)[0]
+
+
+def test_get_name_variants():
+    """
+    Test case to verify the spaced, plural and possessive variants of a name.
+    """
+    assert MMORPDND_LINKER.get_name_variants("Kael_Irfist") == [
+        ("Kael_Irfist", 0), ("Kael Irfist", 0), ("Kael Irfists", 1), ("Kael_Irfists", 1),
+        ("Kael Irfist's", 2), ("Kael_Irfist's", 2)]
+    assert MMORPDND_LINKER.get_name_variants("Elves") == [
+        ("Elves", 0), ("Elves'", 1), ("Elveses", 2)]
+
+
+def test_link_text_links_names(linker):
+    """
+    Test case to verify that names are linked case insensitively with the name as the link text.
+    """
+    assert link(linker, "<p>\n A friend of kael irfist.\n</p>") == \
+        '<p>\n A friend of <a href="people/Kael_Irfist.html">Kael Irfist</a>.\n</p>'
+
+
+def test_link_text_longest_name_wins(linker):
+    """
+    Test case to verify that the longest name is linked where names overlap.
+    """
+    assert link(linker, "<p>\n The Orbit System and the Orbit.\n</p>") == \
+        '<p>\n The <a href="Orbit_System.html">Orbit System</a> and the <a href="Orbit.html">Orbit</a>.\n</p>'
+
+
+def test_link_text_keeps_suffixes(linker):
+    """
+    Test case to verify that plural and possessive endings are kept after the link.
+    """
+    assert link(linker, "<p>\n Kael Irfist's hammer and two Orbits.\n</p>") == \
+        ('<p>\n <a href="people/Kael_Irfist.html">Kael Irfist</a>\'s hammer and two '
+         '<a href="Orbit.html">Orbit</a>s.\n</p>')
+
+
+def test_link_text_skips_self_links(linker):
+    """
+    Test case to verify that a page is not linked to itself.
+    """
+    text = "<p>\n The Orbit is near.\n</p>"
+    assert link(linker, text, skipped_name="Orbit") == text
+
+
+def test_link_text_skips_links_and_attributes(linker):
+    """
+    Test case to verify that names inside tags, links and scripts are not linked.
+    """
+    text = ('<p title="the Orbit">\n See <a href="x.html">\n the Orbit\n</a>\n</p>'
+            '<script>\n var Orbit = 1;\n</script>')
+    assert link(linker, text) == text
+
+
+def test_link_text_word_boundaries(linker):
+    """
+    Test case to verify that names are only linked as whole words and not inside paths or after quotes.
+    """
+    text = '<p>\n Orbital paths, img/Orbit.png and "Orbit".\n</p>'
+    assert link(linker, text) == text
+
+
+def test_link_text_returns_linked_targets(linker):
+    """
+    Test case to verify that each linked name is returned once.
+    """
+    text, linked = linker.link_text("<p>\n Orbit and Orbit.\n</p>", lambda target: target)
+    assert linked == [("Orbit", "Orbit.html")]
+    assert text.count('<a href="Orbit.html">Orbit</a>') == 2
@@ -0,0 +1,48 @@
+#!/bin/python3
+import gzip
+import sys
+sys.path.append('../')
+from mmorpdnd_minify import compress_contents
+from mmorpdnd_minify import minify_css
+from mmorpdnd_minify import minify_file
+from mmorpdnd_minify import minify_html
+
+
+def test_minify_html():
+    """
+    Test case to verify that the whitespace around block elements and the comments are removed, that the whitespace
+    next to inline elements is collapsed to a single space, and that preformatted text and scripts are kept.
+    """
+    content = ('<!DOCTYPE html>\n<html>\n <head>\n  <title>\n   Aria\n  </title>\n  <style>\n   a { color: red; }\n'
+               '  </style>\n </head>\n <body>\n  <p>\n   A friend of\n   <a href="Kael.html">\n    Kael\n   </a>\n'
+               '   . <!-- A smith -->\n  </p>\n  <pre>\n  x\n   y</pre>\n  <script>\n   var a = 1;\n  </script>\n'
+               ' </body>\n</html>\n')
+    assert minify_html(content) == ('<!DOCTYPE html><html><head><title>Aria</title><style>a{color:red}</style></head>'
+                                    '<body><p>A friend of <a href="Kael.html"> Kael </a> .</p><pre>\n  x\n   y</pre>'
+                                    '<script>\n   var a = 1;\n  </script></body></html>')
+    conditional_comment = "<p>Kael<!--[if IE]>old<![endif]--> &lt; 2</p>"
+    assert minify_html(conditional_comment) == conditional_comment
+
+
+def test_minify_css():
+    """
+    Test case to verify that the comments and the whitespace which is not needed are removed, without changing strings
+    or the whitespace between selectors.
+    """
+    content = ('/* Header */\nheader nav li a:hover {\n    color: #bfbfbf;\n    content: "a ;  }";\n}\n\n'
+               '@media screen and (max-width: 600px) {\n    div > p, a { margin: 0 10px; }\n}\n')
+    assert minify_css(content) == ('header nav li a:hover{color:#bfbfbf;content:"a ;  }"}'
+                                   '@media screen and (max-width:600px){div>p,a{margin:0 10px}}')
+    assert minify_file("MAP.CSS", "a {\n  color: red;\n}\n") == "a{color:red}"
+    assert minify_file("index.json", '{"entries": [\n]}\n') == '{"entries": [\n]}\n'
+
+
+def test_compress_contents():
+    """
+    Test case to verify that the compressed copies are the same every time and are only kept when they are smaller.
+    """
+    data = b"<p>Kael Irfist</p>" * 100
+    copies = compress_contents(data)
+    assert gzip.decompress(copies[".gz"]) == data
+    assert compress_contents(data) == copies
+    assert ".gz" not in compress_contents(b"<p/>")
@@ -0,0 +1,87 @@
+#!/bin/python3
+import os
+import random
+import sys
+sys.path.append('../')
+from mmorpdnd_names import END_TOKEN
+from mmorpdnd_names import START_TOKEN
+from mmorpdnd_names import NameModel
+from mmorpdnd_names import generate_unique_names
+from mmorpdnd_names import get_name_model
+from mmorpdnd_names import load_name_model
+from mmorpdnd_names import read_known_names
+
+
+def test_name_model_from_names():
+    """
+    Test case to verify that a name model counts the letters following each run of letters, including the start and
+    end of the names, and that the names it generates are within the length bounds of the list.
+    """
+    model = NameModel.from_names(["cat", "cot", "", "coat"], order=1)
+    assert model.shortest == 3 and model.longest == 4
+    assert model.contexts[START_TOKEN] == (["c"], [3])
+    assert model.contexts["c"] == (["a", "o"], [1, 3])
+    assert model.contexts["t"] == ([END_TOKEN], [3])
+
+    rng = random.Random(1)
+    for _ in range(100):
+        name = model.generate(rng=rng)
+        assert 3 <= len(name) <= 4 and name.startswith("c") and name.endswith("t")
+
+    # An order as long as every name only generates the names of the list.
+    model = NameModel.from_names(["Thalia", "Elrond"], order=6)
+    assert {model.generate(rng=rng) for _ in range(20)} == {"Thalia", "Elrond"}
+
+
+def test_load_name_model_caches_models(tmp_path):
+    """
+    Test case to verify that the model of a list is stored in the cache directory and loaded from it, and that a
+    changed list is compiled again.
+    """
+    list_file = os.path.join(tmp_path, "test.names")
+    cache_directory = os.path.join(tmp_path, "cache")
+    with open(list_file, "w") as f:
+        f.write("Aric\nBrom\nCael\n")
+
+    model = load_name_model(list_file, order=2, cache_directory=cache_directory)
+    assert len(os.listdir(cache_directory)) == 1
+    assert load_name_model(list_file, order=2, cache_directory=cache_directory) is model
+
+    stored = get_name_model(["Aric", "Brom", "Cael", ""], order=2, cache_directory=cache_directory)
+    assert stored is not model and stored.contexts == model.contexts
+
+    with open(list_file, "a") as f:
+        f.write("Dorn\n")
+    os.utime(list_file, ns=(0, 0))
+    changed = load_name_model(list_file, order=2, cache_directory=cache_directory)
+    assert changed.contexts[START_TOKEN * 2] == (["A", "B", "C", "D"], [1, 2, 3, 4])
+    assert len(os.listdir(cache_directory)) == 2
+
+
+def test_generate_unique_names(tmp_path):
+    """
+    Test case to verify that the generated names are new and in batches, and that generating stops once the model runs
+    out of new names.
+    """
+    lists_directory = os.path.join(tmp_path, "lists")
+    os.makedirs(lists_directory)
+    with open(os.path.join(lists_directory, "a.names"), "w") as f:
+        f.write("Aric\nBrom\n\n")
+    with open(os.path.join(lists_directory, "b.names"), "w") as f:
+        f.write("cael\n")
+    with open(os.path.join(lists_directory, "c.list"), "w") as f:
+        f.write("Dorn\n")
+    known_names = read_known_names(lists_directory)
+    assert known_names == {"aric", "brom", "cael"}
+
+    rng = random.Random(2)
+    model = NameModel.from_names(["Cael", "Caric", "Brael", "Brom"], order=1)
+    batches = list(generate_unique_names(model, 50, known_names, batch_size=4, rng=rng))
+    names = [name for batch in batches for name in batch]
+    assert all(len(batch) == 4 for batch in batches[:-1])
+    assert len(names) == len({name.casefold() for name in names})
+    assert not known_names & {name.casefold() for name in names}
+
+    # Every name an order as long as the names can generate is known.
+    model = NameModel.from_names(["Aric", "Brom"], order=4)
+    assert list(generate_unique_names(model, 10, known_names, rng=rng)) == []
@@ -0,0 +1,89 @@
+#!/bin/python3
+import json
+import pytest
+import sys
+sys.path.append('../')
+import mmorpdnd_search_index
+from mmorpdnd_search_index import MMORPDND_SEARCH_INDEX
+from mmorpdnd_search_index import extract_search_text
+from mmorpdnd_search_index import get_search_terms
+from mmorpdnd_search_index import tokenize
+
+
+@pytest.fixture
+def search_index(tmp_path):
+    """
+    Fixture to provide an open search index in a temporary directory.
+    """
+    with MMORPDND_SEARCH_INDEX(str(tmp_path / ".mmorpdnd" / "search.sqlite")) as search_index:
+        yield search_index
+
+
+def test_extract_search_text():
+    """
+    Test case to verify that the title and body text are found, without the scripts and the navigation bar.
+    """
+    contents = ('<html><head><title>\n Kael   Irfist\n</title><script>var x = "hidden";</script></head><body>'
+                '<div class="navigation"><a href="../index.html"><div>Up</div></a></div>'
+                '<h1>Kael</h1><p>A smith &amp; <b>friend</b>.</p><script>hidden()</script></body></html>')
+    title, text = extract_search_text(contents)
+    assert title == "Kael Irfist"
+    assert text.split() == ["Kael", "A", "smith", "&", "friend", "."]
+
+
+def test_tokenize():
+    """
+    Test case to verify that terms are lower case without accents, single characters or stop words.
+    """
+    assert tokenize("The Kaël of Orbit-7, a Smith!") == ["kael", "orbit", "smith"]
+    assert get_search_terms("<body>Smith smith SMITH forge</body>") == ("", {"smith": 3, "forge": 1})
+
+
+def test_update_and_remove_pages(search_index):
+    """
+    Test case to verify that updating and removing pages returns the shards which changed.
+    """
+    shards, doc_shard = search_index.update_page("people/Kael_Irfist.html", "1", "Kael Irfist", {"smith": 2, "forge": 1})
+    assert shards == {"smi", "for"}
+    assert search_index.get_pages() == {"people/Kael_Irfist.html": "1"}
+    assert search_index.get_term_shard("smi") == {"smith": [1, 2]}
+
+    shards, _ = search_index.update_page("people/Kael_Irfist.html", "2", "Kael Irfist", {"anvil": 1})
+    assert shards == {"smi", "for", "anv"}
+    assert search_index.get_term_shard("smi") == {}
+    assert search_index.get_doc_shard(doc_shard) == {"1": ["people/Kael_Irfist.html"]}
+
+    search_index.update_page("Orbit.html", "3", "The Orbit", {"anvil": 5})
+    assert search_index.get_term_shard("anv") == {"anvil": [2, 5, 1, 1]}
+    assert search_index.get_doc_shard(0)["2"] == ["Orbit.html", "The Orbit"]
+
+    assert search_index.remove_pages(["Orbit.html", "missing.html"]) == ({"anv"}, {0})
+    assert search_index.get_pages() == {"people/Kael_Irfist.html": "2"}
+
+
+def test_get_shard_files_splits_large_shards(search_index, monkeypatch):
+    """
+    Test case to verify that term shards larger than the maximum size are split by the next character of their terms.
+    """
+    monkeypatch.setattr(mmorpdnd_search_index, "MAX_SHARD_SIZE", 40)
+    search_index.update_page("a.html", "1", "a", {"tor": 1, "tora": 1, "torb": 1, "torbx": 2})
+
+    files = search_index.get_shard_files({"tor", "xyz"}, {0})
+    assert json.loads(files["terms_tor.json"]) == {"tor": [1, 1], "#shards": ["tora", "torb"]}
+    assert json.loads(files["terms_tora.json"]) == {"tora": [1, 1]}
+    assert json.loads(files["terms_torb.json"]) == {"torb": [1, 1], "torbx": [1, 2]}
+    assert files["terms_xyz.json"] is None
+    assert json.loads(files["docs_0.json"]) == {"1": ["a.html"]}
+
+
+def test_short_term_shards_only_hold_their_term(search_index):
+    """
+    Test case to verify that a term shorter than the shard length is stored in the shard of its exact name, which does
+    not hold the longer terms starting with it.
+    """
+    search_index.update_page("a.html", "1", "a", {"10": 1, "100": 2, "10th": 3})
+
+    assert search_index.get_all_shards() == ({"10", "100", "10t"}, {0})
+    assert search_index.get_term_shard("10") == {"10": [1, 1]}
+    assert search_index.get_term_shard("100") == {"100": [1, 2]}
+    assert search_index.get_term_shard("10t") == {"10th": [1, 3]}
@@ -1,10 +1,17 @@
 #!/bin/python3
 import os
+import random
 import tempfile
 import pytest
 import sys
 sys.path.append('../')
+import mmorpdnd_tools
+from mmorpdnd_tools import get_line_offsets
+from mmorpdnd_tools import get_random_lines
 from mmorpdnd_tools import is_image_file
+from mmorpdnd_tools import list_directory
+from mmorpdnd_tools import walk_directory
+from mmorpdnd_tools import write_file
 
 def test_is_image_file_with_image_extensions():
     """
@@ -43,3 +50,138 @@ def test_is_image_file_with_edge_cases():
     #assert is_image_file('.jpg') == False   # File name consists only of the extension
     assert is_image_file('image') == False  # File name has no extension
     assert is_image_file('') == False       # Empty file name
+
+
+def create_walk_tree(tmp_path):
+    """
+    Helper function to create a small directory tree for testing walk_directory.
+    """
+    (tmp_path / "campaign" / "people").mkdir(parents=True)
+    (tmp_path / "campaign" / "people" / "Aria.html").touch()
+    (tmp_path / "campaign" / "index.html").touch()
+    (tmp_path / ".git" / "objects").mkdir(parents=True)
+    (tmp_path / ".git" / "objects" / "pack").touch()
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "templates" / "template.input").touch()
+
+
+def test_walk_directory_matches_os_walk(tmp_path):
+    """
+    Test if walk_directory walks the same directories and files, in the same order, as os.walk.
+    """
+    create_walk_tree(tmp_path)
+    assert list(walk_directory(tmp_path)) == list(os.walk(tmp_path))
+
+
+def test_walk_directory_prunes_excluded_directories(tmp_path):
+    """
+    Test if walk_directory skips excluded directories along with everything in them.
+    """
+    create_walk_tree(tmp_path)
+    roots = [root for root, dirnames, filenames in walk_directory(tmp_path, [".git", "templates"])]
+    assert roots == [str(tmp_path), str(tmp_path / "campaign"), str(tmp_path / "campaign" / "people")]
+
+
+def test_walk_directory_in_place_pruning(tmp_path):
+    """
+    Test if directories removed from dirnames by the caller are not walked, the same as os.walk.
+    """
+    create_walk_tree(tmp_path)
+    roots = []
+    for root, dirnames, filenames in walk_directory(tmp_path):
+        roots.append(root)
+        dirnames[:] = [dirname for dirname in dirnames if dirname != "campaign"]
+    assert str(tmp_path / "campaign") not in roots
+    assert str(tmp_path / "templates") in roots
+
+
+def test_walk_directory_snapshot(tmp_path):
+    """
+    Test if walks sharing a snapshot only read each directory once.
+    """
+    create_walk_tree(tmp_path)
+    snapshot = {}
+    first_walk = list(walk_directory(tmp_path, [".git"], snapshot))
+    (tmp_path / "campaign" / "new.html").touch()
+
+    assert list(walk_directory(tmp_path, [".git"], snapshot)) == first_walk
+    assert ("new.html", False, False) in list_directory(str(tmp_path / "campaign"))
+
+
+def test_list_directory_missing_directory(tmp_path):
+    """
+    Test if list_directory returns no entries for a directory that does not exist.
+    """
+    assert list_directory(str(tmp_path / "missing")) == []
+
+
+def test_write_file_skips_unchanged_files(tmp_path):
+    """
+    Test if write_file leaves files which already have the contents untouched, and replaces the others.
+    """
+    path = tmp_path / "page.html"
+    assert write_file(str(path), "<p>Orbit</p>")
+    os.utime(path, ns=(0, 0))
+
+    assert not write_file(str(path), "<p>Orbit</p>")
+    assert path.stat().st_mtime_ns == 0
+
+    assert write_file(str(path), "<p>Orbit é</p>")
+    assert path.read_text(encoding="utf-8") == "<p>Orbit é</p>"
+    assert path.stat().st_mtime_ns != 0
+    assert os.listdir(tmp_path) == ["page.html"]
+
+
+def test_write_file_writes_bytes(tmp_path):
+    """
+    Test if write_file writes bytes as they are, and leaves files which already have the bytes untouched.
+    """
+    path = tmp_path / "page.html.gz"
+    assert write_file(str(path), b"\x1f\x8b\r\n")
+    assert path.read_bytes() == b"\x1f\x8b\r\n"
+    assert not write_file(str(path), b"\x1f\x8b\r\n")
+
+
+def test_write_file_keeps_permissions(tmp_path):
+    """
+    Test if write_file keeps the permissions of the file it replaces.
+    """
+    path = tmp_path / "script.sh"
+    path.write_text("echo Orbit\n")
+    path.chmod(0o751)
+
+    assert write_file(str(path), "echo Kael\n")
+    assert path.stat().st_mode & 0o777 == 0o751
+
+
+def test_get_random_lines(tmp_path, monkeypatch):
+    """
+    Test that random lines are read through the cached line offsets and memory map, with or without replacement,
+    without opening the file again, and that the offsets are found again once the file changes.
+    """
+    path = str(tmp_path / "places.list")
+    with open(path, "w", newline="") as f:
+        f.write("Ashford\r\nBrindle Moor\n\nCaer Dun")
+    assert list(get_line_offsets(path)) == [0, 9, 22, 23, 31]
+    assert get_line_offsets(path) is get_line_offsets(path)
+
+    rng = random.Random(3)
+    assert sorted(get_random_lines(path, 4, replace=False, rng=rng)) == ["", "Ashford", "Brindle Moor", "Caer Dun"]
+    assert set(get_random_lines(path, 100, rng=rng)) == {"", "Ashford", "Brindle Moor", "Caer Dun"}
+    with pytest.raises(ValueError):
+        get_random_lines(path, 5, replace=False)
+
+    with monkeypatch.context() as context:
+        context.setattr(mmorpdnd_tools, "open", None, raising=False)
+        assert len(get_random_lines(path, 10, rng=rng)) == 10
+
+    with open(path, "w") as f:
+        f.write("Dunmere\n")
+    os.utime(path, ns=(0, 0))
+    assert get_random_lines(path, 3) == ["Dunmere"] * 3
+
+    open(path, "w").close()
+    with pytest.raises(IndexError):
+        get_random_lines(path)
+    with pytest.raises(FileNotFoundError):
+        get_random_lines(str(tmp_path / "missing.list"))
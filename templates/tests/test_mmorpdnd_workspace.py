@@ -0,0 +1,91 @@
+#!/bin/python3
+import os
+import sys
+sys.path.append('../')
+from mmorpdnd_tools import walk_directory
+from mmorpdnd_workspace import WorkspaceIndex
+
+
+def create_workspace(root):
+    """
+    Creates a small workspace with nested campaign folders and an excluded directory.
+    """
+    for directory in ["campaign/people/npc", "campaign/places/people", "campaign/quests", "templates/people"]:
+        os.makedirs(os.path.join(root, directory))
+
+
+def test_workspace_index_finds_folders_like_a_walk(tmp_path):
+    """
+    Test case to verify that the indexed directories are the ones (and in the order) a walk of the workspace gives,
+    and that the folders of pages and characters are found in the first matching directory.
+    """
+    root = str(tmp_path)
+    create_workspace(root)
+    workspace_index = WorkspaceIndex(root, ["templates"])
+    workspace_index.scan()
+    assert [directory[:2] for directory in workspace_index.directories] == [
+        [dirpath, dirnames] for dirpath, dirnames, _ in walk_directory(root, ["templates"])]
+
+    dirpath, is_subdirectory = workspace_index.find_page_folder("people")
+    assert is_subdirectory and os.path.basename(dirpath) in ("campaign", "places")
+    assert workspace_index.find_page_folder("campaign/quests") == (os.path.join(root, "campaign", "quests"), False)
+    assert workspace_index.find_page_folder("missing") is None
+    assert workspace_index.find_char_folder("people/npc") == os.path.join(root, "campaign", "people", "npc")
+    assert workspace_index.find_char_folder("templates") is None
+
+
+def test_workspace_index_is_stored_until_a_directory_changes(tmp_path):
+    """
+    Test case to verify that the stored index is used while no directory changes, that writing a page into an indexed
+    directory keeps it usable once refreshed, and that a new directory makes the next run walk the workspace again.
+    """
+    root = str(tmp_path / "workspace")
+    cache_file = str(tmp_path / "cache" / "workspace.json")
+    create_workspace(root)
+    quests = os.path.join(root, "campaign", "quests")
+
+    assert not WorkspaceIndex(root, ["templates"], cache_file).load()
+    assert WorkspaceIndex(root, ["templates"], cache_file).load()
+    # A different exclusion list is indexed again.
+    assert not WorkspaceIndex(root, [], cache_file).load()
+    assert not WorkspaceIndex(root, ["templates"], cache_file).load()
+
+    workspace_index = WorkspaceIndex(root, ["templates"], cache_file)
+    assert workspace_index.load()
+    with open(os.path.join(quests, "Quest.html"), "w") as f:
+        f.write("<html></html>")
+    os.utime(quests, ns=(1, 1))
+    workspace_index.refresh(quests + "/")
+    workspace_index.save()
+    assert WorkspaceIndex(root, ["templates"], cache_file).load()
+
+    workspace_index = WorkspaceIndex(root, ["templates"], cache_file)
+    assert workspace_index.load()
+    os.makedirs(os.path.join(quests, "img"))
+    workspace_index.refresh(quests)
+    assert workspace_index.stale
+    workspace_index.save()
+    assert not os.path.isfile(cache_file)
+    workspace_index = WorkspaceIndex(root, ["templates"], cache_file)
+    assert not workspace_index.load()
+    assert workspace_index.find_page_folder("img") == (quests, True)
+
+
+def test_workspace_index_is_file(tmp_path):
+    """
+    Test case to verify that files are looked up in one listing of their directory, which is listed again once
+    forgotten.
+    """
+    directory = tmp_path / "img"
+    directory.mkdir()
+    (directory / "Aria (1).jpg").write_bytes(b"")
+    (directory / "sub").mkdir()
+    workspace_index = WorkspaceIndex(str(tmp_path))
+    path = os.path.join(str(directory), "Aria (1).jpg")
+    assert workspace_index.is_file(path)
+    assert not workspace_index.is_file(os.path.join(str(directory), "sub"))
+
+    (directory / "Aria (2).jpg").write_bytes(b"")
+    assert not workspace_index.is_file(os.path.join(str(directory), "Aria (2).jpg"))
+    workspace_index.forget(path)
+    assert workspace_index.is_file(os.path.join(str(directory), "Aria (2).jpg"))
@@ -8,6 +8,10 @@ from bs4 import BeautifulSoup
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
 
+# Import helper functions from common tools file.
+from mmorpdnd_tools import walk_directory
+from mmorpdnd_link_index import MMORPDND_LINK_INDEX
+
 
 def extract_links(html_content):
     """
@@ -35,7 +39,7 @@ def build_graph(directory):
     """
     G = nx.DiGraph()
 
-    for root, _, files in os.walk(directory):
+    for root, _, files in walk_directory(directory):
         for filename in files:
             if filename.endswith('.html') and filename != 'index.html' and "_public" not in filename:
                 filepath = os.path.join(root, filename)
@@ -57,6 +61,41 @@ def build_graph(directory):
     return G
 
 
+def build_graph_from_index(directory, link_index_file):
+    """
+    Builds the same directed graph as build_graph() from the link index written by the mmorpdnd.py update, instead of
+    parsing every HTML file. The graph reflects the pages as of the last update.
+
+    Args:
+        directory (str): The path to the directory containing HTML files.
+        link_index_file (str): The path of the link index, inside the cache directory of the campaign root.
+
+    Returns:
+        networkx.DiGraph: A directed graph representing the links between HTML files.
+    """
+    G = nx.DiGraph()
+    # Paths in the index are relative to the campaign root, the parent of the cache directory.
+    index_root = os.path.dirname(os.path.dirname(os.path.abspath(link_index_file)))
+    prefix = os.path.join(os.path.relpath(os.path.abspath(directory), index_root), "")
+
+    with MMORPDND_LINK_INDEX(link_index_file) as link_index:
+        pages = set(link_index.get_pages())
+        sources = set()
+        for path in sorted(pages):
+            filename = os.path.basename(path)
+            if path.startswith(prefix) and filename != 'index.html' and "_public" not in filename:
+                sources.add(path)
+                G.add_node(filename.split(".htm")[0])  # Add the node for the HTML file
+
+        for source, link, target in link_index.get_all_links():
+            # Ensure the link is relative and points to another HTML file within the directory
+            if source in sources and link.endswith('.html') and 'index.html' not in link and target in pages:
+                link = link.split("/")[-1].split(".htm")[0]
+                G.add_edge(os.path.basename(source).split(".htm")[0], link)
+
+    return G
+
+
 def visualize_graph_plotly(G):
     """
     Visualizes the directed graph G using Plotly for interactive plotting.
@@ -133,5 +172,10 @@ def visualize_graph_plotly(G):
     fig.show()
 
 directory = '../campaign'
-G = build_graph(directory)
+link_index_file = '../.mmorpdnd/links.sqlite'
+# Use the link index of the last update if there is one, otherwise parse every page.
+if os.path.isfile(link_index_file):
+    G = build_graph_from_index(directory, link_index_file)
+else:
+    G = build_graph(directory)
 visualize_graph_plotly(G)